@@ -3,7 +3,6 @@
 Set up a few global configurations before script is run.
 
 """
-import logging as log
 import os
 import sys
 
@@ -12,7 +11,6 @@ import yaml
 
 pag.PAUSE = 0
 pag.FAILSAFE = False
-sys.setrecursionlimit(9999)
 
 # Make sure the program's working directory is the directory in which
 #   this file is located. If the script is compiled (i.e. "frozen"), a
@@ -26,9 +24,11 @@ else:
 with open('config.yaml') as config:
     config = yaml.safe_load(config)
 
+# Log messages are written by a background thread, so writing them never
+#   holds up the bot. See logs.py.
+from ocvbot import logs
 log_level = config['main']['log_level']
-log.basicConfig(format='%(asctime)s %(filename)s.%(funcName)s - %(message)s',
-                level=log_level)
+logs.setup(log_level, ring=config['main'].get('log_ring', False) is True)
 
 # TODO: Find a better way to do this.
 # Clean up left over screenshots from previous runs.
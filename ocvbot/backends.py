@@ -0,0 +1,242 @@
+# coding=UTF-8
+"""
+Backends that send mouse and keyboard events to the display.
+
+Input is submitted as a sequence of timed events so a whole action, such
+as a mouse trajectory followed by a click or a string of keystrokes, can
+be sent in a single call. Each event is a 3-tuple containing:
+    - The number of seconds after the start of the sequence at which the
+      event should be sent.
+    - The type of event: 'move', 'button', 'scroll', 'key', or 'wait'.
+    - The event's arguments:
+        move = An (X, Y) tuple of the coordinates to move the cursor to.
+        button = A 2-tuple of the mouse button ('left', 'middle', or
+                 'right') and whether to press (True) or release (False)
+                 it.
+        scroll = The number of notches to turn the mouse wheel. Positive
+                 values scroll up, negative values scroll down.
+        key = A 2-tuple of the key, as named by PyAutoGUI, and whether to
+              press (True) or release (False) it.
+        wait = None. Nothing is sent. Used to make a sequence last until
+               a randomized post-action delay has passed.
+
+"""
+import abc
+import logging as log
+import threading
+import time
+
+import pyautogui as pag
+
+# How long before an event is due to stop sleeping and start spinning,
+#   in seconds. time.sleep() can overshoot by about a milisecond.
+SPIN_THRESHOLD = 0.0015
+
+
+def _wait_until(due):
+    """
+    Waits until time.perf_counter() reaches due.
+
+    """
+    remaining = due - time.perf_counter()
+    if remaining > SPIN_THRESHOLD:
+        time.sleep(remaining - SPIN_THRESHOLD)
+    while time.perf_counter() < due:
+        pass
+
+
+class Backend(abc.ABC):
+    """
+    Base class for input backends. Subclasses implement _send().
+
+    """
+
+    def __init__(self):
+        # Only one sequence may be sent at a time, otherwise events from
+        #   different sequences would be interleaved.
+        self.lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _send(self, event_type, args):
+        """
+        Sends a single event, see this module's docstring.
+
+        """
+
+    def _flush(self):
+        pass
+
+    def position(self):
+        """
+        Gets the current (X, Y) position of the mouse cursor.
+
+        """
+        return tuple(pag.position())
+
+    def play(self, events, wait=True):
+        """
+        Sends a sequence of timed events.
+
+        Args:
+            events (list): A list of 3-tuples describing each event, see
+                           this module's docstring for more info.
+            wait (bool): Whether to block until the whole sequence has
+                         been sent. If False, the sequence is sent from a
+                         background thread, default is True.
+
+        Returns:
+            If wait is True, returns True once the sequence has been sent.
+            If wait is False, returns the thread sending the sequence.
+
+        """
+        if wait is False:
+            thread = threading.Thread(target=self.play, args=(events,), daemon=True)
+            thread.start()
+            return thread
+
+        with self.lock:
+            start_time = time.perf_counter()
+            for due, event_type, args in events:
+                _wait_until(start_time + due)
+                if event_type != 'wait':
+                    self._send(event_type, args)
+                    self._flush()
+        return True
+
+
+class PyAutoGuiBackend(Backend):
+    """
+    Sends events through PyAutoGUI. Works on every platform PyAutoGUI
+    supports.
+
+    """
+
+    def _send(self, event_type, args):
+        if event_type == 'move':
+            # Call the platform-specific function directly to skip
+            #   PyAutoGUI's per-call argument handling and failsafe checks.
+            pag.platformModule._moveTo(args[0], args[1])
+        elif event_type == 'button':
+            button, press = args
+            if press is True:
+                pag.mouseDown(button=button)
+            else:
+                pag.mouseUp(button=button)
+        elif event_type == 'scroll':
+            pag.scroll(args)
+        elif event_type == 'key':
+            key, press = args
+            if press is True:
+                pag.keyDown(key)
+            else:
+                pag.keyUp(key)
+        else:
+            raise Exception('Unsupported event type ' + str(event_type) + '!')
+
+
+class XTestBackend(Backend):
+    """
+    Sends events with the X11 XTest extension over a single persistent
+    display connection. Linux only. Works under Xvfb. Requires
+    python-xlib, which PyAutoGUI already depends on under Linux.
+
+    Args:
+        display (str): The X display to connect to, by default uses the
+                       DISPLAY environment variable.
+
+    """
+    buttons = {'left': 1, 'middle': 2, 'right': 3}
+    # X11 reports each notch of the mouse wheel as a click of one of these
+    #   buttons.
+    scroll_up = 4
+    scroll_down = 5
+
+    def __init__(self, display=None):
+        super().__init__()
+        # Imported here so the bot doesn't require python-xlib unless this
+        #   backend is actually used.
+        from Xlib import X, XK, display as xdisplay
+        from Xlib.ext import xtest
+
+        self.X = X
+        self.xtest = xtest
+        self.display = xdisplay.Display(display)
+        if self.display.query_extension('XTEST') is None:
+            raise Exception('The X server does not support the XTEST extension!')
+        self.root = self.display.screen().root
+        self.shift = self.display.keysym_to_keycode(XK.string_to_keysym('Shift_L'))
+
+    def _keycode(self, key):
+        """
+        Gets the keycode for a key named as PyAutoGUI names it.
+
+        Returns:
+            Returns a 2-tuple containing the keycode and whether Shift
+            must be held to type the key.
+
+        """
+        keycode = pag.platformModule.keyboardMapping.get(key)
+        if keycode is None:
+            keycode = pag.platformModule.keyboardMapping.get(key.lower())
+        if keycode is None:
+            raise Exception('Unsupported key ' + str(key) + '!')
+        return keycode, len(key) == 1 and pag.isShiftCharacter(key)
+
+    def _send(self, event_type, args):
+        if event_type == 'move':
+            self.xtest.fake_input(self.display, self.X.MotionNotify,
+                                  x=int(args[0]), y=int(args[1]))
+        elif event_type == 'button':
+            button, press = args
+            event = self.X.ButtonPress if press is True else self.X.ButtonRelease
+            self.xtest.fake_input(self.display, event, self.buttons[button])
+        elif event_type == 'scroll':
+            button = self.scroll_up if args > 0 else self.scroll_down
+            for _ in range(abs(args)):
+                self.xtest.fake_input(self.display, self.X.ButtonPress, button)
+                self.xtest.fake_input(self.display, self.X.ButtonRelease, button)
+        elif event_type == 'key':
+            key, press = args
+            keycode, needs_shift = self._keycode(key)
+            if press is True:
+                if needs_shift is True:
+                    self.xtest.fake_input(self.display, self.X.KeyPress, self.shift)
+                self.xtest.fake_input(self.display, self.X.KeyPress, keycode)
+            else:
+                self.xtest.fake_input(self.display, self.X.KeyRelease, keycode)
+                if needs_shift is True:
+                    self.xtest.fake_input(self.display, self.X.KeyRelease, self.shift)
+        else:
+            raise Exception('Unsupported event type ' + str(event_type) + '!')
+
+    def _flush(self):
+        self.display.flush()
+
+    def position(self):
+        # Xlib connections aren't thread-safe, so wait for any sequence
+        #   being sent from a background thread to finish.
+        with self.lock:
+            pointer = self.root.query_pointer()
+        return pointer.root_x, pointer.root_y
+
+
+def get_backend(name):
+    """
+    Creates the input backend with the given name.
+
+    Args:
+        name (str): Either 'pyautogui' or 'xtest'.
+
+    Returns:
+        Returns a Backend object. Falls back to PyAutoGUI if the XTest
+        backend can't be used.
+
+    """
+    if name == 'xtest':
+        try:
+            return XTestBackend()
+        except Exception as error:
+            log.warning('Unable to use XTest input backend, using PyAutoGUI: %s', error)
+    elif name != 'pyautogui':
+        raise Exception('Unsupported input backend ' + str(name) + '!')
+    return PyAutoGuiBackend()
@@ -0,0 +1,339 @@
+# coding=UTF-8
+"""
+Model of the bank window's item grid.
+
+The visible part of the bank is a fixed grid of slots, so a single
+capture of the grid is split into slots and each slot is compared
+against the icons of the items being looked for. Once an item has been
+found, the number of times the bank had to be scrolled to see it and the
+index of its slot are remembered, since bank layouts rarely change.
+Later withdrawals then only need to check that the remembered slot
+still holds the item before clicking on it.
+
+The grid's offsets haven't been checked against a capture of the bank
+yet, so if the item can't be found in the grid, the top of
+vision.bank_items_window is searched for it instead. Where those searches
+find each item is remembered too, and until the grid has found an item,
+the bank window is searched before the bank is scrolled through, so wrong
+offsets don't cost a full scroll through the bank on every withdrawal.
+
+"""
+import logging as log
+
+import numpy as np
+
+from ocvbot import input, misc, trace, vision as vis
+
+# Offset of the top-left corner of the first slot relative to the
+#   client, the size of each slot, and the distance between the top-left
+#   corners of adjacent slots. Units are in pixels.
+GRID_LEFT = 73
+GRID_TOP = 83
+SLOT_WIDTH = 36
+SLOT_HEIGHT = 32
+SLOT_SPACING_X = 48
+SLOT_SPACING_Y = 36
+COLUMNS = 8
+VISIBLE_ROWS = 6
+# Each slot is searched this many pixels past its edges, so icons that
+#   are drawn slightly off-center still fit.
+SLOT_MARGIN = 2
+
+# The maximum number of notches to scroll while searching the bank.
+MAX_SCROLLS = 60
+
+grid = (vis.client_left + GRID_LEFT - SLOT_MARGIN,
+        vis.client_top + GRID_TOP - SLOT_MARGIN,
+        (COLUMNS - 1) * SLOT_SPACING_X + SLOT_WIDTH + 2 * SLOT_MARGIN,
+        (VISIBLE_ROWS - 1) * SLOT_SPACING_Y + SLOT_HEIGHT + 2 * SLOT_MARGIN)
+
+# The number of notches the bank is currently scrolled down from the
+#   top, or None if unknown.
+scrolls = None
+
+# The (scrolls, slot index) at which each item was last found, keyed by
+#   the filepath to the item's bank needle.
+positions = {}
+
+# The (left, top, width, height) at which each item was last found by
+#   searching the bank window with the bank scrolled to the top, keyed by
+#   the filepath to the item's bank needle.
+regions = {}
+
+# Whether the grid has found an item yet. Until it has, its offsets may be
+#   wrong.
+grid_matched = False
+
+
+def _slot_offset(index):
+    """
+    Gets the (left, top) of a slot relative to a capture of the grid.
+
+    """
+    return (SLOT_SPACING_X * (index % COLUMNS),
+            SLOT_SPACING_Y * (index // COLUMNS))
+
+
+def slot_region(index):
+    """
+    Gets the region to click on to withdraw the item in a slot. The region
+    is slightly smaller than the slot so clicks never land on its edge.
+
+    Args:
+        index (int): The index of the slot within the visible grid,
+                     counting left to right, then top to bottom.
+
+    Returns:
+        Returns a (left, top, width, height) 4-tuple relative to the
+        display.
+
+    """
+    left, top = _slot_offset(index)
+    return (grid[0] + SLOT_MARGIN + left + 6, grid[1] + SLOT_MARGIN + top + 6,
+            SLOT_WIDTH - 12, SLOT_HEIGHT - 12)
+
+
+def slots(frame=None):
+    """
+    Splits a capture of the bank grid into slots.
+
+    Args:
+        frame (array): A capture of grid, as returned by vision.grab(). If
+                       None, a new capture is taken, default is None.
+
+    Returns:
+        Returns a list of arrays, one per visible slot, each including
+        SLOT_MARGIN pixels past the slot's edges.
+
+    """
+    if frame is None:
+        frame = vis.grab(grid)
+    height = SLOT_HEIGHT + 2 * SLOT_MARGIN
+    width = SLOT_WIDTH + 2 * SLOT_MARGIN
+    return [frame[top:top + height, left:left + width]
+            for left, top in map(_slot_offset, range(COLUMNS * VISIBLE_ROWS))]
+
+
+def contents(needles, frame=None, conf=0.98):
+    """
+    Classifies every visible slot against a set of item needles.
+
+    Args:
+        needles (list): Filepaths to the bank needles of the items to look
+                        for.
+        frame (array): See slots()'s docstring.
+        conf (float): The similarity required to consider a slot to hold
+                      an item, expressed as a decimal <= 1. Raw and cooked
+                      food look very similar, so this is high, default is
+                      0.98.
+
+    Returns:
+        Returns a list with one entry per visible slot, containing either
+        the needle that slot matches best or None.
+
+    """
+    labels = []
+    for slot in slots(frame):
+        best, best_match = None, conf
+        for needle in needles:
+            match = vis.slot_match(slot, needle)
+            if match >= best_match:
+                best, best_match = needle, match
+        labels.append(best)
+    return labels
+
+
+def _scroll(clicks):
+    """
+    Scrolls the bank with the mouse wheel.
+
+    Returns:
+        Returns a capture of the grid once the bank has been scrolled.
+
+    """
+    input.Mouse(region=grid, sleep_range=(0, 100, 0, 100),
+                move_duration_range=(50, 300)).scroll(clicks)
+    misc.sleep_rand(100, 200)
+    return vis.grab(grid)
+
+
+def scroll_to_top():
+    """
+    Scrolls up until the bank stops moving.
+
+    """
+    global scrolls
+    previous = vis.grab(grid)
+    for _ in range(MAX_SCROLLS):
+        frame = _scroll(5)
+        if np.array_equal(frame, previous) is True:
+            break
+        previous = frame
+    scrolls = 0
+    return True
+
+
+def search(needle, conf=0.98):
+    """
+    Searches the whole bank for an item, starting from the top, and
+    remembers where it was found.
+
+    Args:
+        needle (file): Filepath to the item's bank needle.
+        conf (float): See contents()'s docstring.
+
+    Returns:
+        Returns the index of the slot containing the item within the
+        visible grid, or None if the item isn't in the bank.
+
+    """
+    global scrolls, grid_matched
+    scroll_to_top()
+    frame = vis.grab(grid)
+    for _ in range(MAX_SCROLLS):
+        labels = contents([needle], frame=frame, conf=conf)
+        if needle in labels:
+            index = labels.index(needle)
+            positions[needle] = (scrolls, index)
+            grid_matched = True
+            log.debug('Found %s in slot %s after scrolling %s times', needle, index, scrolls)
+            return index
+
+        previous = frame
+        frame = _scroll(-1)
+        if np.array_equal(frame, previous) is True:
+            # The bottom of the bank has been reached.
+            break
+        scrolls += 1
+
+    log.warning('Could not find %s in bank!', needle)
+    return None
+
+
+def _cached_slot(needle, conf):
+    """
+    Checks that the slot the item was last found in still holds the item,
+    scrolling back to that slot if necessary.
+
+    Returns:
+        Returns the index of the slot, or None if the item isn't there
+        anymore.
+
+    """
+    global scrolls
+    if needle not in positions:
+        return None
+    cached_scrolls, index = positions[needle]
+
+    # The bank may already be scrolled to the right place, so check the
+    #   slot before scrolling.
+    if vis.slot_match(slots()[index], needle) >= conf:
+        scrolls = cached_scrolls
+        return index
+
+    if scrolls != cached_scrolls:
+        scroll_to_top()
+        if cached_scrolls > 0:
+            _scroll(-cached_scrolls)
+            scrolls = cached_scrolls
+        if vis.slot_match(slots()[index], needle) >= conf:
+            return index
+
+    log.info('%s has moved since it was last withdrawn.', needle)
+    del positions[needle]
+    return None
+
+
+def search_window(needle, conf=0.98):
+    """
+    Searches the top of vision.bank_items_window for an item without
+    using the grid, and remembers where it was found. The region the item
+    was last found at is checked first.
+
+    Args:
+        needle (file): Filepath to the item's bank needle.
+        conf (float): See contents()'s docstring.
+
+    Returns:
+        Returns the (left, top, width, height) of the item, or None if
+        it can't be found at the top of the bank.
+
+    """
+    if scrolls != 0:
+        scroll_to_top()
+
+    if needle in regions:
+        left, top, width, height = regions[needle]
+        found = vis.Vision(region=(left - SLOT_MARGIN, top - SLOT_MARGIN,
+                                   width + 2 * SLOT_MARGIN, height + 2 * SLOT_MARGIN),
+                           needle=needle, loop_num=1, conf=conf).wait_for_needle(get_tuple=True)
+        if isinstance(found, tuple) is True:
+            return found
+        log.info('%s has moved since it was last withdrawn.', needle)
+        del regions[needle]
+
+    log.info('Looking for %s in the whole bank window.', needle)
+    found = vis.Vision(region=vis.bank_items_window, needle=needle,
+                       loop_num=3, conf=conf).wait_for_needle(get_tuple=True)
+    if isinstance(found, tuple) is False:
+        return None
+    regions[needle] = found
+    return found
+
+
+@trace.traced
+def withdraw(needle, conf=0.98):
+    """
+    Withdraws an item from the bank by left-clicking on it. Assumes the
+    bank is already open.
+
+    The slot the item was last withdrawn from is checked first. The whole
+    bank is only searched if the item has moved. If the item can't be
+    found in the grid, the top of the bank is searched for it with
+    search_window() instead. Items search_window() has found before, and
+    any item while the grid has never found one, are looked for with
+    search_window() before the whole bank is searched.
+
+    Args:
+        needle (file): Filepath to the item's bank needle.
+        conf (float): See contents()'s docstring.
+
+    Returns:
+        Returns True if the item was clicked on, returns False if it
+        couldn't be found in the bank.
+
+    """
+    index = _cached_slot(needle, conf)
+    if index is not None:
+        input.Mouse(region=slot_region(index)).click_coord()
+        return True
+
+    window_first = grid_matched is False or needle in regions
+    if window_first is True:
+        region = search_window(needle, conf)
+        if region is not None:
+            input.Mouse(region=region).click_coord()
+            return True
+
+    index = search(needle, conf)
+    if index is not None:
+        input.Mouse(region=slot_region(index)).click_coord()
+        return True
+
+    if window_first is False:
+        region = search_window(needle, conf)
+        if region is not None:
+            input.Mouse(region=region).click_coord()
+            return True
+    return False
+
+
+def reset():
+    """
+    Forgets how far the bank is scrolled. Call this whenever the bank is
+    opened, since it may not be scrolled to the same place it was left
+    at.
+
+    """
+    global scrolls
+    scrolls = None
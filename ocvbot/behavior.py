@@ -3,6 +3,7 @@
 Contains non-skilling player behaviors.
 
 """
+import collections
 import logging as log
 import random as rand
 import sys
@@ -13,7 +14,8 @@ import numpy as np
 import pathlib
 import pyautogui as pag
 
-from ocvbot import input, vision as vis, startup as start, vision, misc
+from ocvbot import input, vision as vis, startup as start, vision, misc, retry, side_stones, \
+    runner, scene, bank, orbs, stats, timing, trace
 
 
 # TODO
@@ -27,6 +29,266 @@ def switch_worlds_logged_out():
     pass
 
 
+# Recent times-to-login, in seconds, measured from the first login state
+#   to the client being in-game.
+login_times = collections.deque(maxlen=100)
+
+# The minimum number of yellow pixels of the blinking text cursor that
+#   must be within a login field to consider that field active.
+LOGIN_CURSOR_MIN_PIXELS = 10
+
+
+def _read_credentials(username_file, password_file):
+    """
+    Reads the user's credentials, removing line breaks from the
+    credential files to make logging in more predictable.
+
+    """
+    username = open(username_file, 'r').read()
+    username = str(username.replace('\n', ''))
+    password = open(password_file, 'r').read()
+    password = str(password.replace('\n', ''))
+    return username, password
+
+
+def _login_field_active(field, frame=None):
+    """
+    Checks if the text cursor is within a login field, which means the
+    field is active and any keys typed will go into it.
+
+    Args:
+        field (tuple): Either vision.login_field or vision.pass_field.
+        frame (array): A capture of vision.client, as returned by
+                       vision.grab(). If None, a new capture is taken,
+                       default is None.
+
+    Returns:
+        Returns True if the field is active, False otherwise.
+
+    """
+    if frame is None:
+        frame = vis.grab(vis.client)
+    left, top, width, height = field
+    left -= vis.client_left
+    top -= vis.client_top
+    area = frame[top:top + height, left:left + width].astype(np.int16)
+    cursor = (area[..., 0] > 180) & (area[..., 1] > 180) & (area[..., 2] < 90)
+    return int(cursor.sum()) >= LOGIN_CURSOR_MIN_PIXELS
+
+
+def _activate_login_field(field):
+    """
+    Makes a login field active, clicking on it if necessary.
+
+    Returns:
+        Returns True once the text cursor has been seen within the field,
+        returns False if the field could not be made active.
+
+    """
+    for _ in range(1, 4):
+        # The cursor blinks, so it may take a few captures to see it.
+        attempts = retry.policy('login-field-active', tries=5, sleep_range=(100, 200)).attempts()
+        for _ in attempts:
+            if _login_field_active(field) is True:
+                attempts.succeeded()
+                return True
+        input.Mouse(region=field).click_coord()
+    log.error('Could not activate login field!')
+    return False
+
+
+def _login_menu_showing():
+    """
+    Checks for the login menu's logo, which is shown on every screen of
+    the login menu, but never in-game.
+
+    """
+    return vis.Vision(region=vis.client, needle='./needles/login-menu/orient-logged-out.png',
+                      conf=0.8, loop_num=1).wait_for_needle()
+
+
+def _credential_screen_showing():
+    """
+    Checks for the login and cancel buttons, which are only shown on the
+    screen where the user's credentials are entered.
+
+    """
+    return vis.Vision(region=vis.client, needle='./needles/login-menu/login-cancel-buttons.png',
+                      loop_num=1).wait_for_needle()
+
+
+class _Login:
+    """
+    The states of a login, see login_full().
+
+    Every state that changes what the client is showing transitions to
+    the wait-for-change state, which reacts to whichever login screen
+    appears next rather than sleeping for a fixed amount of time.
+
+    The scene classifier only decides which state to try next. Anything
+    that types or clicks first confirms the screen with a needle, so a
+    misclassified in-game frame can never have the user's credentials
+    typed into the chat. The login is only done once the minimap's orient
+    needle has been found, and is only given up on once the invalid
+    credentials message has been found.
+
+    """
+
+    def __init__(self, username, password, cred_sleep_range):
+        self.username = username
+        self.password = password
+        self.cred_sleep_range = cred_sleep_range
+        self.scene = None
+
+    # The state to go to when each scene is showing.
+    transitions = {
+        scene.Scene.LOGGED_OUT: 'existing-user',
+        scene.Scene.DISCONNECTED: 'dismiss-message',
+        scene.Scene.LOGIN_CREDENTIALS: 'enter-credentials',
+        scene.Scene.INVALID_CREDENTIALS: 'invalid-credentials',
+        scene.Scene.POSTLOGIN: 'click-to-play',
+        scene.Scene.IN_GAME: 'confirm-in-game',
+        scene.Scene.UNKNOWN: 'dismiss-message',
+    }
+
+    def runner(self, submit_only=False):
+        """
+        Builds the login state machine.
+
+        Args:
+            submit_only (bool): Whether to stop as soon as the user's
+                                credentials have been submitted, default
+                                is False.
+
+        """
+        return runner.Runner(states=[
+            runner.State('check-scene', self._check_scene, self.transitions),
+            runner.State('wait-for-change', self._wait_for_change, self.transitions,
+                         retries=40, retry_sleep_range=(250, 500), fail='check-scene'),
+            runner.State('existing-user', self._click_existing_user,
+                         {True: 'wait-for-change'}, fail='check-scene'),
+            runner.State('dismiss-message', self._dismiss_message,
+                         {True: 'wait-for-change'}, retries=5,
+                         retry_sleep_range=(500, 1000), fail='check-scene'),
+            runner.State('enter-credentials', self._enter_credentials,
+                         {True: None if submit_only is True else 'wait-for-change'},
+                         retries=2, fail='check-scene'),
+            runner.State('invalid-credentials', self._invalid_credentials,
+                         fail='check-scene'),
+            runner.State('click-to-play', self._click_to_play,
+                         {True: 'wait-for-change'}, retries=5,
+                         retry_sleep_range=(500, 1000), fail='check-scene'),
+            # None means the login is done.
+            runner.State('confirm-in-game', self._confirm_in_game,
+                         {True: None}, retries=3,
+                         retry_sleep_range=(250, 500), fail='check-scene'),
+        ], initial='check-scene', max_steps=100)
+
+    def _check_scene(self):
+        self.scene = scene.classify()
+        log.debug('Login screen is %s', self.scene)
+        return self.scene
+
+    def _wait_for_change(self):
+        """
+        Returns the new scene once it's different from the last one.
+
+        """
+        current = scene.classify()
+        if current == self.scene:
+            return False
+        log.debug('Login screen changed from %s to %s', self.scene, current)
+        self.scene = current
+        return current
+
+    @staticmethod
+    def _click_existing_user():
+        return vis.Vision(region=vis.client,
+                          needle='./needles/login-menu/existing-user-button.png',
+                          loop_num=1).click_needle()
+
+    @staticmethod
+    def _dismiss_message():
+        """
+        Handles the messages that can appear in the login menu, such as
+        being disconnected due to inactivity or being unable to connect
+        to the server. Returns False if there's nothing to dismiss yet,
+        such as while the client is connecting.
+
+        """
+        members_world = vis.Vision(region=vis.client,
+                                   needle='./needles/login-menu/members-world.png',
+                                   loop_num=1).wait_for_needle()
+        if members_world is True:
+            # TODO: Switch to a free-to-play world once
+            #   switch_worlds_logged_out() is written.
+            raise Exception('Cannot login to a members world!')
+
+        # The world switcher covers the whole login menu.
+        world_switcher = vis.Vision(region=vis.client,
+                                    needle='./needles/login-menu/world-switcher.png',
+                                    loop_num=1).wait_for_needle()
+        if world_switcher is True:
+            log.info('Closing world switcher.')
+            input.Keyboard().keypress('escape')
+            return True
+
+        # Only click on buttons within the login menu, in case the client
+        #   is actually in-game.
+        if _login_menu_showing() is False:
+            return False
+        for button in ('ok-button.png', 'try-again-button.png'):
+            clicked = vis.Vision(region=vis.client,
+                                 needle='./needles/login-menu/' + button,
+                                 loop_num=1).click_needle()
+            if clicked is True:
+                return True
+        return False
+
+    def _enter_credentials(self):
+        # Only type when the credentials screen is confirmed to be showing
+        #   and the field is confirmed active, otherwise the keystrokes
+        #   could end up in the wrong field, or in the chat if the client
+        #   is actually in-game.
+        if _credential_screen_showing() is False or \
+                _activate_login_field(vis.login_field) is False:
+            return False
+        misc.sleep_rand(self.cred_sleep_range[0], self.cred_sleep_range[1])
+        input.Keyboard(log_keys=False).typewriter(self.username)
+        misc.sleep_rand(self.cred_sleep_range[0], self.cred_sleep_range[1])
+
+        if _credential_screen_showing() is False or \
+                _activate_login_field(vis.pass_field) is False:
+            return False
+        input.Keyboard(log_keys=False).typewriter(self.password)
+        misc.sleep_rand(self.cred_sleep_range[0], self.cred_sleep_range[1])
+
+        if _credential_screen_showing() is False:
+            return False
+        input.Keyboard().keypress(key='enter')
+        return True
+
+    @staticmethod
+    def _invalid_credentials():
+        # A misclassified frame goes back to check-scene rather than
+        #   stopping the login.
+        if vis.Vision(region=vis.client, needle='./needles/login-menu/invalid-credentials.png',
+                      loop_num=1).wait_for_needle() is True:
+            raise Exception('Invalid user credentials!')
+        return False
+
+    @staticmethod
+    def _click_to_play():
+        return vis.Vision(region=vis.client,
+                          needle='./needles/login-menu/orient-postlogin.png',
+                          conf=0.8, loop_num=1).click_needle()
+
+    @staticmethod
+    def _confirm_in_game():
+        return vis.Vision(region=vis.client, needle='./needles/minimap/orient.png',
+                          conf=0.8, loop_num=1).wait_for_needle()
+
+
 def login_basic(username_file=start.config['main']['username_file'],
                 password_file=start.config['main']['password_file'],
                 cred_sleep_range=(800, 5000)):
@@ -51,75 +313,36 @@ def login_basic(username_file=start.config['main']['username_file'],
                                   credentials, default is (800, 5000).
     Returns:
         Returns True if credentials were entered and a login was
-        initiated. Returns False otherwise.
+        initiated, or if the client is already logged in. Returns False
+        otherwise.
 
     """
-    # Remove line breaks from credential files to make logging in more
-    #   predictable.
-    username = open(username_file, 'r').read()
-    username = str(username.replace('\n', ''))
-    password = open(password_file, 'r').read()
-    password = str(password.replace('\n', ''))
-
-    for _ in range(1, 3):
-        log.info('Logging in.')
-
-        # Click the "Ok" button if it's present at the login screen.
-        # This button appears if the user was disconnected due to
-        #   inactivity.
-        ok_button = vis.Vision(region=vis.client,
-                               needle='./needles/login-menu/ok-button.png',
-                               loop_num=1).click_needle()
-        # If the "Ok" button isn't found, look for the "Existing user"
-        #   button.
-        existing_user_button = vis.Vision(region=vis.client,
-                                          needle='./needles/login-menu/existing-user-button.png',
-                                          loop_num=1).click_needle()
-
-        if existing_user_button is True or ok_button is True:
-            credential_screen = vis.Vision(region=vis.client,
-                                           needle='./needles/login-menu/login-cancel-buttons.png',
-                                           loop_num=5).wait_for_needle()
-
-            if credential_screen is True:
-                # Click to make sure the "Login" field is active.
-                input.Mouse(region=(vis.login_field_left, vis.login_field_top,
-                                    start.LOGIN_FIELD_WIDTH, start.LOGIN_FIELD_HEIGHT)).click_coord()
-                # Enter login field credentials.
-                misc.sleep_rand(cred_sleep_range[0], cred_sleep_range[1])
-                input.Keyboard(log_keys=False).typewriter(username)
-                misc.sleep_rand(cred_sleep_range[0], cred_sleep_range[1])
-
-                # Click to make sure the "Password" field is active.
-                input.Mouse(region=(vis.pass_field_left, vis.pass_field_top,
-                                    start.LOGIN_FIELD_WIDTH, start.LOGIN_FIELD_HEIGHT)).click_coord()
-                # Enter password field credentials and login.
-                input.Keyboard(log_keys=False).typewriter(password)
-                misc.sleep_rand(cred_sleep_range[0], cred_sleep_range[1])
-
-                input.Keyboard().keypress(key='enter')
-                return True
-
-    log.error('Could perform login!')
+    log.info('Logging in.')
+    username, password = _read_credentials(username_file, password_file)
+    login = _Login(username, password, cred_sleep_range).runner(submit_only=True)
+    if login.run() is True:
+        return True
+    log.error('Could not perform login!')
     return False
 
 
-def login_full(login_sleep_range=(500, 5000), postlogin_sleep_range=(500, 5000),
-               username_file=start.config['main']['username_file'],
-               password_file=start.config['main']['password_file']):
+@trace.traced
+def login_full(username_file=start.config['main']['username_file'],
+               password_file=start.config['main']['password_file'],
+               cred_sleep_range=(800, 5000)):
     """
     Logs into the client using the credentials specified in the main
     config file. Waits until the login is successful before returning.
 
+    Each step captures the client and reacts to whichever login screen
+    is showing, see scene.classify(), so messages like "try again" or
+    being disconnected are handled at any point during the login. The
+    time each login takes is recorded in login_times.
+
     Args:
-        login_sleep_range (tuple): A 2-tuple containing the minimum and
-                                   maximum number of miliseconds to wait
-                                   after hitting "Enter" to login,
-                                   default is (500, 5000).
-        postlogin_sleep_range (tuple): The minimum and maximum number of
-                                       miliseconds to wait after clicking
-                                       the "Click here to play" button,
-                                       default is (500, 5000).
+        username_file (file): See login_basic()'s docstring.
+        password_file (file): See login_basic()'s docstring.
+        cred_sleep_range (tuple): See login_basic()'s docstring.
 
     Raises:
         Raises an exception if the login was not successful for any
@@ -127,62 +350,39 @@ def login_full(login_sleep_range=(500, 5000), postlogin_sleep_range=(500, 5000),
 
     Returns:
         Returns True if the login was successful.
-        
-    """
-    for _ in range(1, 3):
-
-        login = login_basic(username_file, password_file)
-        if login is False:
-            raise Exception('Could not perform initial login!')
-
-        misc.sleep_rand(login_sleep_range[0], login_sleep_range[1])
-        postlogin_screen_button = vis.Vision(region=vis.display,
-                                             needle='./needles/login-menu/orient-postlogin.png',
-                                             conf=0.8, loop_num=10, loop_sleep_range=(1000, 2000)).click_needle()
-
-        if postlogin_screen_button is True:
-            misc.sleep_rand(postlogin_sleep_range[0], postlogin_sleep_range[1])
-
-            # Wait for the orient function to return true in order to
-            #    confirm the login.
-            logged_in = vis.Vision(region=vis.display,
-                                   needle='./needles/minimap/orient.png',
-                                   loop_num=50, loop_sleep_range=(1000, 2000)).wait_for_needle()
-            if logged_in is True:
-                # Reset the timer that's used to count the number of
-                #   seconds the bot has been running for.
-                start.start_time = time.time()
-                # Make sure client camera is oriented correctly after
-                #   logging in.
-                pag.keyDown('Up')
-                misc.sleep_rand(3000, 7000)
-                pag.keyUp('Up')
-                return True
-            else:
-                raise Exception('Could not detect login after postlogin screen!')
-
-        else:
-            # Begin checking for the various non-successful login messages.
-            #   This includes messages like "invalid credentials",
-            #   "you must be a member to use this world", "cannot
-            #   connect to server," etc.
-            log.warning('Cannot find postlogin screen!')
 
-            # TODO: Add additional checks to other login messages.
-            invalid_credentials = vis.Vision(region=vis.display,
-                                             needle='./needles/login-menu/invalid-credentials.png',
-                                             loop_num=1).wait_for_needle()
-            if invalid_credentials is True:
-                raise Exception('Invalid user credentials!')
-            log.error('Cannot find postlogin screen!')
-
-    raise Exception('Unable to login!')
+    """
+    log.info('Logging in.')
+    username, password = _read_credentials(username_file, password_file)
+    login = _Login(username, password, cred_sleep_range).runner()
+    login_start = time.monotonic()
+
+    if login.run() is False:
+        login.timing_report()
+        raise Exception('Unable to login!')
+
+    login_times.append(time.monotonic() - login_start)
+    log.info('Logged in after %.1f seconds.', login_times[-1])
+    # Reset the timer that's used to count the number of seconds the bot
+    #   has been running for.
+    start.start_time = time.time()
+    # Make sure client camera is oriented correctly after logging in.
+    input.Keyboard().hold('Up')
+    misc.sleep_rand(3000, 7000)
+    input.Keyboard().release('Up')
+    return True
 
 
+@trace.traced
 def logout():
     """
     If the client is logged in, logs out.
 
+    The logout button is always drawn in the same place, so the button is
+    found by checking the pixels at its known positions in a single
+    capture, and the logout is detected by classifying the client's
+    scene, see scene.classify().
+
     Raises:
         Raises an exception if the client could not logout.
 
@@ -190,65 +390,36 @@ def logout():
         Returns True if the logout was successful.
 
     """
+    frame = vis.grab(vis.client)
     # Make sure the client is logged in.
-    if vis.orient()[0] == 'logged_out':
+    if scene.classify(frame) in scene.LOGGED_OUT_SCENES:
         log.warning('Client already logged out!')
         return True
 
-    open_side_stone('logout')
-
-    logout_button_world_switcher = False
-    logout_button_highlighted = False
-    logout_button = False
+    # The logout tab, or the world switcher, may already be open.
+    logout_button = side_stones.logout_button(frame)
+    if logout_button is None:
+        open_side_stone('logout')
+        attempts = retry.policy('logout-button', tries=10, sleep_range=(50, 150)).attempts()
+        for _ in attempts:
+            logout_button = side_stones.logout_button()
+            if logout_button is not None:
+                attempts.succeeded()
+                break
+    if logout_button is None:
+        raise Exception('Failed to find logout button!')
 
-    # TODO: Create a function that looks for multiple needles simultaneously.
-    #   This might even be able to be integrated into the wait_for_needle()
-    #   function with a for-loop.
-    # Look for any of the three possible logout buttons.
-    for _ in range(1, 5):
-        # The standard logout button.
-        logout_button = vis.Vision(region=vis.inv,
-                                   needle='./needles/side-stones/logout/logout.png',
-                                   conf=0.9, loop_num=1).wait_for_needle(get_tuple=True)
-        if isinstance(logout_button, tuple) is True:
-            # Break out of the loop if any of the buttons was found.
-            break
-
-        # The logout button as it appears when the mouse is over it.
-        logout_button_highlighted = vis.Vision(region=vis.inv,
-                                               needle='./needles/side-stones/logout/logout-highlighted.png',
-                                               conf=0.9, loop_num=1).wait_for_needle(get_tuple=True)
-        if isinstance(logout_button_highlighted, tuple) is True:
-            logout_button = logout_button_highlighted
-            break
-
-        # The logout button when the world switcher is open.
-        logout_button_world_switcher = vis.Vision(region=vis.side_stones,
-                                                  needle='./needles/side-stones/logout/logout-world-switcher.png',
-                                                  conf=0.9, loop_num=1).wait_for_needle(get_tuple=True)
-        if isinstance(logout_button_world_switcher, tuple) is True:
-            logout_button = logout_button_world_switcher
-            break
-
-    if logout_button is False and logout_button_highlighted is False \
-            and logout_button_world_switcher is False:
-        raise Exception("Failed to find logout button!")
-
-    # Once a logout button has been found, click on its coordinates
-    #   and wait for the logout to complete.
     # If a logout is not detected after the first try, keep clicking
-    #   on the location of the detected logout button and try again.
-    input.Mouse(region=logout_button).click_coord(move_away=True)
-    for tries in range(5):
-        logged_out = vis.Vision(region=vis.client,
-                                needle='./needles/login-menu/orient-logged-out.png',
-                                loop_num=5, loop_sleep_range=(1000, 1200)).wait_for_needle()
-        if logged_out is True:
-            log.info('Logged out after trying %s times(s)', tries)
-            return True
-        else:
-            log.info('Unable to log out, trying again.')
-            input.Mouse(region=logout_button).click_coord(move_away=True)
+    #   on the logout button and try again.
+    for tries in range(1, 4):
+        input.Mouse(region=logout_button).click_coord(move_away=True)
+        attempts = retry.policy('logged-out', tries=30, sleep_range=(100, 200)).attempts()
+        for _ in attempts:
+            if scene.classify() in scene.LOGGED_OUT_SCENES:
+                attempts.succeeded()
+                log.info('Logged out after clicking %s time(s)', tries)
+                return True
+        log.info('Unable to log out, trying again.')
 
     raise Exception('Could not logout!')
 
@@ -275,6 +446,9 @@ def logout_break_range():
     checkpoint's timestamp hasn't yet passed, the function does nothing
     and returns.
 
+    Returns:
+        Returns True if a logout break was taken, returns False otherwise.
+
     """
     # TODO: There's probably a way to refactor these near-duplicate
     #   if-statements into a single for-loop.
@@ -285,22 +459,22 @@ def logout_break_range():
     if current_time >= start.checkpoint_1 and start.checkpoint_1_checked is False:
         log.info('Rolling for checkpoint 1...')
         start.checkpoint_1_checked = True
-        logout_break_roll(5)
+        return logout_break_roll(5)
 
     elif current_time >= start.checkpoint_2 and start.checkpoint_2_checked is False:
         log.info('Rolling for checkpoint 2...')
         start.checkpoint_2_checked = True
-        logout_break_roll(5)
+        return logout_break_roll(5)
 
     elif current_time >= start.checkpoint_3 and start.checkpoint_3_checked is False:
         log.info('Rolling for checkpoint 3...')
         start.checkpoint_3_checked = True
-        logout_break_roll(5)
+        return logout_break_roll(5)
 
     elif current_time >= start.checkpoint_4 and start.checkpoint_4_checked is False:
         log.info('Rolling checkpoint 4...')
         start.checkpoint_4_checked = True
-        logout_break_roll(5)
+        return logout_break_roll(5)
 
     # The last checkpoint's timestamp is based on the maximum session
     #   duration, so force a logout and reset all the other checkpoints.
@@ -309,7 +483,7 @@ def logout_break_range():
         start.checkpoint_2_checked = False
         start.checkpoint_3_checked = False
         start.checkpoint_4_checked = False
-        logout_break_roll(1)
+        return logout_break_roll(1)
 
     # Print the correct logging information according to which checkpoint(s)
     #   have been rolled for.
@@ -324,9 +498,10 @@ def logout_break_range():
             log.info('Checkpoint 4 is at %s', time.ctime(start.checkpoint_4))
         elif start.checkpoint_4_checked is True:
             log.info('Checkpoint 5 is at %s', time.ctime(start.checkpoint_5))
-    return True
+    return False
 
 
+@trace.traced
 def logout_break_roll(chance,
                       min_break_duration=int(start.config['main']['min_break_duration']),
                       max_break_duration=int(start.config['main']['max_break_duration'])):
@@ -342,6 +517,10 @@ def logout_break_roll(chance,
                                   if the roll passes, by default reads
                                   the config file.
 
+    Returns:
+        Returns True if the roll passed and a logout break was taken,
+        returns False otherwise.
+
     """
     logout_roll = rand.randint(1, chance)
     log.info('Logout roll was %s', logout_roll)
@@ -378,11 +557,15 @@ def logout_break_roll(chance,
                      round(wait_time_minutes), stop_time_human[3],
                      stop_time_human[4], stop_time_human[5])
 
+            started = time.perf_counter()
             time.sleep(wait_time_seconds)
-    else:
-        return
+            if trace.enabled is True:
+                trace.add('sleep', started)
+            return True
+    return False
 
 
+@trace.traced
 def open_side_stone(side_stone):
     """
     Opens a side stone menu.
@@ -401,37 +584,30 @@ def open_side_stone(side_stone):
         Raises an exception if side stone could not be opened.
 
     """
-    side_stone_open = './needles/side-stones/open/' + side_stone + '.png'
-    side_stone_closed = './needles/side-stones/closed/' + side_stone + '.png'
-
-    # Some side stones need a higher than default confidence to determine
-    #   if they're open.
-    stone_open = vis.Vision(region=vis.side_stones, needle=side_stone_open,
-                            loop_num=1, conf=0.98).wait_for_needle()
-    if stone_open is True:
+    # Determine which side stone is open from a single capture, rather
+    #   than searching for the open and closed needles.
+    if side_stones.open_tab() == side_stone:
         log.debug('Side stone already open.')
         return True
-    else:
-        log.debug('Opening side stone...')
-
-    # Try a total of 5 times to open the desired side stone menu using
-    #   the mouse.
-    for tries in range(1, 5):
-        # Move mouse out of the way after clicking so the function can
-        #   tell if the stone is open.
-        vis.Vision(region=vis.side_stones,
-                   needle=side_stone_closed,
-                   loop_num=3, loop_sleep_range=(100, 300)). \
-            click_needle(sleep_range=(0, 200, 0, 200), move_away=True)
-
-        stone_open = vis.Vision(region=vis.side_stones,
-                                needle=side_stone_open,
-                                loop_num=3, conf=0.98, loop_sleep_range=(100, 200)). \
-            wait_for_needle()
-
-        if stone_open is True:
-            log.info('Opened side stone after %s tries.', tries)
-            return True
+    log.debug('Opening side stone...')
+
+    # Try several times to open the desired side stone menu using the
+    #   mouse. Every tab is at a fixed location, so it can be clicked on
+    #   directly.
+    attempts = retry.policy('open-side-stone', tries=4, sleep_range=(0, 0)).attempts()
+    for tries in attempts:
+        input.Mouse(region=side_stones.click_region(side_stone),
+                    sleep_range=(0, 200, 0, 200)).click_coord()
+
+        stone_open = retry.policy('side-stone-highlight', tries=3,
+                                  sleep_range=(100, 200)).attempts()
+        for _ in stone_open:
+            if side_stones.open_tab() == side_stone:
+                stone_open.succeeded()
+                attempts.succeeded()
+                log.info('Opened side stone after %s tries.', tries)
+                return True
+
         # Make sure the bank window isn't open, which would block
         #   access to the side stones.
         vis.Vision(region=vis.game_screen,
@@ -451,6 +627,7 @@ def check_skills():
     misc.sleep_rand(1000, 7000)
 
 
+@trace.traced
 def human_behavior_rand(chance):
     """
     Randomly chooses from a list of human behaviors if the roll passes.
@@ -492,6 +669,7 @@ def human_behavior_rand(chance):
     return
 
 
+@trace.traced
 def drop_item(item, track=True, wait_chance=120, wait_range=(5000, 20000)):
     """
     Drops all instances of the provided item from the inventory.
@@ -501,8 +679,8 @@ def drop_item(item, track=True, wait_chance=120, wait_range=(5000, 20000)):
     Args:
        item (file): Filepath to an image of the item to drop, as it
                     appears in the player's inventory.
-       track (bool): Keep track of the number of items dropped in a
-                     global variable, default is True.
+       track (bool): Count the number of items dropped as
+                     'items-dropped', see stats.py, default is True.
        wait_chance (int): Chance to wait randomly while dropping item,
                           see wait_rand()'s docstring for more info,
                           default is 50.
@@ -527,34 +705,36 @@ def drop_item(item, track=True, wait_chance=120, wait_range=(5000, 20000)):
     log.info('Dropping all instances of %s', item)
     for tries in range(40):
 
-        pag.keyDown('shift')
+        input.Keyboard().hold('shift', wait=False)
         # Alternate between searching for the item in left half and the
         #   right half of the player's inventory. This helps reduce the
         #   chances the bot will click on the same item twice.
+        # Clicks are queued without waiting so the left half can be
+        #   searched while the mouse is still moving to the right half.
         item_on_right = \
             vis.Vision(region=vis.inv_right_half, needle=item, loop_num=1) \
                .click_needle(sleep_range=(10, 50, 50, 300),
-                             move_duration_range=(50, 800))
-        # TODO: This "track" parameter is for stats. implement stats!
+                             move_duration_range=(50, 800), wait=False)
         if item_on_right is True and track is True:
-            start.items_gathered += 1
+            stats.count('items-dropped')
 
         item_on_left = \
             vis.Vision(region=vis.inv_left_half, needle=item, loop_num=1) \
                .click_needle(sleep_range=(10, 50, 50, 300),
-                             move_duration_range=(50, 800))
+                             move_duration_range=(50, 800), wait=False)
         if item_on_left is True and track is True:
-            start.items_gathered += 1
+            stats.count('items-dropped')
 
         # Search the entire inventory to check if the item is still
-        #   there.
+        #   there, once both items have actually been dropped.
+        input.wait_for_input()
         item_remains = vis.Vision(region=vis.inv, loop_num=1, needle=item).wait_for_needle()
 
         # Chance to briefly wait while dropping items.
         misc.sleep_rand_roll(chance_range=(wait_chance-10, wait_chance+10),
                              sleep_range=(wait_range[0], wait_range[1]))
 
-        pag.keyUp('shift')
+        input.Keyboard().release('shift')
         if item_remains is False:
             return True
 
@@ -602,6 +782,7 @@ def bank_settings_check(setting, value):
             return True
 
 
+@trace.traced
 def open_bank(direction):
     """
     Opens the bank, assuming the player is within 2 tiles of the booth.
@@ -626,33 +807,36 @@ def open_bank(direction):
         return True
 
     # TODO: Deal with bank PINs.
-    for _ in range(1, 10):
+    attempts = retry.policy('open-bank', tries=9, sleep_range=(1000, 3000)).attempts()
+    for _ in attempts:
         one_tile = vis.Vision(region=vis.game_screen,
                               needle='./needles/game-screen/bank/bank-booth-'
                                      + direction + '-1-tile.png',
-                              loop_num=1, conf=0.85).click_needle()
+                              loop_num=1, conf=0.85).click_needle(confirm=True)
 
         two_tiles = vis.Vision(region=vis.game_screen,
                                needle='./needles/game-screen/bank/bank-booth-'
                                       + direction + '-2-tiles.png',
-                               loop_num=1, conf=0.85).click_needle()
+                               loop_num=1, conf=0.85).click_needle(confirm=True)
 
         if one_tile is True or two_tiles is True:
             bank_open = vis.Vision(region=vis.game_screen,
                                    needle='./needles/buttons/close.png',
-                                   loop_num=30).wait_for_needle()
+                                   retry_policy=retry.policy('bank-window', tries=30)) \
+                .wait_for_needle()
             if bank_open is True:
+                attempts.succeeded()
+                bank.reset()
                 return True
             #else:
                 #pin = enter_bank_pin()
                 #if pin is True:
                     #return True
 
-        misc.sleep_rand(1000, 3000)
-
     raise Exception('Unable to open bank!')
 
 
+@trace.traced
 def enter_bank_pin(pin=tuple(str(start.config['main']['bank_pin']))):
     """
     Enters the user's bank PIN.
@@ -689,26 +873,41 @@ def enter_bank_pin(pin=tuple(str(start.config['main']['bank_pin']))):
 
 # TODO: This function may not even be necessary since we can CTRL+click
 #   to run.
-def enable_run():
+# The minimum run energy at which running is turned on.
+RUN_MIN_ENERGY = 75
+
+
+@trace.traced
+def enable_run(min_energy=RUN_MIN_ENERGY):
     """
-    If run is turned off but energy is full, turns running on.
+    If run is turned off and the player has enough run energy, turns
+    running on.
+
+    Args:
+        min_energy (int): The minimum run energy needed to turn running
+                          on, default is RUN_MIN_ENERGY.
+
+    Returns:
+        Returns True if running is on, False if otherwise.
 
     """
-    # TODO: turn run on when over 75%
+    frame = orbs.grab()
+    if orbs.run_enabled(frame) is True:
+        return True
+    energy = orbs.read(frame)['run']
+    if energy is None or energy < min_energy:
+        log.debug('Not turning on running, run energy is %s.', energy)
+        return False
+
+    left, top, width, height = orbs.RUN_ORB
+    run_orb = (vis.client_left + left + 6, vis.client_top + top + 6, width - 12, height - 12)
     for _ in range(1, 5):
-        run_full_off = vis.Vision(region=vis.client,
-                                  needle='./needles/buttons/run-full-off.png',
-                                  loop_num=1).click_needle(move_away=True)
-        if run_full_off is True:
-            misc.sleep_rand(300, 1000)
-            run_full_on = vis.Vision(region=vis.client,
-                                     needle='./needles/buttons/run-full-on.png',
-                                     loop_num=1).wait_for_needle()
-            if run_full_on is True:
-                return True
-        else:
-            return False
+        input.Mouse(region=run_orb, move_duration_range=(50, 500)).click_coord(move_away=True)
+        misc.sleep_rand(300, 1000)
+        if orbs.run_enabled() is True:
+            return True
     log.error('Unable to turn on running!')
+    return False
 
 
 # TODO: Update the terminology used in this function. Make sure to
@@ -716,6 +915,7 @@ def enable_run():
 #   redefine "waypoint" to be "the coordinates that you click on the
 #   minimap to tell your character to walk to", and "destination" to be
 #   "the desired coordinates you want your character to be at".
+@trace.traced
 def travel(param_list, haystack_map, attempts=100):
     """
     Clicks on the minimap until the player has arrived at the desired
@@ -853,12 +1053,17 @@ def travel(param_list, haystack_map, attempts=100):
             click_pos_y = abs(click_pos_y)
             click_pos_x = abs(click_pos_x)
             # Holding down ctrl while clicking will cause character to
-            #   run.
-            pag.keyDown('ctrl')
+            #   run if running is turned off, but to walk if it's on.
+            #   Running is turned on once there's enough energy, so the
+            #   energy doesn't go to waste.
+            running = enable_run()
+            if running is False:
+                input.Keyboard().hold('ctrl', wait=False)
             input.Mouse(region=(click_pos_x, click_pos_y, 0, 0),
                         sleep_range=(50, 100, 100, 200),
                         move_duration_range=(0, 300)).click_coord()
-            pag.keyUp('ctrl')
+            if running is False:
+                input.Keyboard().release('ctrl')
             misc.sleep_rand((sleep_range[0] * 1000), (sleep_range[1] * 1000))
 
             if (abs(waypoint_distance_x) <= waypoint_tolerance[0] and
@@ -886,10 +1091,19 @@ def ocv_find_location(haystack):
         needle within the haystack.
 
     """
+    started = time.perf_counter()
     needle = pag.screenshot(region=vision.minimap_slice)
+    captured = time.perf_counter()
     needle = cv2.cvtColor(np.array(needle), cv2.COLOR_RGB2GRAY)
     w, h = needle.shape[::-1]
     result = cv2.matchTemplate(haystack, needle, cv2.TM_CCOEFF_NORMED)
     loc = cv2.minMaxLoc(result)
     match = loc[3]
+    if trace.enabled is True:
+        trace.add('vision', started)
+    if timing.enabled is True:
+        # The haystack map is what's searched, so its size is recorded
+        #   as the region.
+        timing.record_find('ocv_find_location', (0, 0, haystack.shape[1], haystack.shape[0]),
+                           captured - started, time.perf_counter() - captured, loc[1], True)
     return match[0], match[1], w, h
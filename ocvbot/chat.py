@@ -0,0 +1,192 @@
+# coding=UTF-8
+"""
+Reads the most recent line of the chat menu as text.
+
+The chat font is drawn unscaled and the most recent line is always drawn
+at the same place, so each letter is always drawn with exactly the same
+pixels. The line is split into letters at the empty columns between
+them, and each letter's pixels are looked up in a table of known
+letters, which is learned from screenshots by tools/train_chat_font.py.
+
+Decoding is skipped when the line hasn't changed since it was last read,
+so any number of chat conditions can be checked against a single read.
+
+"""
+import json
+import logging as log
+import os
+
+import numpy as np
+
+from ocvbot import misc
+
+# The glyph table, relative to the ocvbot directory.
+FONT_FILE = 'chat-font.json'
+
+# The (left, top, width, height) of the most recent line of the chat
+#   menu, relative to the client. The top excludes the descenders of the
+#   line above, and the bottom only includes the top row of this line's
+#   descenders, since a scrollbar can be drawn over the rows below it.
+LINE = (8, 445, 480, 11)
+# Pixels darker than this are part of a letter. Only black text, such as
+#   game messages, is read. Pixel values range from 0 to 255.
+TEXT_MAX = 60
+# A gap between letters at least this many pixels wide is a space.
+SPACE_WIDTH = 4
+# The character used for letters that aren't in the glyph table.
+UNKNOWN = '?'
+
+_glyphs = None
+_last_hash = None
+_last_text = ''
+
+
+def grab():
+    """
+    Captures the most recent line of the chat menu.
+
+    """
+    # Imported here so the glyph table can be learned from screenshots
+    #   without a running client.
+    from ocvbot import vision as vis
+    return vis.grab((vis.client_left + LINE[0], vis.client_top + LINE[1], LINE[2], LINE[3]))
+
+
+def glyph_key(columns):
+    """
+    Encodes a letter's pixels as a key into the glyph table.
+
+    Args:
+        columns (list): One int per column of the letter, with bit N set
+                        if the pixel in row N is part of the letter.
+
+    """
+    return ','.join(format(int(column), 'x') for column in columns)
+
+
+def segment(frame):
+    """
+    Splits a capture of the line into letters.
+
+    Args:
+        frame (array): An RGB capture of the line, as returned by grab().
+
+    Returns:
+        Returns a list containing the glyph_key() of each letter, or a
+        space for each gap between words.
+
+    """
+    return split(np.asarray(frame).max(axis=2) < TEXT_MAX)
+
+
+def split(text):
+    """
+    Splits text into letters at the empty columns between them. Also used
+    by orbs.py.
+
+    Args:
+        text (array): A 2D boolean array that's True where a pixel is part
+                      of a letter.
+
+    Returns:
+        See segment()'s docstring.
+
+    """
+    weights = 1 << np.arange(text.shape[0], dtype=np.int64)
+    columns = (text * weights[:, None]).sum(axis=0)
+
+    segments = []
+    letter = []
+    gap = 0
+    for column in columns:
+        if column == 0:
+            if letter:
+                segments.append(glyph_key(letter))
+                letter = []
+            gap += 1
+            continue
+        if gap >= SPACE_WIDTH and segments:
+            segments.append(' ')
+        gap = 0
+        letter.append(column)
+    if letter:
+        segments.append(glyph_key(letter))
+    return segments
+
+
+def load():
+    """
+    Loads the glyph table saved by tools/train_chat_font.py.
+
+    Returns:
+        Returns a dict mapping glyph_key()s to characters.
+
+    """
+    global _glyphs
+    if _glyphs is None:
+        _glyphs = {}
+        if os.path.exists(FONT_FILE):
+            with open(FONT_FILE) as file:
+                _glyphs = json.load(file)
+        else:
+            log.warning('No chat font found at %s, chat can\'t be read!', FONT_FILE)
+    return _glyphs
+
+
+def decode(frame):
+    """
+    Decodes a capture of the line, see recent().
+
+    """
+    glyphs = load()
+    return ''.join(segment_ if segment_ == ' ' else glyphs.get(segment_, UNKNOWN)
+                   for segment_ in segment(frame))
+
+
+def recent(frame=None):
+    """
+    Reads the most recent line of the chat menu.
+
+    Args:
+        frame (array): A capture of the line, as returned by grab(). If
+                       None, a new capture is taken, default is None.
+
+    Returns:
+        Returns the line's text as a string. Letters that aren't in the
+        glyph table are replaced with UNKNOWN.
+
+    """
+    global _last_hash, _last_text
+    if frame is None:
+        frame = grab()
+    row_hash = hash(np.ascontiguousarray(frame).tobytes())
+    if row_hash != _last_hash:
+        _last_text = decode(frame)
+        _last_hash = row_hash
+        log.debug('Most recent chat message is "%s"', _last_text)
+    return _last_text
+
+
+def wait_for(text, loop_num=10, loop_sleep_range=(0, 100)):
+    """
+    Waits for the most recent line of the chat menu to start with the
+    given text.
+
+    Args:
+        text (str): The text to wait for.
+        loop_num (int): The number of times to read the line, default is
+                        10.
+        loop_sleep_range (tuple): A 2-tuple containing the minimum and
+                                  maximum number of miliseconds to wait
+                                  between reads, default is (0, 100).
+
+    Returns:
+        Returns True if the text was found, False if otherwise.
+
+    """
+    for tries in range(1, loop_num + 1):
+        if recent().startswith(text) is True:
+            return True
+        if tries < loop_num:
+            misc.sleep_rand(*loop_sleep_range)
+    return False
@@ -2,17 +2,129 @@
 """
 Controls the mouse and keyboard.
 
+All input is sent from a single background thread, in the order it was
+submitted. Methods that send input take a "wait" argument. If wait is
+False, the method returns a concurrent.futures.Future as soon as the
+input has been queued, so the caller can keep searching for needles
+while the mouse cursor is still moving.
+
 """
+import concurrent.futures
 import logging as log
+import queue
 import random as rand
+import threading
+import time
+
+from ocvbot import backends, config, misc, trace, trajectory
+
+# All mouse and keyboard events are sent through this backend. See
+#   backends.py for more info. Configs from before the setting was added
+#   use PyAutoGUI.
+backend = backends.get_backend(config['main'].get('input_backend', 'pyautogui'))
+
+# The (X, Y) coordinates of the most recent mouse click, relative to the
+#   display, or None if the mouse hasn't been clicked yet. Used by
+#   vision.click_result() to check whether the click landed.
+last_click = None
+
+# Exceptions raised by actions that weren't waited for. They're logged as
+#   soon as they're raised, and re-raised by the next wait_for_input().
+errors = []
+
 
-import pyautogui as pag
-import pyclick as pyc
+class InputQueue:
+    """
+    Runs input actions one at a time on a background thread.
+
+    """
 
-from ocvbot import misc
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._worker, name='input', daemon=True)
+        self.thread.start()
+
+    def _worker(self):
+        while True:
+            future, function = self.queue.get()
+            if future.set_running_or_notify_cancel() is False:
+                continue
+            started = time.perf_counter()
+            try:
+                future.set_result(function())
+            except Exception as error:
+                future.set_exception(error)
+            if trace.enabled is True:
+                trace.add('input', started)
+
+    def submit(self, function):
+        """
+        Queues an action.
 
-# initialize HumanClicker object
-hc = pyc.HumanClicker()
+        Args:
+            function (callable): Called with no arguments on the input
+                                 thread.
+
+        Returns:
+            Returns a concurrent.futures.Future that completes once the
+            action has been performed.
+
+        """
+        future = concurrent.futures.Future()
+        self.queue.put((future, function))
+        return future
+
+
+executor = InputQueue()
+
+
+def _check_error(future):
+    """
+    Logs and remembers the exception raised by an action that wasn't
+    waited for, since nothing else would ever see it.
+
+    """
+    error = future.exception()
+    if error is not None:
+        log.error('Queued input raised %s: %s', type(error).__name__, error)
+        errors.append(error)
+
+
+def _submit(function, wait):
+    """
+    Queues an action, optionally waiting for it to be performed.
+
+    Returns:
+        If wait is True, returns the action's return value. If wait is
+        False, returns a concurrent.futures.Future.
+
+    """
+    future = executor.submit(function)
+    if wait is True:
+        started = time.perf_counter()
+        result = future.result()
+        if trace.enabled is True:
+            trace.add('input', started)
+        return result
+    future.add_done_callback(_check_error)
+    return future
+
+
+def wait_for_input():
+    """
+    Blocks until all queued input has been performed.
+
+    Raises:
+        Re-raises the first exception raised by any action queued with
+        wait=False since the last call.
+
+    """
+    result = _submit(lambda: True, wait=True)
+    if errors:
+        error = errors[0]
+        errors.clear()
+        raise error
+    return result
 
 
 class Mouse:
@@ -56,8 +168,10 @@ class Mouse:
         self.move_duration_range = move_duration_range
         self.action_duration_range = action_duration_range
         self.button = button
+        # Where the mouse was last moved to within self.region.
+        self.destination = None
 
-    def click_coord(self, move_away=False):
+    def click_coord(self, move_away=False, wait=True, check=None):
         """
         Clicks within the provided coordinates. If width and height are
         both 0, then this function will click in the exact same location
@@ -67,35 +181,112 @@ class Mouse:
             move_away (bool): Whether to move the mouse cursor a short
                               distance away from the coordinates that
                               were just clicked on, default is False.
+            wait (bool): Whether to wait for the click to be performed,
+                         see this module's docstring, default is True.
+            check (callable): See _play_click()'s docstring, default is
+                              None.
 
         """
-        self.move_to()
-        self.click()
+        def move_and_click():
+            # Send the move and the click as a single sequence.
+            events = self._move_events()
+            events += self._click_events(delay=events[-1][0])
+            return self._play_click(events, self.destination, check)
+
+        result = _submit(move_and_click, wait)
         if move_away is True:
-            self.region = (15, 15, 100, 100)
-            self.move_duration_range = (0, 500)
-            self.moverel()
-        return True
+            result = Mouse(region=(15, 15, 100, 100),
+                           move_duration_range=(0, 500)).moverel(wait=wait)
+        return result
 
-    def move_to(self):
+    def _move_events(self):
         """
-        Moves the mouse pointer to the specified coordinates. Coordinates
-        are based on the display's dimensions. Units are in pixels. Uses
-        Bezier curves to make mouse movement appear more human-like.
+        Builds the events to move the mouse to a random point within
+        self.region.
 
         """
         left, top, width, height = self.region
 
-        # hc.move uses a (x1, x2, y1, y2) coordinate format instead of a
-        #   (left, top, width, height) format.
         # x2 and y2 are obtained by adding width to left and height to top.
         x_coord = rand.randint(left, (left + width))
         y_coord = rand.randint(top, (top + height))
+        self.destination = (x_coord, y_coord)
 
-        hc.move((x_coord, y_coord), self.move_duration())
-        return True
+        return trajectory.engine.events(backend.position(), (x_coord, y_coord),
+                                        self.move_duration())
 
-    def moverel(self):
+    @staticmethod
+    def _play_click(events, position, check):
+        """
+        Sends the events of a click, see _click_events().
+
+        Args:
+            events (list): The events to send, ending with the randomized
+                           wait after the click.
+            position (tuple): The (X, Y) coordinates of the click.
+            check (callable): If given, called with no arguments as soon as
+                              the mouse button has been released, before
+                              the randomized wait after the click, such as
+                              vision.click_result(). Anything the client
+                              only shows for a moment after the click can
+                              be checked for before it's gone.
+
+        Returns:
+            Returns check's return value if check is given, otherwise
+            returns the backend's return value.
+
+        """
+        global last_click
+        if check is None:
+            result = backend.play(events)
+            last_click = position
+            return result
+
+        backend.play(events[:-1])
+        last_click = position
+        started = time.perf_counter()
+        result = check()
+        # Only wait for whatever's left of the wait after the click.
+        remaining = events[-1][0] - events[-2][0] - (time.perf_counter() - started)
+        backend.play([(max(remaining, 0.0), 'wait', None)])
+        return result
+
+    def _click_events(self, delay=0.0, hold=False):
+        """
+        Builds the events to click the mouse, including the randomized
+        waits before and after the click.
+
+        Args:
+            delay (float): The number of seconds after the start of the
+                           sequence at which the wait before the click
+                           begins, default is 0.
+            hold (bool): See click()'s docstring.
+
+        """
+        press = delay + misc.rand_seconds(self.sleep_range[0], self.sleep_range[1])
+        release = press
+        if hold is True:
+            release += misc.rand_seconds(min_seconds=self.action_duration_range[0],
+                                         max_seconds=self.action_duration_range[1])
+        done = release + misc.rand_seconds(self.sleep_range[2], self.sleep_range[3])
+        return [(press, 'button', (self.button, True)),
+                (release, 'button', (self.button, False)),
+                (done, 'wait', None)]
+
+    def move_to(self, wait=True):
+        """
+        Moves the mouse pointer to the specified coordinates. Coordinates
+        are based on the display's dimensions. Units are in pixels. Uses
+        Bezier curves to make mouse movement appear more human-like.
+
+        Args:
+            wait (bool): Whether to wait for the move to finish, see this
+                         module's docstring, default is True.
+
+        """
+        return _submit(lambda: backend.play(self._move_events()), wait)
+
+    def moverel(self, wait=True):
         """
         Moves the mouse in a random direction, relative to its current
         position. Uses left/width to determinie the minimum and maximum
@@ -106,9 +297,16 @@ class Mouse:
         the minimum X distance and whichever of the two values is higher
         will be used as the maximum X distance. Same for top/height.
 
+        Args:
+            wait (bool): Whether to wait for the move to finish, see this
+                         module's docstring, default is True.
+
         """
+        return _submit(self._moverel, wait)
+
+    def _moverel(self):
         left, top, width, height = self.region
-        (x_position, y_position) = pag.position()
+        (x_position, y_position) = backend.position()
 
         # Get min and max values based on the provided ltwh coordinates.
         x_min = min(left, width)
@@ -129,8 +327,9 @@ class Mouse:
         if (rand.randint(1, 2)) == 2:
             y_destination = y_position - y_distance
 
-        hc.move((x_destination, y_destination), self.move_duration())
-        return True
+        return backend.play(trajectory.engine.events((x_position, y_position),
+                                                     (x_destination, y_destination),
+                                                     self.move_duration()))
 
     def move_duration(self):
         """
@@ -145,7 +344,7 @@ class Mouse:
         move_duration_var = misc.rand_seconds(min_seconds=move_durmin, max_seconds=move_durmax)
         return move_duration_var
 
-    def click(self, hold=False):
+    def click(self, hold=False, wait=True, check=None):
         """
         Clicks the left or right mouse button, waiting both before and
         after for a randomized period of time.
@@ -156,21 +355,39 @@ class Mouse:
                          Uses self.action_duration_range to determine
                          the minimum and maximum duration to hold down
                          the mouse button.
+            wait (bool): Whether to wait for the click to be performed,
+                         see this module's docstring, default is True.
+            check (callable): See _play_click()'s docstring, default is
+                              None.
 
         """
-        # Random sleep before click.
-        misc.sleep_rand(sleep_min=self.sleep_range[0], sleep_max=self.sleep_range[1])
+        def click_in_place():
+            return self._play_click(self._click_events(hold=hold), backend.position(), check)
 
-        if hold is True:
-            duration = misc.rand_seconds(min_seconds=self.action_duration_range[0],
-                                         max_seconds=self.action_duration_range[1])
-            pag.click(button=self.button, duration=duration)
-        else:
-            pag.click(button=self.button)
+        return _submit(click_in_place, wait)
+
+    def scroll(self, clicks, wait=True):
+        """
+        Moves the mouse cursor to a random point within self.region, then
+        turns the mouse wheel, waiting before and after for a randomized
+        period of time.
 
-        # Random sleep after click.
-        misc.sleep_rand(sleep_min=self.sleep_range[2], sleep_max=self.sleep_range[3])
-        return True
+        Args:
+            clicks (int): The number of notches to turn the mouse wheel.
+                          Positive values scroll up, negative values
+                          scroll down.
+            wait (bool): Whether to wait for the scroll to be performed,
+                         see this module's docstring, default is True.
+
+        """
+        def move_and_scroll():
+            events = self._move_events()
+            scroll = events[-1][0] + misc.rand_seconds(self.sleep_range[0], self.sleep_range[1])
+            done = scroll + misc.rand_seconds(self.sleep_range[2], self.sleep_range[3])
+            events += [(scroll, 'scroll', clicks), (done, 'wait', None)]
+            return backend.play(events)
+
+        return _submit(move_and_scroll, wait)
 
 
 class Keyboard:
@@ -204,37 +421,82 @@ class Keyboard:
         self.action_duration_range = action_duration_range
         self.log = log_keys
 
-    def typewriter(self, message):
+    def typewriter(self, message, wait=True):
         """
         Types out the specified message with a randomized delay between
         each key press.
 
         Args:
             message (str): The message to type.
+            wait (bool): Whether to wait for the message to be typed, see
+                         this module's docstring, default is True.
 
         """
         self.sleep_range = (0, 20, 0, 20)
         self.action_duration_range = (1, 50)
+        # Send the whole message as a single sequence.
+        events = []
         for key in message:
-            self.keypress(key)
-        return True
+            events += self._keypress_events(key, delay=events[-1][0] if events else 0.0)
+        return _submit(lambda: backend.play(events), wait)
 
-    def keypress(self, key):
+    def keypress(self, key, wait=True):
         """
         Presses the specified key.
 
         Args:
             key (str): The key on the keyboard to press, according to
                        PyAutoGUI.
+            wait (bool): Whether to wait for the key press to be
+                         performed, see this module's docstring, default
+                         is True.
+
+        """
+        events = self._keypress_events(key)
+        return _submit(lambda: backend.play(events), wait)
+
+    def hold(self, key, wait=True):
+        """
+        Holds down the specified key until release() is called. Useful
+        for modifier keys, like holding Shift to drop items.
+
+        Args:
+            key (str): See keypress()'s docstring.
+            wait (bool): See keypress()'s docstring.
+
+        """
+        return _submit(lambda: backend.play([(0.0, 'key', (key, True))]), wait)
+
+    def release(self, key, wait=True):
+        """
+        Releases a key that was held down with hold().
+
+        Args:
+            key (str): See keypress()'s docstring.
+            wait (bool): See keypress()'s docstring.
+
+        """
+        return _submit(lambda: backend.play([(0.0, 'key', (key, False))]), wait)
+
+    def _keypress_events(self, key, delay=0.0):
+        """
+        Builds the events to press the specified key, including the
+        randomized waits before, during, and after the key press.
+
+        Args:
+            key (str): See keypress()'s docstring.
+            delay (float): The number of seconds after the start of the
+                           sequence at which the wait before the key press
+                           begins, default is 0.
 
         """
         if self.log is True:
             log.debug('Pressing key: %s.', key)
 
-        misc.sleep_rand(sleep_min=self.sleep_range[0], sleep_max=self.sleep_range[1])
-        pag.keyDown(key)
-        misc.sleep_rand(sleep_min=self.action_duration_range[0],
-                        sleep_max=self.action_duration_range[1])
-        pag.keyUp(key)
-        misc.sleep_rand(sleep_min=self.sleep_range[2], sleep_max=self.sleep_range[3])
-        return True
+        press = delay + misc.rand_seconds(self.sleep_range[0], self.sleep_range[1])
+        release = press + misc.rand_seconds(self.action_duration_range[0],
+                                            self.action_duration_range[1])
+        done = release + misc.rand_seconds(self.sleep_range[2], self.sleep_range[3])
+        return [(press, 'key', (key, True)),
+                (release, 'key', (key, False)),
+                (done, 'wait', None)]
@@ -0,0 +1,97 @@
+# coding=UTF-8
+"""
+Model of the player's inventory.
+
+The inventory's 28 slots are always drawn in the same places, so a single
+capture of vision.inv is split into slots and each slot is compared
+against an item's needle. This makes it possible to count items every
+frame, rather than repeatedly searching for a single needle.
+
+"""
+from ocvbot import vision as vis
+
+# Offset of the top-left corner of the first slot relative to the
+#   inventory, the size of each slot, and the distance between the
+#   top-left corners of adjacent slots. Units are in pixels.
+SLOT_LEFT = 15
+SLOT_TOP = 8
+SLOT_WIDTH = 36
+SLOT_HEIGHT = 32
+SLOT_SPACING_X = 42
+SLOT_SPACING_Y = 36
+COLUMNS = 4
+SLOTS = 28
+# Each slot is searched this many pixels past its edges, so items that
+#   are drawn slightly off-center still fit.
+SLOT_MARGIN = 2
+
+
+def slot_region(index):
+    """
+    Gets the (left, top, width, height) of a slot relative to the display.
+
+    Args:
+        index (int): The index of the slot, counting left to right, then
+                     top to bottom.
+
+    """
+    return (vis.inv_left + SLOT_LEFT + SLOT_SPACING_X * (index % COLUMNS),
+            vis.inv_top + SLOT_TOP + SLOT_SPACING_Y * (index // COLUMNS),
+            SLOT_WIDTH, SLOT_HEIGHT)
+
+
+def slots(frame=None):
+    """
+    Splits a capture of the inventory into slots.
+
+    Args:
+        frame (array): A capture of vision.inv, as returned by
+                       vision.grab(). If None, a new capture is taken,
+                       default is None.
+
+    Returns:
+        Returns a list of 28 arrays, one per slot, each including
+        SLOT_MARGIN pixels past the slot's edges.
+
+    """
+    if frame is None:
+        frame = vis.grab(vis.inv)
+    crops = []
+    for index in range(SLOTS):
+        left, top, width, height = slot_region(index)
+        left -= vis.inv_left + SLOT_MARGIN
+        top -= vis.inv_top + SLOT_MARGIN
+        crops.append(frame[max(top, 0):top + height + 2 * SLOT_MARGIN,
+                           max(left, 0):left + width + 2 * SLOT_MARGIN])
+    return crops
+
+
+def find(needle, frame=None, conf=0.95):
+    """
+    Finds every slot holding an item.
+
+    Args:
+        needle (file): Filepath to the item as it appears in the
+                       inventory.
+        frame (array): See slots()'s docstring.
+        conf (float): The similarity required to consider a slot to hold
+                      the item, expressed as a decimal <= 1, default is
+                      0.95.
+
+    Returns:
+        Returns a list of the indexes of the slots holding the item.
+
+    """
+    return [index for index, slot in enumerate(slots(frame))
+            if vis.slot_match(slot, needle) >= conf]
+
+
+def count(needle, frame=None, conf=0.95):
+    """
+    Counts the slots holding an item. See find()'s docstring.
+
+    Returns:
+        Returns the number of slots as an int.
+
+    """
+    return len(find(needle, frame, conf))
@@ -0,0 +1,235 @@
+# coding=UTF-8
+"""
+Sets up logging so the bot thread never waits on log output.
+
+Log records are put on a queue by the bot thread and formatted and
+written by a background thread, so a slow terminal or disk can't delay
+input timing or vision polling.
+
+Records are formatted when they're written, not when they're logged, so
+an argument that's changed in between, such as a list or a NumPy array,
+is logged as it was when it was written. Arguments that can be changed
+are formatted right away, see _QueueHandler.
+
+Records can also be kept in a compact binary ring buffer, see RingLog,
+which holds the most recent RING_SLOTS records in a fixed-size file and
+is decoded offline with tools/decode_log.py. The ring buffer is kept
+across restarts, so the records leading up to a crash can still be read
+after the bot has been started again.
+
+This module only uses the standard library, so tools/decode_log.py can
+load it without importing the ocvbot package.
+
+"""
+import atexit
+import json
+import logging as log
+import logging.handlers
+import mmap
+import os
+import queue
+import struct
+
+# The format log messages are written in.
+FORMAT = '%(asctime)s %(filename)s.%(funcName)s - %(message)s'
+
+# The ring buffer's file, and the file its message templates are saved
+#   to, relative to the ocvbot directory.
+RING_FILE = 'log.ring'
+TEMPLATES_FILE = 'log.ring.json'
+# The number of records the ring buffer holds, and the number of bytes
+#   each record takes up. Arguments that don't fit are cut off.
+RING_SLOTS = 65536
+SLOT_SIZE = 128
+# Each slot starts with the record's sequence number, time, level,
+#   template ID and the length of its arguments, followed by the
+#   arguments as JSON.
+SLOT_HEADER = struct.Struct('<IdBHH')
+# Arguments of these types can't be changed once they've been logged, so
+#   they're safe to format on the background thread.
+IMMUTABLE_TYPES = (str, int, float, bool, type(None), bytes)
+
+listener = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the queue without formatting them, so formatting is
+    done on the background thread instead of the bot thread. Records with
+    arguments that could be changed before they're written, such as
+    lists, dicts, NumPy arrays or other objects, are formatted right away
+    instead, so they're logged as they were when they were logged.
+
+    """
+
+    def prepare(self, record):
+        # Tracebacks are formatted right away, since they can't be
+        #   formatted once the exception has been handled.
+        if record.exc_info:
+            record.exc_text = log.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if record.args and not _immutable(record.args):
+            record.msg = record.getMessage()
+            record.args = None
+            record.preformatted = True
+        return record
+
+
+def _immutable(args):
+    """
+    Checks whether a record's arguments can't be changed once they've
+    been logged.
+
+    """
+    if isinstance(args, dict):
+        args = args.values()
+    return all(isinstance(arg, IMMUTABLE_TYPES) or
+               (isinstance(arg, tuple) and _immutable(arg)) for arg in args)
+
+
+class RingLog(log.Handler):
+    """
+    Writes records to a fixed-size file of RING_SLOTS slots, overwriting
+    the oldest record once the file is full. Each message template, such
+    as 'Found %s after trying %s times.', is only saved once, to
+    TEMPLATES_FILE.
+
+    If the file already exists, new records are written after the ones
+    already in it, so the previous run's records are kept until they're
+    overwritten.
+
+    Args:
+        path (file): The ring buffer's file, default is RING_FILE.
+        templates_path (file): The template file, default is
+                               TEMPLATES_FILE.
+
+    """
+
+    def __init__(self, path=RING_FILE, templates_path=TEMPLATES_FILE):
+        super().__init__()
+        self.templates_path = templates_path
+        self.templates = {}
+        self.sequence = 0
+
+        # Keep the previous run's records if they can still be decoded.
+        resume = os.path.exists(templates_path) and os.path.exists(path) and \
+            os.path.getsize(path) == RING_SLOTS * SLOT_SIZE
+        if resume is True:
+            with open(templates_path) as file:
+                self.templates = {template: int(template_id)
+                                  for template_id, template in json.load(file).items()}
+        else:
+            with open(path, 'wb') as file:
+                file.truncate(RING_SLOTS * SLOT_SIZE)
+        self.file = open(path, 'r+b')
+        self.ring = mmap.mmap(self.file.fileno(), RING_SLOTS * SLOT_SIZE)
+        if resume is True:
+            self.sequence = max(SLOT_HEADER.unpack_from(self.ring, offset)[0]
+                                for offset in range(0, RING_SLOTS * SLOT_SIZE, SLOT_SIZE))
+
+    def _template_id(self, record, message):
+        template = '%s.%s - %s' % (record.filename, record.funcName, message)
+        template_id = self.templates.get(template)
+        if template_id is None:
+            template_id = self.templates[template] = len(self.templates)
+            # New templates are rare, so saving the whole table each time
+            #   is cheap.
+            with open(self.templates_path, 'w') as file:
+                json.dump({template_id: template for template, template_id
+                           in self.templates.items()}, file, indent=4)
+        return template_id
+
+    def emit(self, record):
+        try:
+            message, args = record.msg, record.args
+            # Messages formatted by _QueueHandler are saved as arguments,
+            #   so each one doesn't become a new template.
+            if getattr(record, 'preformatted', False) is True:
+                message, args = '%s', (record.msg,)
+            args = json.dumps(args, default=repr).encode()[:SLOT_SIZE - SLOT_HEADER.size]
+            template_id = self._template_id(record, message)
+            self.sequence += 1
+            offset = (self.sequence % RING_SLOTS) * SLOT_SIZE
+            self.ring[offset:offset + SLOT_HEADER.size] = SLOT_HEADER.pack(
+                self.sequence, record.created, record.levelno, template_id, len(args))
+            start = offset + SLOT_HEADER.size
+            self.ring[start:start + len(args)] = args
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.ring.close()
+        self.file.close()
+        super().close()
+
+
+def setup(level, ring=False):
+    """
+    Sends all log records through a queue to a background thread.
+
+    Args:
+        level (str): The log level, such as 'INFO'.
+        ring (bool): Whether to also write records to a RingLog, default
+                     is False.
+
+    """
+    global listener
+    log_queue = queue.SimpleQueue()
+    stream = log.StreamHandler()
+    stream.setFormatter(log.Formatter(FORMAT))
+    handlers = [stream]
+    if ring is True:
+        handlers.append(RingLog())
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    log.basicConfig(level=level, handlers=[_QueueHandler(log_queue)])
+    # Write whatever is still on the queue before exiting.
+    atexit.register(stop)
+    return listener
+
+
+def stop():
+    """
+    Writes every record still on the queue and stops the background
+    thread. Records logged afterwards are queued but never written.
+
+    """
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+
+def decode(path=RING_FILE, templates_path=TEMPLATES_FILE):
+    """
+    Decodes a RingLog's file.
+
+    Returns:
+        Returns a list of (time, level, message) tuples, oldest first.
+
+    """
+    with open(templates_path) as file:
+        templates = {int(template_id): template
+                     for template_id, template in json.load(file).items()}
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    records = []
+    for offset in range(0, len(data), SLOT_SIZE):
+        sequence, created, level, template_id, length = \
+            SLOT_HEADER.unpack_from(data, offset)
+        if sequence == 0:
+            continue
+        start = offset + SLOT_HEADER.size
+        template = templates.get(template_id, '?')
+        try:
+            args = json.loads(data[start:start + length].decode())
+            message = template % (tuple(args) if isinstance(args, list) else args) \
+                if args else template
+        except (ValueError, TypeError):
+            # The arguments were cut off or don't match the template.
+            message = template + ' ' + data[start:start + length].decode(errors='replace')
+        records.append((sequence, created, log.getLevelName(level), message))
+    records.sort()
+    return [record[1:] for record in records]
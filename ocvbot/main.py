@@ -20,7 +20,8 @@ configuration settings in each scenario.
 import logging as log
 import sys
 
-from ocvbot import skills, behavior, vision as vis, startup as start, misc
+from ocvbot import skills, behavior, vision as vis, startup as start, misc, retry, bank, \
+    stats
 
 
 def miner(scenario):
@@ -67,7 +68,8 @@ def miner(scenario):
                                            prefix + 'west-empty.png')],
                                    ore='./needles/items/iron-ore.png',
                                    position=([((240, 399), 1, (4, 4), (5, 10))],
-                                             './haystacks/varrock-east-mine.png'))
+                                             './haystacks/varrock-east-mine.png'),
+                                   scenario=scenario)
 
             bank_from_mine = ([((253, 181), 5, (35, 35), (1, 6)),
                                ((112, 158), 5, (20, 20), (1, 6)),
@@ -83,7 +85,8 @@ def miner(scenario):
                                            prefix + 'east-empty.png'),
                                           (prefix + 'south-full.png',
                                            prefix + 'south-empty.png')],
-                                   ore='./needles/items/copper-ore.png')
+                                   ore='./needles/items/copper-ore.png',
+                                   scenario=scenario)
 
         elif scenario == 'al-kharid-mine':
             drop_ore = True  # Banking not supported.
@@ -94,7 +97,8 @@ def miner(scenario):
                                           (prefix + 'south-full.png',
                                            prefix + 'south-empty.png')],
                                    ore='./needles/items/iron-ore.png',
-                                   conf=(0.95, 0.95))
+                                   conf=(0.95, 0.95),
+                                   scenario=scenario)
         else:
             raise Exception('Scenario not supported!')
 
@@ -102,6 +106,8 @@ def miner(scenario):
 
             elapsed_time = misc.session_duration(human_readable=True)
             log.info('Script has been running for %s (HH:MM:SS)', elapsed_time)
+            stats.count('inventories')
+            stats.report()
 
             if drop_ore is True:
                 mining.drop_inv_ore()
@@ -143,10 +149,11 @@ def spellcaster(scenario):
         spell = './needles/side-stones/spellbook/curse.png'
         target = './needles/game-screen/varrock/monk-of-zamorak.png'
         haystack_map = './haystacks/varrock-castle.png'
+        magic = skills.Magic(spell=spell, target=target, logout=True,
+                             conf=0.75, region=vis.game_screen)
         for _ in range(10000):
             behavior.travel([((75, 128), 1, (4, 4), (5, 10))], haystack_map)
-            skills.Magic(spell=spell, target=target, logout=True,
-                         conf=0.75, region=vis.game_screen).cast_spell()
+            magic.cast_spell()
 
     # Casts high-level alchemy on all noted items in the left half of the
     #   player's inventory
@@ -158,11 +165,14 @@ def spellcaster(scenario):
         else:
             target = './needles/items/' + item + '.png'
         behavior.open_side_stone('spellbook')
+        # Use the same object for every cast so the locations of the spell
+        #   and the item are remembered between casts.
+        magic = skills.Magic(spell=spell, target=target,
+                             inventory=True, logout=False,
+                             conf=0.5, region=vis.inv_left_half,
+                             move_duration_range=(0, 200))
         for _ in range(10000):
-            spell_cast = skills.Magic(spell=spell, target=target,
-                                      inventory=True, logout=False,
-                                      conf=0.5, region=vis.inv_left_half,
-                                      move_duration_range=(0, 200)).cast_spell()
+            spell_cast = magic.cast_spell()
             if spell_cast is False:
                 if start.config['magic']['logout'] is True:
                     behavior.logout()
@@ -220,17 +230,13 @@ def chef(item, location):
         # Withdraw raw food from bank.
         # Conf is higher than default because raw food looks very
         #   similar to cooked food.
-        # TODO: If item cannot be found in the bank, click the down arrow
-        #   in the bank window until item is found.
-        raw_food_withdraw = vis.Vision(region=vis.game_screen,
-                                       needle=item_bank,
-                                       loop_num=3, conf=0.98).click_needle()
+        raw_food_withdraw = bank.withdraw(item_bank, conf=0.98)
         if raw_food_withdraw is False:
             raise Exception('Cannot find raw food in bank!')
         # Wait for raw food to appear in inventory
-        raw_food_in_inv = vis.Vision(region=vis.inv,
-                                     needle=item_inv,
-                                     loop_num=30, conf=0.99).wait_for_needle()
+        raw_food_in_inv = vis.Vision(region=vis.inv, needle=item_inv, conf=0.99,
+                                     retry_policy=retry.policy('withdraw-item', tries=30)) \
+            .wait_for_needle()
         misc.sleep_rand_roll(chance_range=(10, 20), sleep_range=(100, 10000))
         if raw_food_in_inv is False:
             raise Exception('Cannot find items in inventory!')
@@ -238,6 +244,8 @@ def chef(item, location):
         behavior.travel(range_coords, haystack_map)
         # Cook food.
         skills.Cooking(item_inv, item_bank, heat_source).cook_item()
+        stats.count('inventories')
+        stats.report()
         # Go back to bank.
         behavior.travel(bank_coords, haystack_map)
         # Open bank window.
@@ -0,0 +1,474 @@
+# coding=UTF-8
+"""
+Tracks the state of every rock at a mining spot.
+
+A single capture of the game screen is taken per update, and the state of
+every rock is read from that one capture. Once a rock has been found,
+only a small window around its last known position is searched.
+
+Full and empty rocks differ mostly by the color of their ore veins. Once
+a rock has been found with its needles, its position is fixed and its
+state is read from the hue and saturation histogram of that patch of the
+screen instead, which is much faster than template matching and isn't
+thrown off by the camera drifting a few pixels. The needles are only used
+again when the histogram doesn't clearly match either state.
+
+Each rock also learns how long it takes to respawn from the times it has
+been seen going from empty to full. Once every rock is empty, the game
+screen is only checked often while a rock is predicted to respawn.
+Learned respawn times are saved at most once every SAVE_INTERVAL seconds,
+and when the bot exits, so the hot loop doesn't wait on the disk.
+
+"""
+import atexit
+import collections
+import json
+import logging as log
+import os
+import time
+
+import cv2
+import numpy as np
+
+from ocvbot import input, trace, vision as vis
+
+FULL = 'full'
+EMPTY = 'empty'
+
+# How far past a rock's last known position to search for it, in pixels.
+SEARCH_MARGIN = 20
+
+# The number of hue and saturation bins in each rock's color histogram.
+HUE_BINS = 16
+SATURATION_BINS = 4
+# A patch is only classified by its histogram if it's within this
+#   distance of one state's histogram and at least HISTOGRAM_MARGIN closer
+#   to it than to the other state's. Distances range from 0 to 1.
+MAX_HISTOGRAM_DISTANCE = 0.35
+HISTOGRAM_MARGIN = 0.2
+# If a rock's needle is found more than this many pixels from where it
+#   was anchored, the rock's empty histogram is relearned.
+ANCHOR_DRIFT = 5
+
+# Where learned respawn times are saved, relative to the ocvbot directory.
+RESPAWN_FILE = 'respawn-times.json'
+# The number of respawn times to remember per rock.
+RESPAWN_HISTORY = 50
+# The number of respawn times needed before respawns are predicted.
+MIN_RESPAWN_SAMPLES = 3
+# The number of seconds to widen each predicted respawn window by.
+RESPAWN_MARGIN = 0.5
+# The minimum number of seconds between saves of the respawn times.
+SAVE_INTERVAL = 60
+
+# While waiting for a rock to respawn, the mouse waits in a strip
+#   HOVER_SIZE pixels tall, HOVER_GAP pixels below the rock, so the cursor
+#   doesn't cover the patch the rock's state is read from. The cursor is
+#   drawn below the point it's at, and is about CURSOR_HEIGHT pixels tall,
+#   which matters if the strip has to go above the rock instead.
+HOVER_GAP = 5
+HOVER_SIZE = 10
+CURSOR_HEIGHT = 20
+
+# The minimum and maximum number of miliseconds to wait between updates
+#   while a rock is full or respawns can't be predicted yet, and while a
+#   rock is inside its predicted respawn window.
+POLL_RANGE = (100, 200)
+FAST_POLL_RANGE = (20, 50)
+# The maximum number of miliseconds to wait between updates while every
+#   rock is empty and none is predicted to respawn yet.
+MAX_IDLE_POLL = 1000
+
+
+class Rock:
+    """
+    A single rock.
+
+    Args:
+        full_needle (file): Filepath to a needle of the rock in its "full"
+                            state.
+        empty_needle (file): Filepath to a needle of the same rock in its
+                             "empty" state.
+        conf (tuple): A 2-tuple containing the confidence required to
+                      match the full needle and the empty needle, default
+                      is (0.8, 0.85).
+
+    """
+
+    def __init__(self, full_needle, empty_needle, conf=(0.8, 0.85)):
+        self.name = full_needle
+        self.full_needle = full_needle
+        self.empty_needle = empty_needle
+        self.conf = conf
+        # The (left, top, width, height) of the full needle the last time
+        #   the rock was seen full, relative to the game screen.
+        self.region = None
+        # The (X, Y) center of the rock the last time it was seen,
+        #   relative to the game screen.
+        self.center = None
+        # FULL, EMPTY, or None if the rock can't be seen.
+        self.state = None
+        self.changed_at = time.monotonic()
+        # When the rock was last seen being emptied, and the number of
+        #   seconds it took to respawn the previous times.
+        self.emptied_at = None
+        self.respawn_times = collections.deque(maxlen=RESPAWN_HISTORY)
+        # The color histograms of the rock's region while full and while
+        #   empty, or None until they've been seen.
+        self.full_histogram = None
+        self.empty_histogram = None
+
+    def _window(self, frame):
+        """
+        Gets the (left, top) of the area of the frame to search for the
+        rock in, and that area.
+
+        """
+        if self.center is None:
+            return (0, 0), frame
+        full_height, full_width = vis.load_needle(self.full_needle).shape[:2]
+        empty_height, empty_width = vis.load_needle(self.empty_needle).shape[:2]
+        # The full and empty needles may not be centered on the same
+        #   point, so allow for either needle's whole size.
+        half_width = max(full_width, empty_width) + SEARCH_MARGIN
+        half_height = max(full_height, empty_height) + SEARCH_MARGIN
+        left = max(0, self.center[0] - half_width)
+        top = max(0, self.center[1] - half_height)
+        return (left, top), frame[top:self.center[1] + half_height,
+                                  left:self.center[0] + half_width]
+
+    @staticmethod
+    def _match(window, needle):
+        """
+        Gets the best match of a needle within a window.
+
+        Returns:
+            Returns a 2-tuple containing the similarity and the (left, top)
+            of the match within the window.
+
+        """
+        pixels = vis.load_needle(needle)
+        if window.shape[0] < pixels.shape[0] or window.shape[1] < pixels.shape[1]:
+            return 0.0, (0, 0)
+        started = time.perf_counter()
+        result = cv2.matchTemplate(np.ascontiguousarray(window), pixels, cv2.TM_CCOEFF_NORMED)
+        _, score, _, location = cv2.minMaxLoc(result)
+        if trace.enabled is True:
+            trace.add('vision', started)
+        return score, location
+
+    @staticmethod
+    def _histogram(pixels):
+        """
+        Gets the normalized hue and saturation histogram of an RGB image,
+        as a 1-dimensional NumPy array.
+
+        """
+        hsv = cv2.cvtColor(np.ascontiguousarray(pixels), cv2.COLOR_RGB2HSV)
+        histogram = cv2.calcHist([hsv], [0, 1], None, [HUE_BINS, SATURATION_BINS],
+                                 [0, 180, 0, 256]).ravel()
+        return histogram / max(histogram.sum(), 1)
+
+    def _patch(self, frame):
+        """
+        Gets the area of the frame the rock was anchored to.
+
+        """
+        left, top, width, height = self.region
+        return frame[top:top + height, left:left + width]
+
+    def _classify_patch(self, frame):
+        """
+        Reads the rock's state from the color histogram of the patch it was
+        anchored to.
+
+        Returns:
+            Returns FULL or EMPTY, or None if the rock hasn't been anchored
+            yet or the patch doesn't clearly match either state.
+
+        """
+        if self.region is None or self.full_histogram is None \
+                or self.empty_histogram is None:
+            return None
+        histogram = self._histogram(self._patch(frame))
+        # Half the L1 distance, so distances range from 0 to 1.
+        full_distance = 0.5 * np.abs(histogram - self.full_histogram).sum()
+        empty_distance = 0.5 * np.abs(histogram - self.empty_histogram).sum()
+        if min(full_distance, empty_distance) > MAX_HISTOGRAM_DISTANCE \
+                or abs(full_distance - empty_distance) < HISTOGRAM_MARGIN:
+            return None
+        return FULL if full_distance < empty_distance else EMPTY
+
+    def _match_templates(self, frame):
+        """
+        Reads the rock's state by searching for its needles, anchoring the
+        rock and learning its histograms along the way.
+
+        Returns:
+            Returns FULL, EMPTY, or None if neither needle was found.
+
+        """
+        (window_left, window_top), window = self._window(frame)
+        full_score, full_location = self._match(window, self.full_needle)
+        empty_score, empty_location = self._match(window, self.empty_needle)
+
+        if full_score >= self.conf[0] and full_score >= empty_score:
+            height, width = vis.load_needle(self.full_needle).shape[:2]
+            left = window_left + full_location[0]
+            top = window_top + full_location[1]
+            if self.region is None or max(abs(left - self.region[0]),
+                                          abs(top - self.region[1])) > ANCHOR_DRIFT:
+                # The rock has moved, so what it looks like while empty
+                #   needs to be learned again.
+                self.empty_histogram = None
+            self.region = (left, top, width, height)
+            self.full_histogram = self._histogram(self._patch(frame))
+            self.center = (left + width // 2, top + height // 2)
+            return FULL
+
+        if empty_score >= self.conf[1]:
+            height, width = vis.load_needle(self.empty_needle).shape[:2]
+            left = window_left + empty_location[0]
+            top = window_top + empty_location[1]
+            self.center = (left + width // 2, top + height // 2)
+            if self.region is not None and self.empty_histogram is None:
+                region_left, region_top, region_width, region_height = self.region
+                if region_left <= self.center[0] < region_left + region_width and \
+                        region_top <= self.center[1] < region_top + region_height:
+                    self.empty_histogram = self._histogram(self._patch(frame))
+            return EMPTY
+
+        # Search the whole game screen next time.
+        self.center = None
+        return None
+
+    def update(self, frame):
+        """
+        Reads the rock's state from a capture of the game screen.
+
+        Args:
+            frame (array): A capture of vision.game_screen, as returned by
+                           vision.grab().
+
+        Returns:
+            Returns FULL, EMPTY, or None if the rock can't be seen, such as
+            when another player is standing in front of it.
+
+        """
+        state = self._classify_patch(frame)
+        if state is None:
+            state = self._match_templates(frame)
+
+        if state is not None and state != self.state:
+            self._record_transition(state)
+        if state != self.state:
+            log.debug('%s changed from %s to %s', self.name, self.state, state)
+            self.state = state
+            self.changed_at = time.monotonic()
+        return state
+
+    def _record_transition(self, state):
+        """
+        Learns the rock's respawn time from it changing state. The rock
+        may be hidden in between, such as by another player.
+
+        """
+        now = time.monotonic()
+        if state == EMPTY and self.state == FULL:
+            self.emptied_at = now
+        elif state == FULL and self.emptied_at is not None:
+            self.respawn_times.append(now - self.emptied_at)
+            log.debug('%s respawned after %.1f seconds.', self.name, self.respawn_times[-1])
+            self.emptied_at = None
+
+    def respawn_window(self):
+        """
+        Predicts when the rock will respawn.
+
+        Returns:
+            Returns a 2-tuple containing the earliest and latest times, as
+            time.monotonic() values, at which the rock is expected to
+            respawn. Returns None if the rock isn't empty or not enough
+            respawns have been seen yet.
+
+        """
+        if self.state != EMPTY or self.emptied_at is None \
+                or len(self.respawn_times) < MIN_RESPAWN_SAMPLES:
+            return None
+        ordered = sorted(self.respawn_times)
+        earliest = ordered[int(0.1 * (len(ordered) - 1))]
+        latest = ordered[int(round(0.9 * (len(ordered) - 1)))]
+        return (self.emptied_at + earliest - RESPAWN_MARGIN,
+                self.emptied_at + latest + RESPAWN_MARGIN)
+
+    def click_region(self):
+        """
+        Gets the region to click on to mine the rock.
+
+        Returns:
+            Returns a (left, top, width, height) 4-tuple relative to the
+            display.
+
+        """
+        left, top, width, height = self.region
+        return vis.game_screen_left + left, vis.game_screen_top + top, width, height
+
+    def hover_region(self):
+        """
+        Gets the region to move the mouse to while waiting for the rock to
+        respawn. The region is just outside the rock, so the rock can be
+        clicked on quickly without the cursor changing what it looks like.
+
+        Returns:
+            Returns a (left, top, width, height) 4-tuple relative to the
+            display.
+
+        """
+        left, top, width, height = self.click_region()
+        below = top + height + HOVER_GAP
+        if below + HOVER_SIZE + CURSOR_HEIGHT <= vis.game_screen_top + vis.game_screen[3]:
+            return left, below, width, HOVER_SIZE
+        return left, top - CURSOR_HEIGHT - HOVER_GAP - HOVER_SIZE, width, HOVER_SIZE
+
+
+class Scheduler:
+    """
+    Decides which rock to mine next, and how often to check the rocks.
+
+    Args:
+        rocks (list): A list of Rock objects.
+        scenario (str): The name of the mining spot. Respawn times are
+                        saved to RESPAWN_FILE under this name. If None,
+                        respawn times are not saved, default is None.
+
+    """
+
+    def __init__(self, rocks, scenario=None):
+        self.rocks = rocks
+        self.scenario = scenario
+        # Whether respawn times have been learned since they were last
+        #   saved, and when they were last saved.
+        self.unsaved = False
+        self.saved_at = time.monotonic()
+        if scenario is not None:
+            self.load()
+            atexit.register(self.flush)
+
+    def load(self):
+        """
+        Loads the respawn times saved for this scenario.
+
+        """
+        if not os.path.exists(RESPAWN_FILE):
+            return
+        with open(RESPAWN_FILE) as file:
+            saved = json.load(file).get(self.scenario, {})
+        for rock in self.rocks:
+            rock.respawn_times.extend(saved.get(rock.name, []))
+
+    def save(self):
+        """
+        Saves the respawn times of every rock, keeping those saved for
+        other scenarios.
+
+        """
+        saved = {}
+        if os.path.exists(RESPAWN_FILE):
+            with open(RESPAWN_FILE) as file:
+                saved = json.load(file)
+        saved[self.scenario] = {rock.name: [round(respawn, 2) for respawn in rock.respawn_times]
+                                for rock in self.rocks}
+        with open(RESPAWN_FILE, 'w') as file:
+            json.dump(saved, file, indent=4)
+        self.unsaved = False
+        self.saved_at = time.monotonic()
+
+    def flush(self):
+        """
+        Saves the respawn times if any have been learned since they were
+        last saved.
+
+        """
+        if self.unsaved is True:
+            self.save()
+
+    def update(self):
+        """
+        Updates the state of every rock from a single capture of the game
+        screen.
+
+        Returns:
+            Returns the capture.
+
+        """
+        frame = vis.grab(vis.game_screen)
+        respawns = sum(len(rock.respawn_times) for rock in self.rocks)
+        for rock in self.rocks:
+            rock.update(frame)
+        if self.scenario is not None and \
+                sum(len(rock.respawn_times) for rock in self.rocks) != respawns:
+            self.unsaved = True
+        if self.unsaved is True and time.monotonic() - self.saved_at >= SAVE_INTERVAL:
+            self.save()
+        return frame
+
+    def next_respawn(self):
+        """
+        Gets the empty rock that's predicted to respawn first.
+
+        Returns:
+            Returns a 2-tuple containing the Rock and its respawn window,
+            see Rock.respawn_window(). Returns None if any rock isn't
+            empty or any rock's respawn can't be predicted.
+
+        """
+        windows = [(rock, rock.respawn_window()) for rock in self.rocks]
+        if not windows or any(window is None for _, window in windows):
+            return None
+        return min(windows, key=lambda item: item[1][0])
+
+    def poll_range(self):
+        """
+        Gets how long to wait before the next update. While every rock is
+        empty, the rocks are checked often only once a rock is inside
+        its predicted respawn window.
+
+        Returns:
+            Returns a 2-tuple containing the minimum and maximum number of
+            miliseconds to wait.
+
+        """
+        next_respawn = self.next_respawn()
+        if next_respawn is None:
+            return POLL_RANGE
+        earliest = next_respawn[1][0]
+        wait = (earliest - time.monotonic()) * 1000
+        if wait <= 0:
+            return FAST_POLL_RANGE
+        wait = int(min(wait, MAX_IDLE_POLL))
+        return wait, wait
+
+    def best(self, exclude=None):
+        """
+        Chooses the full rock that's closest to the mouse cursor, so the
+        mouse has the least distance to travel.
+
+        Args:
+            exclude (Rock): A rock that shouldn't be chosen, such as the
+                            rock that's currently being mined, default is
+                            None.
+
+        Returns:
+            Returns a Rock, or None if no rocks are full.
+
+        """
+        full = [rock for rock in self.rocks if rock.state == FULL and rock is not exclude]
+        if not full:
+            return None
+        cursor_x, cursor_y = input.backend.position()
+
+        def distance(rock):
+            left, top, width, height = rock.click_region()
+            return np.hypot(left + width / 2 - cursor_x, top + height / 2 - cursor_y)
+
+        return min(full, key=distance)
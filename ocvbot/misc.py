@@ -8,7 +8,7 @@ import logging as log
 import random as rand
 import time
 
-from ocvbot import startup as start
+from ocvbot import startup as start, trace
 
 
 def rand_seconds(min_seconds=0, max_seconds=100):
@@ -45,7 +45,10 @@ def sleep_rand(sleep_min=0, sleep_max=100):
     """
     sleeptime = rand_seconds(min_seconds=sleep_min, max_seconds=sleep_max)
     # log.debug('Sleeping for %s seconds.', sleeptime)
+    started = time.perf_counter()
     time.sleep(sleeptime)
+    if trace.enabled is True:
+        trace.add('sleep', started)
     return True
 
 
@@ -102,7 +105,10 @@ def sleep_rand_roll(chance_range=(10, 20), sleep_range=(10000, 60000), second_ch
         log.debug('Random wait called.')
         sleeptime = rand_seconds(sleep_range[0], sleep_range[1])
         log.info('Sleeping for %s seconds...', round(sleeptime, 1))
+        started = time.perf_counter()
         time.sleep(sleeptime)
+        if trace.enabled is True:
+            trace.add('sleep', started)
 
         second_chance = rand.randint(second_chance_range[0], second_chance_range[1])
         second_roll = rand.randint(1, second_chance)
@@ -110,5 +116,8 @@ def sleep_rand_roll(chance_range=(10, 20), sleep_range=(10000, 60000), second_ch
             log.info('Additional random wait called.')
             sleeptime = rand_seconds(sleep_range[0], sleep_range[1])
             log.info('Sleeping for %s seconds...', round(sleeptime, 1))
+            started = time.perf_counter()
             time.sleep(sleeptime)
+            if trace.enabled is True:
+                trace.add('sleep', started)
     return True
@@ -0,0 +1,180 @@
+# coding=UTF-8
+"""
+Reads the numbers next to the orbs beside the minimap: hitpoints, prayer
+points and run energy, and whether running is turned on.
+
+Each number is drawn unscaled next to its orb, in green, yellow or red
+depending on how low it is. The number is split into digits at the empty
+columns between them, see chat.split(), and each digit's pixels are
+looked up in a table of known digits, which is learned from screenshots
+by tools/train_orb_digits.py. All the orbs are read from a single
+capture.
+
+Whether running is turned on is read from the color of the boot on the
+run orb, which is yellow when running is on and brown when it's off, no
+matter how full the orb is.
+
+"""
+import json
+import logging as log
+import os
+
+import numpy as np
+
+from ocvbot import chat
+
+# The digit table, relative to the ocvbot directory.
+DIGITS_FILE = 'orb-digits.json'
+
+# The (left, top, width, height) of the area each orb's number is drawn
+#   in, relative to the client. Numbers are centered within the area.
+ORBS = {
+    'hitpoints': (517, 55, 28, 14),
+    'prayer': (517, 89, 28, 14),
+    'run': (526, 121, 28, 14),
+}
+# The (left, top, width, height) of the run orb relative to the client.
+RUN_ORB = (552, 110, 28, 29)
+# The (left, top, width, height) of the area containing every orb's
+#   number and the run orb, relative to the client.
+REGION = (517, 55, 63, 84)
+# A pixel is part of a digit if its red or green value is above
+#   DIGIT_MIN and its blue value is below DIGIT_BLUE_MAX. Pixel values
+#   range from 0 to 255.
+DIGIT_MIN = 150
+DIGIT_BLUE_MAX = 100
+# Running is on if at least this many pixels of the run orb are yellow.
+RUN_ON_MIN_PIXELS = 60
+
+_digits = None
+
+
+def grab():
+    """
+    Captures the area containing every orb's number and the run orb.
+
+    """
+    # Imported here so the digit table can be learned from screenshots
+    #   without a running client.
+    from ocvbot import vision as vis
+    return vis.grab((vis.client_left + REGION[0], vis.client_top + REGION[1],
+                     REGION[2], REGION[3]))
+
+
+def crop(frame, orb):
+    """
+    Crops one orb's number out of a capture.
+
+    Args:
+        frame (array): An RGB capture of REGION, as returned by grab().
+        orb (str): One of the keys of ORBS, or 'run_orb' for the run orb
+                   itself.
+
+    """
+    left, top, width, height = RUN_ORB if orb == 'run_orb' else ORBS[orb]
+    left -= REGION[0]
+    top -= REGION[1]
+    return np.asarray(frame)[top:top + height, left:left + width]
+
+
+def segment(frame):
+    """
+    Splits a capture of one orb's number into digits.
+
+    Returns:
+        Returns a list containing the chat.glyph_key() of each digit.
+
+    """
+    frame = np.asarray(frame).astype(np.int16)
+    digits = (np.maximum(frame[:, :, 0], frame[:, :, 1]) > DIGIT_MIN) \
+        & (frame[:, :, 2] < DIGIT_BLUE_MAX)
+    rows = np.nonzero(digits.any(axis=1))[0]
+    if len(rows) == 0:
+        return []
+    # Digits are all the same height, so align them to their top row in
+    #   case the number isn't always drawn on the same row.
+    return [key for key in chat.split(digits[rows[0]:]) if key != ' ']
+
+
+def load():
+    """
+    Loads the digit table saved by tools/train_orb_digits.py.
+
+    Returns:
+        Returns a dict mapping chat.glyph_key()s to digits.
+
+    """
+    global _digits
+    if _digits is None:
+        _digits = {}
+        if os.path.exists(DIGITS_FILE):
+            with open(DIGITS_FILE) as file:
+                _digits = json.load(file)
+        else:
+            log.warning('No orb digits found at %s, orbs can\'t be read!', DIGITS_FILE)
+    return _digits
+
+
+def decode(frame):
+    """
+    Decodes a capture of one orb's number.
+
+    Returns:
+        Returns the number as an int, or None if it couldn't be read.
+
+    """
+    digits = load()
+    keys = segment(frame)
+    if not keys or any(key not in digits for key in keys):
+        return None
+    return int(''.join(digits[key] for key in keys))
+
+
+def read(frame=None):
+    """
+    Reads every orb's number.
+
+    Args:
+        frame (array): A capture of REGION, as returned by grab(). If None,
+                       a new capture is taken, default is None.
+
+    Returns:
+        Returns a dict containing each orb's number as an int, keyed by
+        the names in ORBS. Numbers that couldn't be read are None.
+
+    """
+    if frame is None:
+        frame = grab()
+    readout = {orb: decode(crop(frame, orb)) for orb in ORBS}
+    log.debug('Orbs read %s', readout)
+    return readout
+
+
+def run_enabled(frame=None):
+    """
+    Checks whether running is turned on.
+
+    Args:
+        frame (array): See read()'s docstring.
+
+    Returns:
+        Returns True if running is turned on, False if otherwise.
+
+    """
+    if frame is None:
+        frame = grab()
+    orb = crop(frame, 'run_orb').astype(np.int16)
+    yellow = (orb[:, :, 0] > 170) & (orb[:, :, 1] > 130) & (orb[:, :, 2] < 110)
+    return int(np.count_nonzero(yellow)) >= RUN_ON_MIN_PIXELS
+
+
+def run_energy():
+    """
+    Reads the player's run energy.
+
+    Returns:
+        Returns the run energy as an int from 0 to 100, or None if it
+        couldn't be read.
+
+    """
+    return read()['run']
@@ -0,0 +1,237 @@
+# coding=UTF-8
+"""
+Retry policies with per-operation budgets and backoff.
+
+Each named operation (e.g. 'open-bank') gets a single RetryPolicy that
+remembers how long the operation has historically taken to succeed. Once
+enough history has been collected, the policy stops retrying after the
+95th percentile of those times plus a margin, instead of after a fixed
+number of tries.
+
+Example:
+
+    attempts = retry.policy('open-bank', tries=9).attempts()
+    for tries in attempts:
+        if bank_opened():
+            attempts.succeeded()
+            return True
+
+"""
+import collections
+import logging as log
+import time
+
+from ocvbot import misc
+
+# Every policy that has been created, keyed by operation name.
+policies = {}
+
+BACKOFF_CURVES = ('constant', 'linear', 'exponential')
+
+
+def policy(name, **kwargs):
+    """
+    Gets the retry policy for the given operation, creating it if it
+    doesn't exist yet. Keyword arguments are only used when the policy
+    is first created, so history is shared across every call site that
+    uses the same name.
+
+    Args:
+        name (str): The name of the operation.
+        **kwargs: Passed to RetryPolicy, see its docstring for more info.
+
+    Returns:
+        Returns a RetryPolicy object.
+
+    """
+    if name not in policies:
+        policies[name] = RetryPolicy(name, **kwargs)
+    return policies[name]
+
+
+def report():
+    """
+    Logs the historical time-to-success of every retry policy.
+
+    """
+    for retry_policy in policies.values():
+        log.info('%s: %s successes, %s failures, p95=%s, timeout=%s',
+                 retry_policy.name, len(retry_policy.history),
+                 retry_policy.failures, retry_policy.percentile(95),
+                 retry_policy.timeout())
+
+
+class RetryPolicy:
+    """
+    Decides how many times, and how quickly, an operation is retried.
+
+    Args:
+        name (str): The name of the operation, used for logging.
+        tries (int): The number of attempts to make before giving up
+                     while there isn't enough history to adapt, default
+                     is 10.
+        max_tries (int): The number of attempts that will never be
+                         exceeded, even if the adaptive timeout hasn't
+                         elapsed yet, default is three times tries.
+        sleep_range (tuple): A 2-tuple containing the minimum and maximum
+                             number of miliseconds to wait between the
+                             first and second attempts, default is
+                             (0, 100).
+        backoff (str): How the wait between attempts grows. Available
+                       options are 'constant', 'linear', and
+                       'exponential', default is 'constant'.
+        max_sleep (int): The maximum number of miliseconds to wait
+                         between attempts, default is 5000.
+        margin (float): The number of seconds added to the 95th
+                        percentile of historical times-to-success to
+                        obtain the adaptive timeout, default is 1.
+        min_history (int): The number of successes that must be recorded
+                           before the adaptive timeout is used, default
+                           is 10.
+        history_len (int): The number of recent times-to-success to
+                           keep, default is 100.
+
+    """
+
+    def __init__(self, name, tries=10, max_tries=None, sleep_range=(0, 100),
+                 backoff='constant', max_sleep=5000, margin=1.0,
+                 min_history=10, history_len=100):
+        if backoff not in BACKOFF_CURVES:
+            raise Exception('Unsupported backoff curve ' + str(backoff) + '!')
+
+        self.name = name
+        self.tries = tries
+        self.max_tries = max_tries if max_tries is not None else tries * 3
+        self.sleep_range = sleep_range
+        self.backoff = backoff
+        self.max_sleep = max_sleep
+        self.margin = margin
+        self.min_history = min_history
+        self.history = collections.deque(maxlen=history_len)
+        self.failures = 0
+
+    def percentile(self, percent):
+        """
+        Gets a percentile of the recorded times-to-success.
+
+        Args:
+            percent (int): The percentile to get, from 0 to 100.
+
+        Returns:
+            Returns the percentile as a float in seconds, or None if no
+            successes have been recorded.
+
+        """
+        if not self.history:
+            return None
+        ordered = sorted(self.history)
+        index = min(len(ordered) - 1, int(round((percent / 100) * (len(ordered) - 1))))
+        return ordered[index]
+
+    def timeout(self):
+        """
+        Gets the adaptive timeout for this operation.
+
+        Returns:
+            Returns the 95th percentile of historical times-to-success
+            plus the margin, in seconds. Returns None if there isn't
+            enough history yet.
+
+        """
+        if len(self.history) < self.min_history:
+            return None
+        return self.percentile(95) + self.margin
+
+    def sleep_time(self, tries):
+        """
+        Gets how long to wait after the given attempt, according to the
+        backoff curve.
+
+        Args:
+            tries (int): The number of attempts made so far.
+
+        Returns:
+            Returns a 2-tuple containing the minimum and maximum number of
+            miliseconds to wait.
+
+        """
+        if self.backoff == 'linear':
+            factor = tries
+        elif self.backoff == 'exponential':
+            factor = 2 ** (tries - 1)
+        else:
+            factor = 1
+        return (min(self.sleep_range[0] * factor, self.max_sleep),
+                min(self.sleep_range[1] * factor, self.max_sleep))
+
+    def attempts(self):
+        """
+        Starts a new series of attempts at the operation.
+
+        Returns:
+            Returns an Attempts iterator.
+
+        """
+        return Attempts(self)
+
+
+class Attempts:
+    """
+    Iterates over the attempts of a single run of an operation, sleeping
+    between attempts. Call succeeded() once the operation succeeds so
+    its time-to-success is recorded.
+
+    Args:
+        retry_policy (RetryPolicy): The policy to follow.
+
+    """
+
+    def __init__(self, retry_policy):
+        self.policy = retry_policy
+        self.start_time = time.monotonic()
+        self.tries = 0
+        self.done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.done is True:
+            raise StopIteration
+
+        if self.tries > 0:
+            if self._exhausted() is True:
+                self.done = True
+                self.policy.failures += 1
+                log.debug('Retry budget for %s exhausted after %s tries.',
+                          self.policy.name, self.tries)
+                raise StopIteration
+            sleep_min, sleep_max = self.policy.sleep_time(self.tries)
+            misc.sleep_rand(sleep_min, sleep_max)
+
+        self.tries += 1
+        return self.tries
+
+    def _exhausted(self):
+        if self.tries >= self.policy.max_tries:
+            return True
+        timeout = self.policy.timeout()
+        if timeout is None:
+            return self.tries >= self.policy.tries
+        return time.monotonic() - self.start_time >= timeout
+
+    def elapsed(self):
+        """
+        Gets the number of seconds since the first attempt began.
+
+        """
+        return time.monotonic() - self.start_time
+
+    def succeeded(self):
+        """
+        Records the time-to-success of this run and stops iteration.
+
+        """
+        self.done = True
+        self.policy.history.append(self.elapsed())
+        return True
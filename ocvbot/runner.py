@@ -0,0 +1,211 @@
+# coding=UTF-8
+"""
+A small state-machine runner for bot scripts.
+
+Each step of a script is a State. A Runner repeatedly runs the current
+state and follows its transitions until a state transitions to None.
+Everything happens within a single loop, so long-running scripts don't
+grow the call stack the way recursive retries do.
+
+"""
+import collections
+import logging as log
+import time
+
+from ocvbot import misc
+
+# Use this as a transition target to return to the state that was
+#   interrupted by a logout break.
+RESUME = 'resume'
+
+
+class State:
+    """
+    A single step of a script.
+
+    Args:
+        name (str): The name of the state. Must be unique within a
+                    Runner.
+        action (callable): Called with no arguments every time the state
+                           is run. Returning False or None counts as a
+                           failed attempt. Any other return value is
+                           looked up in transitions.
+        transitions (dict): Maps the return values of action to the name
+                            of the next state to run. Mapping a value to
+                            None stops the runner, default is
+                            {True: None}.
+        retries (int): The number of times action will be attempted
+                       before the state fails, default is 1.
+        timeout (float): The maximum number of seconds the state may
+                         spend retrying action before it fails, default
+                         is None (no limit).
+        retry_sleep_range (tuple): A 2-tuple containing the minimum and
+                                   maximum number of miliseconds to wait
+                                   between attempts, default is (0, 100).
+        fail (str): The name of the state to run if this state fails. If
+                    None, the runner stops and reports a failure, default
+                    is None.
+
+    """
+
+    def __init__(self, name, action, transitions=None, retries=1,
+                 timeout=None, retry_sleep_range=(0, 100), fail=None):
+        self.name = name
+        self.action = action
+        self.transitions = transitions if transitions is not None else {True: None}
+        self.retries = retries
+        self.timeout = timeout
+        self.retry_sleep_range = retry_sleep_range
+        self.fail = fail
+
+
+class Runner:
+    """
+    Runs a set of States iteratively.
+
+    Memory use is bounded: only per-state timing totals and a short
+    history of recent transitions are kept, no matter how long the
+    runner has been going.
+
+    Args:
+        states (list): A list of State objects.
+        initial (str): The name of the first state to run.
+        resume (str): The name of the state to run after a logout break
+                      has been taken, such as a login state. That state
+                      can transition to RESUME to return to whichever
+                      state was running when the break occurred, default
+                      is None.
+        break_check (callable): Called with no arguments after every
+                                state. Must return True if a logout break
+                                was just taken, such as
+                                behavior.logout_break_range, default is
+                                None.
+        max_steps (int): The maximum number of states to run before
+                         giving up, default is None (no limit).
+        history_len (int): The number of recent transitions to remember
+                           for debugging, default is 50.
+
+    """
+
+    def __init__(self, states, initial, resume=None, break_check=None,
+                 max_steps=None, history_len=50):
+        self.states = {state.name: state for state in states}
+        self.initial = initial
+        self.current = initial
+        self.resume = resume
+        self.break_check = break_check
+        self.max_steps = max_steps
+        self.interrupted = None
+        self.history = collections.deque(maxlen=history_len)
+        # Each value is a list of [runs, failures, total seconds, max seconds].
+        self.timings = {name: [0, 0, 0.0, 0.0] for name in self.states}
+
+        if initial not in self.states:
+            raise Exception('Initial state ' + initial + ' does not exist!')
+
+    def _record(self, name, elapsed, failed):
+        timing = self.timings[name]
+        timing[0] += 1
+        timing[1] += int(failed)
+        timing[2] += elapsed
+        timing[3] = max(timing[3], elapsed)
+
+    def step(self):
+        """
+        Runs the current state, retrying it according to its budget.
+
+        Returns:
+            Returns the name of the next state to run, or None if the
+            runner should stop. Returns False if the state failed and has
+            no fail state to fall back on.
+
+        """
+        state = self.states[self.current]
+        state_start = time.monotonic()
+        result = False
+
+        for tries in range(1, state.retries + 1):
+            result = state.action()
+            if result is not False and result is not None:
+                break
+            if state.timeout is not None and \
+                    time.monotonic() - state_start >= state.timeout:
+                log.debug('State %s timed out after %s tries.', state.name, tries)
+                break
+            if tries < state.retries:
+                misc.sleep_rand(state.retry_sleep_range[0], state.retry_sleep_range[1])
+
+        failed = result is False or result is None
+        self._record(state.name, time.monotonic() - state_start, failed)
+
+        if failed is True:
+            log.debug('State %s failed.', state.name)
+            if state.fail is None:
+                return False
+            return state.fail
+
+        if result not in state.transitions:
+            raise Exception('State ' + state.name + ' has no transition for '
+                            + str(result) + '!')
+        return state.transitions[result]
+
+    def run(self):
+        """
+        Runs states until one of them transitions to None or fails.
+
+        Can be called again after it returns to pick up where it left off,
+        for example after the script has been paused.
+
+        Returns:
+            Returns True if the runner reached a state that transitions to
+            None, returns False if a state failed or max_steps was reached.
+
+        """
+        steps = 0
+        while self.max_steps is None or steps < self.max_steps:
+            steps += 1
+            next_state = self.step()
+
+            if next_state is False:
+                log.error('State %s failed, stopping.', self.current)
+                return False
+
+            if next_state == RESUME:
+                next_state = self.interrupted if self.interrupted is not None else self.initial
+                self.interrupted = None
+
+            if self.break_check is not None and self.break_check() is True \
+                    and self.resume is not None and next_state is not None:
+                log.info('Resuming from %s after break.', next_state)
+                self.interrupted = next_state
+                next_state = self.resume
+
+            self.history.append((self.current, next_state))
+            if next_state is None:
+                self.current = self.initial
+                return True
+            if next_state not in self.states:
+                raise Exception('State ' + str(next_state) + ' does not exist!')
+            self.current = next_state
+
+        log.error('Runner reached the maximum number of steps!')
+        return False
+
+    def timing_report(self):
+        """
+        Logs how much time has been spent in each state.
+
+        Returns:
+            Returns a dictionary containing the number of runs, the number
+            of failures, the total seconds, the average seconds, and the
+            maximum seconds spent in each state.
+
+        """
+        report = {}
+        for name, (runs, failures, total, maximum) in self.timings.items():
+            average = total / runs if runs else 0.0
+            report[name] = {'runs': runs, 'failures': failures,
+                            'total': total, 'average': average, 'max': maximum}
+            log.info('State %s: %s runs, %s failed, %.2fs avg, %.2fs max',
+                     name, runs, failures, average, maximum)
+        return report
@@ -0,0 +1,225 @@
+# coding=UTF-8
+"""
+Classifies what the client is currently showing from a single capture.
+
+Each frame is reduced to a small grayscale "fingerprint": the whole
+client downsampled to a few hundred pixels, followed by the middle of the
+client (where the login menu's dialog box is drawn) downsampled at a
+higher resolution, since the login screens differ mostly by their
+dialog box. A frame is labeled with the scene of the closest fingerprint
+in a set of labeled samples, which are built from screenshots by
+tools/train_scenes.py.
+
+"""
+import enum
+import logging as log
+
+import cv2
+import numpy as np
+
+# The labeled fingerprints, relative to the ocvbot directory.
+SAMPLES_FILE = 'scenes.npz'
+
+# The (width, height) to downsample the whole client to.
+CLIENT_SIZE = (32, 21)
+# The (left, top, width, height) of the login menu's dialog box relative
+#   to the client, and the (width, height) to downsample it to.
+DIALOG_REGION = (230, 180, 305, 150)
+DIALOG_SIZE = (32, 16)
+
+# If the mean difference between a frame's fingerprint and the closest
+#   sample is greater than this, the scene is unknown. Pixel values range
+#   from 0 to 255.
+MAX_DISTANCE = 40
+# The login screens share the same background, so they're much closer to
+#   each other than to any in-game frame. The login screen samples are
+#   within 10 of each other, but the closest in-game sample is 23 away. A
+#   frame is only labeled as a logged-out scene within this distance, so
+#   an unseen in-game frame is labeled unknown rather than a login screen.
+LOGGED_OUT_MAX_DISTANCE = 15
+
+
+class Scene(enum.Enum):
+    """
+    The scenes that can be recognized.
+
+    Only LOGGED_OUT and IN_GAME have more than one distinct screenshot,
+    so only they are checked by tools/train_scenes.py's leave-one-out
+    check. The other login screens have a single distinct screenshot
+    each, so their labels are unverified until more screenshots of them
+    are added, and behavior.py confirms each of them with a needle before
+    acting on it. Scenes such as the open bank or the make-X menu can be
+    added once screenshots of them are available.
+
+    """
+    LOGGED_OUT = 'logged_out'
+    DISCONNECTED = 'disconnected'
+    LOGIN_CREDENTIALS = 'login_credentials'
+    INVALID_CREDENTIALS = 'invalid_credentials'
+    POSTLOGIN = 'postlogin'
+    IN_GAME = 'in_game'
+    UNKNOWN = 'unknown'
+
+
+# The scenes in which the client is logged out.
+LOGGED_OUT_SCENES = frozenset((Scene.LOGGED_OUT, Scene.DISCONNECTED,
+                               Scene.LOGIN_CREDENTIALS, Scene.INVALID_CREDENTIALS))
+
+
+def max_distance(scene):
+    """
+    Gets how far a frame's fingerprint can be from a sample of the given
+    scene and still be labeled as that scene.
+
+    """
+    if scene in LOGGED_OUT_SCENES:
+        return LOGGED_OUT_MAX_DISTANCE
+    return MAX_DISTANCE
+
+
+def fingerprint(frame):
+    """
+    Reduces a capture of the client to its fingerprint.
+
+    Args:
+        frame (array): An RGB capture of vision.client, as returned by
+                       vision.grab().
+
+    Returns:
+        Returns a 1-dimensional NumPy array of float32 values.
+
+    """
+    gray = cv2.cvtColor(np.ascontiguousarray(frame), cv2.COLOR_RGB2GRAY)
+    left, top, width, height = DIALOG_REGION
+    dialog = gray[top:top + height, left:left + width]
+    return np.concatenate([
+        cv2.resize(gray, CLIENT_SIZE, interpolation=cv2.INTER_AREA).ravel(),
+        cv2.resize(dialog, DIALOG_SIZE, interpolation=cv2.INTER_AREA).ravel(),
+    ]).astype(np.float32)
+
+
+class Classifier:
+    """
+    Nearest-neighbor classifier over a set of labeled fingerprints.
+
+    Args:
+        samples (array): A 2D array with one fingerprint per row.
+        labels (list): The Scene of each row in samples.
+
+    """
+
+    def __init__(self, samples, labels):
+        self.samples = np.asarray(samples, dtype=np.float32)
+        self.labels = list(labels)
+
+    @classmethod
+    def load(cls, path=SAMPLES_FILE):
+        """
+        Loads labeled fingerprints saved with save().
+
+        """
+        with np.load(path) as data:
+            return cls(data['samples'], [Scene(label) for label in data['labels']])
+
+    def save(self, path=SAMPLES_FILE):
+        """
+        Saves the labeled fingerprints to a compressed .npz file.
+
+        """
+        np.savez_compressed(path, samples=self.samples.astype(np.uint8),
+                            labels=np.array([label.value for label in self.labels]))
+
+    def nearest(self, frame):
+        """
+        Finds the labeled sample closest to the given frame.
+
+        Args:
+            frame (array): See fingerprint()'s docstring.
+
+        Returns:
+            Returns a 2-tuple containing the Scene of the closest sample
+            and the mean difference between the two fingerprints.
+
+        """
+        return self.nearest_fingerprint(fingerprint(frame))
+
+    def nearest_fingerprint(self, print_):
+        """
+        Works like nearest(), but takes a fingerprint rather than a frame.
+
+        """
+        distances = np.abs(self.samples - print_).mean(axis=1)
+        index = int(np.argmin(distances))
+        return self.labels[index], float(distances[index])
+
+    def classify(self, frame):
+        """
+        Classifies a capture of the client.
+
+        Args:
+            frame (array): See fingerprint()'s docstring.
+
+        Returns:
+            Returns a Scene. Returns Scene.UNKNOWN if the frame isn't
+            similar enough to any of the samples, see max_distance().
+
+        """
+        return self.classify_fingerprint(fingerprint(frame))
+
+    def classify_fingerprint(self, print_):
+        """
+        Works like classify(), but takes a fingerprint rather than a frame.
+
+        """
+        scene, distance = self.nearest_fingerprint(print_)
+        if distance > max_distance(scene):
+            log.debug('Unknown scene, closest was %s at %s', scene, distance)
+            return Scene.UNKNOWN
+        log.debug('Scene is %s at %s', scene, distance)
+        return scene
+
+    def leave_one_out(self):
+        """
+        Classifies each sample against all the other samples, to estimate
+        how well frames that aren't in the samples will be classified.
+        The samples must be unique, otherwise each sample would just be
+        matched to its own duplicate.
+
+        Returns:
+            Returns a list with a (label, scene) tuple for each sample,
+            where scene is the Scene the sample was classified as.
+
+        """
+        results = []
+        for index, label in enumerate(self.labels):
+            others = Classifier(np.delete(self.samples, index, axis=0),
+                                self.labels[:index] + self.labels[index + 1:])
+            results.append((label, others.classify_fingerprint(self.samples[index])))
+        return results
+
+
+_classifier = None
+
+
+def classify(frame=None):
+    """
+    Determines what the client is currently showing.
+
+    Args:
+        frame (array): A capture of vision.client, as returned by
+                       vision.grab(). If None, a new capture is taken,
+                       default is None.
+
+    Returns:
+        Returns a Scene.
+
+    """
+    global _classifier
+    if _classifier is None:
+        _classifier = Classifier.load()
+    if frame is None:
+        # Imported here so scenes can be trained from screenshots without
+        #   a running client.
+        from ocvbot import vision as vis
+        frame = vis.grab(vis.client)
+    return _classifier.classify(frame)
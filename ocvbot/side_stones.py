@@ -0,0 +1,154 @@
+# coding=UTF-8
+"""
+Model of the side stone tabs that open the player's different menus.
+
+All 14 tabs sit at fixed offsets within the client, so each tab's
+rectangle is computed once from the client's position. The open tab has
+a red highlight behind its icon, which makes it possible to tell which
+tab is open from a single capture of vision.side_stones.
+
+"""
+import numpy as np
+
+from ocvbot import vision as vis
+
+# Ordered left to right, top row then bottom row.
+TABS = ('attacks', 'skills', 'quests', 'inventory', 'equipment', 'prayers',
+        'spellbook', 'clan', 'friends', 'account', 'logout', 'settings',
+        'emotes', 'music')
+
+# Offsets of the top-left corner of the first tab in each row, relative
+#   to the client, and the spacing between tabs. Units are in pixels.
+TOP_ROW_LEFT = 523
+TOP_ROW_TOP = 170
+BOTTOM_ROW_TOP = 468
+TAB_SPACING = 33
+TAB_WIDTH = 30
+TAB_HEIGHT = 30
+TABS_PER_ROW = 7
+
+# The open tab's highlight is drawn along the edges of the tab, so only
+#   a border this many pixels wide is checked. The icon in the middle of
+#   each tab is ignored since some icons are red too.
+HIGHLIGHT_BORDER = 6
+# The minimum number of highlighted pixels needed to consider a tab open.
+HIGHLIGHT_MIN_PIXELS = 50
+
+# The logout buttons and the offsets of their top-left corners relative
+#   to the client. The first is drawn when the logout tab is open, the
+#   second is the same button while the mouse is over it, and the third
+#   is drawn instead when the world switcher is open.
+LOGOUT_BUTTONS = (
+    ('./needles/side-stones/logout/logout.png', (577, 419)),
+    ('./needles/side-stones/logout/logout-highlighted.png', (575, 419)),
+    ('./needles/side-stones/logout/logout-world-switcher.png', (714, 436)),
+)
+# The maximum mean difference between a logout button's needle and the
+#   pixels at its position to consider the button visible. Pixel values
+#   range from 0 to 255.
+LOGOUT_BUTTON_MAX_DIFFERENCE = 10
+
+
+def _tab_region(index):
+    """
+    Gets the (left, top, width, height) of a tab relative to the display.
+
+    """
+    left = vis.client_left + TOP_ROW_LEFT + TAB_SPACING * (index % TABS_PER_ROW)
+    top = vis.client_top + (TOP_ROW_TOP if index < TABS_PER_ROW else BOTTOM_ROW_TOP)
+    return left, top, TAB_WIDTH, TAB_HEIGHT
+
+
+tabs = {name: _tab_region(index) for index, name in enumerate(TABS)}
+
+
+def _highlight_mask(frame):
+    """
+    Finds the pixels that match the red highlight of an open tab. The
+    highlight's green and blue channels are about a third and a quarter
+    of its red channel, respectively.
+
+    """
+    frame = frame.astype(np.int16)
+    red, green, blue = frame[..., 0], frame[..., 1], frame[..., 2]
+    return ((red >= 60) & (red <= 125)
+            & (np.abs(3 * green - red) <= 8)
+            & (np.abs(4 * blue - red) <= 10))
+
+
+def open_tab(frame=None):
+    """
+    Determines which side stone tab is currently open.
+
+    Args:
+        frame (array): A capture of vision.side_stones, as returned by
+                       vision.grab(). If None, a new capture is taken,
+                       default is None.
+
+    Returns:
+        Returns the name of the open tab, or None if no tab appears to be
+        open (for example if the client is logged out).
+
+    """
+    if frame is None:
+        frame = vis.grab(vis.side_stones)
+    mask = _highlight_mask(frame)
+
+    counts = []
+    for name in TABS:
+        left, top, width, height = tabs[name]
+        left -= vis.side_stones_left
+        top -= vis.side_stones_top
+        tab = mask[top:top + height, left:left + width].copy()
+        tab[HIGHLIGHT_BORDER:-HIGHLIGHT_BORDER, HIGHLIGHT_BORDER:-HIGHLIGHT_BORDER] = False
+        counts.append(int(tab.sum()))
+
+    best = int(np.argmax(counts))
+    if counts[best] < HIGHLIGHT_MIN_PIXELS:
+        return None
+    return TABS[best]
+
+
+def click_region(name):
+    """
+    Gets the region to click on to open a tab. The region is slightly
+    smaller than the tab so clicks never land on the tab's edge.
+
+    Args:
+        name (str): The name of the tab, see TABS.
+
+    Returns:
+        Returns a (left, top, width, height) 4-tuple.
+
+    """
+    if name not in tabs:
+        raise Exception('Unsupported side stone ' + str(name) + '!')
+    left, top, width, height = tabs[name]
+    return left + 5, top + 5, width - 10, height - 10
+
+
+def logout_button(frame=None):
+    """
+    Finds whichever logout button is visible by comparing the pixels at
+    each button's fixed position, rather than searching for the buttons.
+
+    Args:
+        frame (array): A capture of vision.client, as returned by
+                       vision.grab(). If None, a new capture is taken,
+                       default is None.
+
+    Returns:
+        Returns the (left, top, width, height) of the visible logout button
+        relative to the display, or None if no logout button is visible.
+
+    """
+    if frame is None:
+        frame = vis.grab(vis.client)
+
+    for needle, (left, top) in LOGOUT_BUTTONS:
+        pixels = vis.load_needle(needle).astype(np.int16)
+        height, width = pixels.shape[:2]
+        area = frame[top:top + height, left:left + width].astype(np.int16)
+        if np.abs(area - pixels).mean() <= LOGOUT_BUTTON_MAX_DIFFERENCE:
+            return vis.client_left + left, vis.client_top + top, width, height
+    return None
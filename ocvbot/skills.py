@@ -4,34 +4,36 @@ Contains all functions related to training skills.
 
 """
 import logging as log
-
-from ocvbot import behavior, vision as vis, misc, startup as start, input
-
-
-def wait_for_level_up(wait_time):
-    """
-    Waits the specified number of seconds for a level-up message to
-    appear in the chat menu.
-
-    Args:
-        wait_time: Approximately the number of seconds to wait for a
-                   level-up message to appear. Checks for a level-up
-                   message about once every second.
-
-    Returns:
-        If a level-up message appears, returns True.
-        Returns False otherwise.
-
-    """
-    log.info('Checking for level-up')
-    level_up = vis.Vision(region=vis.chat_menu,
-                          needle='./needles/chat-menu/level-up.png',
-                          loop_num=wait_time,
-                          loop_sleep_range=(900, 1100)).wait_for_needle()
-    if level_up is True:
-        return True
-    else:
-        return False
+import time
+
+from ocvbot import behavior, vision as vis, misc, startup as start, input, runner, \
+    inventory, mine, track, chat, stats, trace
+
+
+# The maximum number of seconds to wait for a rock to be mined.
+MINING_TIMEOUT_SECONDS = 20
+# The number of updates in a row the rock being mined can't be seen, such
+#   as while another player is standing in front of it, before it's given
+#   up on. Rocks are updated about every 100-200 miliseconds.
+MINING_HIDDEN_UPDATES = 15
+# The number of updates after which mining an inventory is given up on.
+#   Mining a whole inventory takes far longer than any single operation,
+#   so this is a fixed budget rather than a retry policy with an adaptive
+#   timeout.
+MINING_MAX_UPDATES = 3000
+
+# The number of times to look for a monster being tracked, and the
+#   minimum and maximum number of miliseconds to wait between tries,
+#   before giving up and waiting longer. Monsters can be hidden behind
+#   the player or another monster for a moment, so they're looked for as
+#   often as targets found with wait_for_needle().
+TARGET_TRIES = 10
+TARGET_SLEEP_RANGE = (0, 100)
+
+# The number of seconds without any raw food being cooked after which
+#   cooking is considered to have stopped. Each item takes about 2.4
+#   seconds to cook.
+COOKING_STALL_SECONDS = 6
 
 
 class Cooking:
@@ -53,16 +55,12 @@ class Cooking:
         self.item_inv = item_inv
         self.item_bank = item_bank
         self.heat_source = heat_source
+        # The amount of raw food left the last time it decreased, and when
+        #   that was.
+        self.raw_count = None
+        self.last_cooked = None
 
-    def cook_item(self):
-        """
-        Cooks all instances of the given food in the player's inventory.
-
-        Returns:
-            Returns True if all items were cooked. Returns False in all
-            other cases.
-
-        """
+    def _select_item(self):
         behavior.open_side_stone('inventory')
         # Select the raw food in the inventory.
         # Confidence must be higher than normal since raw food is very
@@ -73,8 +71,9 @@ class Cooking:
                                    conf=0.99).click_needle()
         if item_selected is False:
             log.error('Unable to find item!')
-            return False
+        return item_selected
 
+    def _select_heat_source(self):
         # Select the range or fire.
         heat_source_selected = vis.Vision(region=vis.game_screen,
                                           needle=self.heat_source,
@@ -84,9 +83,11 @@ class Cooking:
         if heat_source_selected is False:
             log.error('Unable to find heat source!')
             return False
-
         misc.sleep_rand_roll(chance_range=(15, 35), sleep_range=(1000, 10000))
+        return True
 
+    @staticmethod
+    def _wait_for_do_x():
         # Wait for the "how many of this item do you want to cook" chat
         #   menu to appear.
         do_x_screen = vis.Vision(region=vis.chat_menu,
@@ -95,30 +96,78 @@ class Cooking:
                                  loop_sleep_range=(500, 1000)).wait_for_needle()
         if do_x_screen is False:
             log.error('Timed out waiting for "Make X" screen!')
-            return False
+        return do_x_screen
 
-        # Begin cooking food.
+    def _start_cooking(self):
+        # Count the raw food before cooking starts, so every item cooked
+        #   is counted.
+        self.raw_count = inventory.count(self.item_inv, conf=0.99)
         input.Keyboard().keypress(key='space')
-        misc.sleep_rand(3000, 5000)
-
-        # Wait for either a level-up or for the player to stop cooking.
-        # To determine when the player is done cooking, look for the
-        #   bright blue "Staff of Water" orb to re-appear (equipped weapons
-        #   disappear while cooking food). The player must have this item
-        #   equipped.
-        for _ in range(1, 60):
-            misc.sleep_rand(1000, 3000)
-            level_up = wait_for_level_up(1)
-            # If the player levels-up while cooking, restart cooking.
-            if level_up is True:
-                self.cook_item()
-            cooking_done = vis.Vision(region=vis.game_screen,
-                                      needle='./needles/game-screen/staff-of-water-top.png',
-                                      conf=0.9,
-                                      loop_num=1).wait_for_needle()
-            if cooking_done is True:
-                break
+        self.last_cooked = time.monotonic()
+        return True
+
+    def _check_cooking_done(self):
+        """
+        Counts the raw food left in the inventory, and how much has been
+        cooked since it was last counted.
 
+        Returns:
+            Returns True once there is no raw food left or the amount of
+            raw food has stopped decreasing, returns 'level-up' if the
+            player leveled-up, and returns False otherwise.
+
+        """
+        # If the player levels-up while cooking, restart cooking.
+        level_up = vis.Vision(region=vis.chat_menu,
+                              needle='./needles/chat-menu/level-up.png',
+                              loop_num=1).wait_for_needle()
+        if level_up is True:
+            log.info('Leveled-up while cooking.')
+            return 'level-up'
+
+        # Confidence must be higher than normal since raw food is very
+        #   similar in appearance to its cooked version.
+        raw_count = inventory.count(self.item_inv, conf=0.99)
+        if raw_count < self.raw_count:
+            stats.count('items-cooked', self.raw_count - raw_count, item=self.item_inv)
+            self.raw_count = raw_count
+            self.last_cooked = time.monotonic()
+        if raw_count == 0:
+            return True
+        if time.monotonic() - self.last_cooked > COOKING_STALL_SECONDS:
+            log.warning('Stopped cooking with %s raw items left.', raw_count)
+            return True
+        return False
+
+    @trace.traced
+    def cook_item(self):
+        """
+        Cooks all instances of the given food in the player's inventory.
+
+        Returns:
+            Returns True if all items were cooked. Returns False in all
+            other cases.
+
+        """
+        cooking = runner.Runner(states=[
+            runner.State('select-item', self._select_item,
+                         transitions={True: 'select-heat-source'}),
+            runner.State('select-heat-source', self._select_heat_source,
+                         transitions={True: 'wait-for-do-x'}),
+            runner.State('wait-for-do-x', self._wait_for_do_x,
+                         transitions={True: 'start-cooking'}),
+            runner.State('start-cooking', self._start_cooking,
+                         transitions={True: 'wait-for-cooking'}),
+            # Wait for either a level-up or for the player to stop cooking.
+            #   Timing out is treated the same as finishing.
+            runner.State('wait-for-cooking', self._check_cooking_done,
+                         transitions={True: None, 'level-up': 'select-item'},
+                         retries=600, retry_sleep_range=(200, 400), fail='done'),
+            runner.State('done', lambda: True),
+        ], initial='select-item')
+
+        if cooking.run() is False:
+            return False
         misc.sleep_rand_roll(chance_range=(15, 35), sleep_range=(20000, 120000))
         return True
 
@@ -160,42 +209,85 @@ class Magic:
         self.inventory = inventory
         self.move_duration_range = move_duration_range
         self.logout = logout
-
-    def _select_spell(self):
+        # Where the spell and the target were last found. Neither the
+        #   spell nor items in the inventory move between casts, so they
+        #   are only searched for again if they're not there anymore.
+        self.spell_region = None
+        self.target_region = None
+        # Monsters move around, so they're followed from cast to cast.
+        self.tracker = None
+        if inventory is False:
+            self.tracker = track.Tracker(target, conf=conf, region=region)
+
+    def _select_spell(self, wait=True):
         """
-        Activate the desired spell.
+        Activate the desired spell. The spell is clicked on where it was
+        last found if it's still there.
+
+        Args:
+            wait (bool): Whether to wait for the spell to be clicked on.
+                         If False, the click is queued so the target can
+                         be searched for while the mouse is moving,
+                         default is True.
 
         Returns:
             Returns True if spell was activated, False if otherwise.
 
         """
-        for _ in range(1, 5):
-            spell_available = vis.Vision(needle=self.spell, region=vis.inv, loop_num=30) \
-                .click_needle(sleep_range=(50, 800, 50, 800,),
-                              move_duration_range=self.move_duration_range)
-            if spell_available is False:
-                behavior.open_side_stone('spellbook')
-                misc.sleep_rand(100, 300)
-            else:
-                return True
-        return False
+        if self.spell_region is None or vis.needle_at(self.spell_region, self.spell) is False:
+            self.spell_region = None
+            for _ in range(1, 5):
+                spell_available = vis.Vision(needle=self.spell, region=vis.inv, loop_num=30) \
+                    .wait_for_needle(get_tuple=True)
+                if spell_available is False:
+                    behavior.open_side_stone('spellbook')
+                    misc.sleep_rand(100, 300)
+                else:
+                    self.spell_region = spell_available
+                    break
+            if self.spell_region is None:
+                return False
+
+        input.Mouse(region=self.spell_region, sleep_range=(50, 800, 50, 800),
+                    move_duration_range=self.move_duration_range).click_coord(wait=wait)
+        return True
 
     def _select_target(self):
         """
         Attempt to find the target to cast the spell on. Can be either a
-        monster in the game world or an item in the inventory.
+        monster in the game world or an item in the inventory. Items in
+        the inventory are clicked on where they were last found if
+        they're still there. Monsters are clicked on where they're
+        predicted to be, see track.Tracker.
 
         Returns:
             Returns True if target was found and selected, False if
             otherwise.
 
         """
+        if self.target_region is not None:
+            if vis.needle_at(self.target_region, self.target, conf=self.conf) is True:
+                input.Mouse(region=self.target_region, sleep_range=(10, 500, 10, 500),
+                            move_duration_range=self.move_duration_range).click_coord()
+                return True
+            self.target_region = None
 
         for _ in range(1, 5):
-            target = vis.Vision(needle=self.target, region=self.region,
-                                loop_num=10, conf=self.conf) \
-                .click_needle(sleep_range=(10, 500, 10, 500,),
-                              move_duration_range=self.move_duration_range)
+            if self.tracker is not None:
+                # Aim for where the monster will be once the mouse has
+                #   reached it.
+                lead = sum(self.move_duration_range) / 2000
+                for _ in range(TARGET_TRIES):
+                    target = self.tracker.locate(lead=lead)
+                    if target is not None:
+                        break
+                    misc.sleep_rand(TARGET_SLEEP_RANGE[0], TARGET_SLEEP_RANGE[1])
+                else:
+                    target = False
+            else:
+                target = vis.Vision(needle=self.target, region=self.region,
+                                    loop_num=10, conf=self.conf) \
+                    .wait_for_needle(get_tuple=True)
 
             if target is False:
                 # Make sure the inventory is active when casting on items.
@@ -205,9 +297,24 @@ class Magic:
                     behavior.login_full()
                 misc.sleep_rand(1000, 3000)
             else:
-                return True
+                # Monsters are tracked instead, so only remember where
+                #   items are.
+                if self.inventory is True:
+                    self.target_region = target
+                    input.Mouse(region=target, sleep_range=(10, 500, 10, 500),
+                                move_duration_range=self.move_duration_range).click_coord()
+                    return True
+                # Monsters are in the game screen, so the click cross shows
+                #   whether the monster moved out from under the mouse.
+                clicked = input.Mouse(region=target, sleep_range=(10, 500, 10, 500),
+                                      move_duration_range=self.move_duration_range) \
+                    .click_coord(check=vis.click_result)
+                if clicked != vis.MISS:
+                    return True
+                log.info('Missed the target, trying again.')
         return False
 
+    @trace.traced
     def cast_spell(self):
         """
         Cast a spell at a target.
@@ -216,7 +323,10 @@ class Magic:
             Returns True if spell was cast, False if otherwise.
 
         """
-        spell_selected = self._select_spell()
+        # Items in the inventory are only visible once the spell has been
+        #   selected, but monsters in the game world can be searched for
+        #   while the mouse is still moving to the spell.
+        spell_selected = self._select_spell(wait=self.inventory)
         if spell_selected is False:
             if self.logout is True:
                 log.critical('Out of runes! Logging out in 10-20 seconds!')
@@ -242,6 +352,8 @@ class Magic:
         # Roll for random wait.
         misc.sleep_rand_roll(chance_range=(100, 400))
 
+        stats.count('casts', item=self.spell)
+
         if self.logout is True:
             # Roll for logout after the configured period of time.
             behavior.logout_break_range()
@@ -263,6 +375,9 @@ class Mining:
         ore (file): Filepath to a needle of the item icon of the ore
                     being mined, as it appears in the player's
                     inventory.
+        scenario (str): The name of the mining spot, used to save how long
+                        each rock takes to respawn. See mine.Scheduler,
+                        default is None.
 
     """
     # Create a list of tuples to determine which items to drop
@@ -272,21 +387,27 @@ class Mining:
                   (bool(start.config['mining']['drop_diamond']), './needles/items/uncut-diamong.png'),
                   (bool(start.config['mining']['drop_clue_geode']), './needles/items/clue-geode.png')]
 
-    def __init__(self, rocks, ore, position=None, conf=(0.8, 0.85)):
+    def __init__(self, rocks, ore, position=None, conf=(0.8, 0.85), scenario=None):
         self.rocks = rocks
         self.ore = ore
         self.position = position
         self.conf = conf
+        self.scheduler = mine.Scheduler([mine.Rock(full_needle, empty_needle, conf)
+                                         for full_needle, empty_needle in rocks],
+                                        scenario=scenario)
 
         if position is not None:
             behavior.travel(position[0], position[1])
 
+    @trace.traced
     def mine_rocks(self):
         """
         Mines the provided rocks until inventory is full.
 
-        This function alternates mining among the rocks that were provided
-        (it can mine one rock, two rocks, or many rocks at once).
+        Every rock's state is read from the same capture of the game
+        screen, and the closest full rock is mined next. As soon as the
+        rock being mined is empty, the next full rock is clicked on, so
+        the player never waits on one rock while another has respawned.
         All rocks must be of the same ore type.
 
         Returns:
@@ -300,63 +421,100 @@ class Mining:
         # Make sure inventory is selected.
         behavior.open_side_stone('inventory')
 
-        for tries in range(100):
-
-            for rock_needle in self.rocks:
-                # Unpack each tuple in the rocks[] list to obtain the "full"
-                #   and "empty" versions of each ore.
-                (full_rock_needle, empty_rock_needle) = rock_needle
-
-                log.debug('Searching for ore %s...', tries)
-
-                # If current rock is full, begin mining it.
-                # Move the mouse away from the rock so it doesn't
-                #   interfere with matching the needle.
-                rock_full = vis.Vision(region=vis.game_screen, loop_num=1,
-                                       needle=full_rock_needle, conf=self.conf[0]) \
-                    .click_needle(sleep_range=(0, 100, 0, 100,),
-                                  move_duration_range=(0, 500), move_away=True)
-
-                if rock_full is True:
-                    log.info('Waiting for mining to start.')
-                    misc.sleep_rand_roll(chance_range=(1, 200))
-
-                    # Once the rock has been clicked on, wait for mining to
-                    #   start by monitoring chat messages.
-                    mining_started = vis.Vision(region=vis.chat_menu_recent, loop_num=5, conf=0.9,
-                                                needle='./needles/chat-menu/mining-started.png',
-                                                loop_sleep_range=(100, 200)).wait_for_needle()
-
-                    # If mining hasn't started after looping has finished,
-                    #   check to see if the inventory is full.
-                    if mining_started is False:
-                        log.debug('Timed out waiting for mining to start.')
-
-                        inv_full = vis.Vision(region=vis.chat_menu, loop_num=1,
-                                              needle='./needles/chat-menu/mining-inventory-full.png'). \
-                            wait_for_needle()
-
-                        # If the inventory is full, empty the ore and
-                        #   return.
-                        if inv_full is True:
-                            return 'inventory-full'
-
-                    log.debug('Mining started.')
-
-                    # Wait until the rock is empty by waiting for the
-                    #   "empty" version of the rock_needle tuple.
-                    rock_empty = vis.Vision(region=vis.game_screen, loop_num=35,
-                                            conf=self.conf[1], needle=empty_rock_needle,
-                                            loop_sleep_range=(100, 200)).wait_for_needle()
-
-                    if rock_empty is True:
-                        log.info('Rock is empty.')
-                        log.debug('%s empty.', rock_needle)
-                        behavior.human_behavior_rand(chance=100)
-                    else:
-                        log.info('Timed out waiting for mining to finish.')
+        # The rock currently being mined, when mining it started, and the
+        #   number of updates in a row it couldn't be seen.
+        mining = None
+        mining_start = None
+        hidden = 0
+        # The rock the mouse was last moved over while waiting for it to
+        #   respawn.
+        hovering = None
+
+        # How long to wait between updates is decided by the scheduler.
+        for tries in range(1, MINING_MAX_UPDATES + 1):
+            if tries > 1:
+                misc.sleep_rand(*self.scheduler.poll_range())
+            self.scheduler.update()
+
+            if mining is not None:
+                # Keep mining the current rock until it's empty. A rock
+                #   that can't be seen is treated as still being full,
+                #   unless it's been hidden for too long.
+                hidden = hidden + 1 if mining.state is None else 0
+                still_full = mining.state == mine.FULL or \
+                    (mining.state is None and hidden < MINING_HIDDEN_UPDATES)
+                if still_full is True and \
+                        time.monotonic() - mining_start < MINING_TIMEOUT_SECONDS:
+                    continue
+                if mining.state == mine.EMPTY:
+                    log.info('Rock is empty.')
+                    log.debug('%s empty.', mining.name)
+                    stats.count('ores-mined', item=self.ore)
+                    behavior.human_behavior_rand(chance=100)
+                elif still_full is False:
+                    log.info('Lost sight of the rock being mined.')
+                else:
+                    log.info('Timed out waiting for mining to finish.')
+                mining = None
+
+            rock = self.scheduler.best()
+            if rock is None:
+                log.debug('Waiting for a rock to respawn %s...', tries)
+                # Move the mouse next to the rock that's expected to
+                #   respawn first, so it can be clicked on as soon as it
+                #   does.
+                next_respawn = self.scheduler.next_respawn()
+                if next_respawn is not None and next_respawn[0] is not hovering \
+                        and next_respawn[0].region is not None:
+                    hovering = next_respawn[0]
+                    input.Mouse(region=hovering.hover_region(),
+                                move_duration_range=(0, 500)).move_to()
+                continue
+            hovering = None
+
+            # The click cross shows whether the rock was clicked on long
+            #   before the chat message does, so misclicks are retried
+            #   right away.
+            clicked = input.Mouse(region=rock.click_region(), sleep_range=(0, 100, 0, 100),
+                                  move_duration_range=(0, 500)).click_coord(check=vis.click_result)
+            # Move the mouse away from the rock so it doesn't
+            #   interfere with reading the rock's state.
+            input.Mouse(region=(15, 15, 100, 100), move_duration_range=(0, 500)).moverel()
+            if clicked == vis.MISS:
+                log.info('Missed the rock, trying again.')
+                continue
+            log.info('Waiting for mining to start.')
+            misc.sleep_rand_roll(chance_range=(1, 200))
+
+            # Once the rock has been clicked on, wait for mining to
+            #   start by monitoring chat messages.
+            mining_started = chat.wait_for('You swing your pick at the rock.',
+                                           loop_num=5, loop_sleep_range=(100, 200))
+
+            # If mining hasn't started after looping has finished,
+            #   check to see if the inventory is full.
+            if mining_started is False:
+                log.debug('Timed out waiting for mining to start.')
+
+                inv_full = vis.Vision(region=vis.chat_menu, loop_num=1,
+                                      needle='./needles/chat-menu/mining-inventory-full.png'). \
+                    wait_for_needle()
+
+                # If the inventory is full, empty the ore and
+                #   return.
+                if inv_full is True:
+                    self.scheduler.flush()
+                    return 'inventory-full'
+                # Someone else may have mined the rock first.
+                continue
+
+            log.debug('Mining started.')
+            mining = rock
+            mining_start = time.monotonic()
+            hidden = 0
         return True
 
+    @trace.traced
     def drop_inv_ore(self):
         """
         Drops ore and optionally gems from inventory.
@@ -0,0 +1,206 @@
+# coding=UTF-8
+"""
+Saves what the screen looked like when something went wrong.
+
+The most recent captures taken by vision.grab() are kept in memory. The
+arrays are kept as they are rather than copied, so keeping them costs
+the bot thread nothing more than a deque append. When the bot fails with
+an uncaught exception, such as 'Unable to open bank!', or when a needle
+is only just missed, the captures are handed to a background thread.
+The thread draws the region and match of the most recent search over
+each capture and saves them as PNGs to a new directory in SNAPSHOT_DIR,
+along with the needle and an info.json file describing the failure.
+
+Snapshots are turned on with the 'snapshots' setting in the config file.
+
+"""
+import atexit
+import collections
+import json
+import logging as log
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+
+import cv2
+
+from ocvbot import config
+
+# Where snapshots are saved, relative to the ocvbot directory.
+SNAPSHOT_DIR = 'snapshots'
+# The maximum number of captures to keep, and the maximum number of bytes
+#   they can take up. Captures of the whole display are large, so fewer
+#   of them are kept.
+FRAMES = 20
+MAX_BYTES = 64 * 1024 * 1024
+# A needle that isn't found is only just missed if its best similarity
+#   is within this much of its confidence.
+NEAR_MISS = 0.05
+# The minimum number of seconds between near-miss snapshots of the same
+#   needle, so needles that are waited on don't flood SNAPSHOT_DIR.
+NEAR_MISS_INTERVAL = 300
+# The colors of the search region and the match drawn over each capture,
+#   in BGR.
+REGION_COLOR = (0, 255, 255)
+MATCH_COLOR = (0, 255, 0)
+
+enabled = config['main'].get('snapshots', False) is True
+
+# The most recent captures, as (time, region, frame) tuples, and the
+#   number of bytes they take up.
+frames = collections.deque()
+frames_bytes = 0
+# The (needle, region, location, similarity, conf) of the most recent
+#   search, see searched().
+last_search = None
+
+_near_misses = {}
+_queue = queue.Queue()
+_writer = None
+
+
+def keep(region, frame):
+    """
+    Keeps a capture, dropping the oldest captures if there are too many.
+    Only call this if enabled is True.
+
+    Args:
+        region (tuple): The (left, top, width, height) of the capture
+                        relative to the display.
+        frame (array): The capture, as returned by vision.grab(). The
+                       array isn't copied, so it must not be changed
+                       afterwards.
+
+    """
+    global frames_bytes
+    frames.append((time.time(), tuple(int(i) for i in region), frame))
+    frames_bytes += frame.nbytes
+    while len(frames) > FRAMES or (frames_bytes > MAX_BYTES and len(frames) > 1):
+        frames_bytes -= frames.popleft()[2].nbytes
+
+
+def searched(needle, region, location, similarity, conf):
+    """
+    Remembers a search for a needle, so it can be drawn over the
+    captures. If the needle was only just missed, saves a snapshot. Only
+    call this if enabled is True.
+
+    Args:
+        needle (file): Filepath to the needle.
+        region (tuple): The (left, top, width, height) of the region that
+                        was searched, relative to the display.
+        location (tuple): The (left, top, width, height) of the match
+                          relative to the region, or None if the needle
+                          wasn't found.
+        similarity (float): The best similarity found.
+        conf (float): The similarity the needle needed.
+
+    """
+    global last_search
+    last_search = (needle, tuple(int(i) for i in region), location, similarity, conf)
+    if location is None and similarity >= conf - NEAR_MISS:
+        now = time.monotonic()
+        if now - _near_misses.get(needle, -NEAR_MISS_INTERVAL) >= NEAR_MISS_INTERVAL:
+            _near_misses[needle] = now
+            save('near-miss')
+
+
+def save(reason):
+    """
+    Hands the kept captures and the most recent search to the background
+    thread to be saved. Returns right away.
+
+    Args:
+        reason (str): Why the snapshot is being saved, such as the
+                      exception's message. Used in the directory name.
+
+    """
+    global _writer
+    if enabled is False or not frames:
+        return
+    if _writer is None:
+        _writer = threading.Thread(target=_write_loop, name='snapshots', daemon=True)
+        _writer.start()
+    _queue.put((time.time(), reason, list(frames), last_search))
+
+
+def _write_loop():
+    while True:
+        snapshot = _queue.get()
+        try:
+            _write(*snapshot)
+        except Exception as error:
+            log.warning('Unable to save snapshot: %s', error)
+        finally:
+            _queue.task_done()
+
+
+def _write(saved, reason, captures, search):
+    """
+    Saves a snapshot, see save().
+
+    """
+    name = time.strftime('%Y-%m-%d_%H-%M-%S', time.localtime(saved)) + '_' + \
+        ''.join(character if character.isalnum() else '-' for character in reason)[:40]
+    path = os.path.join(SNAPSHOT_DIR, name)
+    os.makedirs(path, exist_ok=True)
+
+    info = {'reason': reason, 'time': saved, 'frames': []}
+    if search is not None:
+        needle, region, location, similarity, conf = search
+        info['search'] = {'needle': needle, 'region': region, 'location': location,
+                          'similarity': round(similarity, 3), 'conf': conf}
+        if os.path.exists(needle):
+            shutil.copy(needle, os.path.join(path, 'needle.png'))
+
+    for index, (captured, frame_region, frame) in enumerate(captures):
+        image = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        if search is not None:
+            _draw(image, frame_region, region, REGION_COLOR)
+            if location is not None:
+                _draw(image, frame_region, (region[0] + location[0], region[1] + location[1],
+                                            location[2], location[3]), MATCH_COLOR)
+        filename = 'frame-%02d.png' % index
+        cv2.imwrite(os.path.join(path, filename), image,
+                    [cv2.IMWRITE_PNG_COMPRESSION, 9])
+        info['frames'].append({'file': filename, 'time': captured, 'region': frame_region})
+
+    with open(os.path.join(path, 'info.json'), 'w') as file:
+        json.dump(info, file, indent=4)
+    log.info('Saved %s snapshot to %s', reason, path)
+
+
+def _draw(image, frame_region, region, color):
+    """
+    Draws the outline of a region, relative to the display, over a
+    capture of frame_region.
+
+    """
+    left = region[0] - frame_region[0]
+    top = region[1] - frame_region[1]
+    cv2.rectangle(image, (left, top), (left + region[2] - 1, top + region[3] - 1), color, 1)
+
+
+def _excepthook(exc_type, exc_value, traceback):
+    save(str(exc_value) or exc_type.__name__)
+    _previous_excepthook(exc_type, exc_value, traceback)
+
+
+def flush(timeout=30):
+    """
+    Waits up to timeout seconds for snapshots to finish saving.
+
+    """
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+
+_previous_excepthook = sys.excepthook
+if enabled is True:
+    sys.excepthook = _excepthook
+    # The writer thread is a daemon thread, so wait for it before exiting.
+    atexit.register(flush)
@@ -45,6 +45,11 @@ CHAT_MENU_HEIGHT = 129
 CHAT_MENU_RECENT_WIDTH = 490
 CHAT_MENU_RECENT_HEIGHT = 17
 
+# The part of the bank window that holds items, between the bank's tabs
+#   and its buttons.
+BANK_ITEMS_WINDOW_WIDTH = 470
+BANK_ITEMS_WINDOW_HEIGHT = 240
+
 # The entire display.
 DISPLAY_WIDTH = pag.size().width
 DISPLAY_HEIGHT = pag.size().height
@@ -62,26 +67,12 @@ MINIMAP_HEIGHT = 151
 MINIMAP_SLICE_WIDTH = 110
 MINIMAP_SLICE_HEIGHT = 73
 
-# TODO: Finish implementing stats.
 # Stats ----------------------------------------------------------------
 
-# Used for tracking how long the script has been running.
+# Used for tracking how long the script has been running. Everything
+#   else the script gets done is counted in stats.py.
 start_time = round(time.time())
 
-# The number of inventories a script has gone through.
-inventories = 0
-# The number of items gathered, approximately.
-items_gathered = 0
-# The amount of experience gained since the script started, approximately.
-xp_gained = 0
-# The amount of experience gained since installing this package
-xp_per_hour = 0
-
-ore_xp_dict = {
-    'copper': 16.5,
-    'iron': 35.5
-}
-
 # ----------------------------------------------------------------------
 # These variables are used to setup behavior.logout_rand_range(). ------
 # ----------------------------------------------------------------------
@@ -0,0 +1,193 @@
+# coding=UTF-8
+"""
+Counts what the bot gets done, such as ores mined, spells cast, items
+cooked and inventories gone through, along with the experience gained
+from each.
+
+Each counter keeps its total and the events of the last RATE_WINDOW
+seconds, so a rolling per-hour rate can be reported at any time. This
+makes it possible to tell whether a change actually made the bot any
+faster. A snapshot of every counter is saved to STATS_FILE every
+SAVE_INTERVAL seconds, and when the bot exits.
+
+Example:
+
+    stats.count('ores-mined', item='./needles/items/iron-ore.png')
+    stats.rate('xp')
+
+"""
+import atexit
+import collections
+import json
+import logging as log
+import os
+import time
+
+# Where snapshots are saved, relative to the ocvbot directory.
+STATS_FILE = 'stats.json'
+# The number of seconds that per-hour rates are calculated over.
+RATE_WINDOW = 3600
+# The number of seconds between snapshots.
+SAVE_INTERVAL = 60
+
+# The experience gained per item, keyed by the filename of the item's
+#   needle without the extension. Spells are keyed by the filename of the
+#   spell's needle.
+XP = {
+    'copper-ore': 17.5,
+    'tin-ore': 17.5,
+    'iron-ore': 35,
+    'curse': 29,
+    'high-alchemy': 65,
+    'raw-anchovies': 30,
+}
+
+# Every counter that has been created, keyed by name.
+counters = {}
+
+started = time.time()
+_last_save = time.monotonic()
+
+
+class Counter:
+    """
+    Counts one kind of event.
+
+    Args:
+        name (str): The name of the counter, such as 'ores-mined'.
+
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.total = 0
+        # The (time.monotonic(), amount) of each event in the last
+        #   RATE_WINDOW seconds, and the sum of their amounts.
+        self.events = collections.deque()
+        self.window_total = 0
+
+    def add(self, amount, now):
+        self.total += amount
+        self.events.append((now, amount))
+        self.window_total += amount
+        self._expire(now)
+
+    def _expire(self, now):
+        while self.events and now - self.events[0][0] > RATE_WINDOW:
+            self.window_total -= self.events.popleft()[1]
+
+    def rate(self, now=None):
+        """
+        Calculates how many events happen per hour.
+
+        Returns:
+            Returns the rolling per-hour rate as a float. Until the bot
+            has been running for RATE_WINDOW seconds, the rate is
+            calculated over the time it has been running.
+
+        """
+        if now is None:
+            now = time.monotonic()
+        self._expire(now)
+        elapsed = min(RATE_WINDOW, time.time() - started)
+        if elapsed <= 0:
+            return 0.0
+        return self.window_total * 3600 / elapsed
+
+
+def count(name, amount=1, item=None):
+    """
+    Counts an event.
+
+    Args:
+        name (str): The name of the counter, such as 'ores-mined'.
+        amount (int): The number of events to count, default is 1.
+        item (file): Filepath to the needle of the item or spell the
+                     event was for. If it's in XP, the experience gained
+                     is added to the 'xp' counter, default is None.
+
+    """
+    now = time.monotonic()
+    if name not in counters:
+        counters[name] = Counter(name)
+    counters[name].add(amount, now)
+
+    if item is not None:
+        xp = XP.get(os.path.splitext(os.path.basename(item))[0])
+        if xp is not None:
+            if 'xp' not in counters:
+                counters['xp'] = Counter('xp')
+            counters['xp'].add(xp * amount, now)
+
+    if now - _last_save >= SAVE_INTERVAL:
+        save()
+
+
+def total(name):
+    """
+    Gets the total number of events counted since the bot started.
+
+    """
+    return counters[name].total if name in counters else 0
+
+
+def rate(name):
+    """
+    Gets the rolling per-hour rate of a counter, see Counter.rate().
+
+    """
+    return counters[name].rate() if name in counters else 0.0
+
+
+def snapshot():
+    """
+    Gets the total and per-hour rate of every counter.
+
+    Returns:
+        Returns a dict that can be saved as JSON.
+
+    """
+    now = time.monotonic()
+    return {
+        'started': round(started),
+        'elapsed': round(time.time() - started),
+        'counters': {name: {'total': counter.total,
+                            'per_hour': round(counter.rate(now), 1)}
+                     for name, counter in counters.items()},
+    }
+
+
+def save(path=STATS_FILE):
+    """
+    Saves a snapshot of every counter.
+
+    Args:
+        path (file): Where to save the snapshot, default is STATS_FILE.
+
+    """
+    global _last_save
+    _last_save = time.monotonic()
+    if not counters:
+        return
+    # Write to a temporary file first so the snapshot is never left
+    #   half-written if the bot is killed.
+    temp_path = path + '.tmp'
+    try:
+        with open(temp_path, 'w') as file:
+            json.dump(snapshot(), file, indent=4, sort_keys=True)
+        os.replace(temp_path, path)
+    except OSError as error:
+        log.warning('Unable to save stats to %s: %s', path, error)
+
+
+def report():
+    """
+    Logs the total and per-hour rate of every counter.
+
+    """
+    for name, counter in counters.items():
+        log.info('%s: %s total, %s per hour', name, round(counter.total, 1),
+                 round(counter.rate(), 1))
+
+
+atexit.register(save)
@@ -0,0 +1,265 @@
+# coding=UTF-8
+"""
+Times every search for a needle, so the needles and regions that take the
+most time can be found and optimized.
+
+Each search records how long the region took to capture, how long the
+needle took to match, the area of the region, and the best similarity
+found. Each wait records how many tries it took. The timings are kept per
+needle, in histograms with one bucket per power of two miliseconds, and
+are saved to TIMING_FILE when the bot exits, or whenever dump() is called.
+On POSIX systems, sending the bot SIGUSR1 also calls dump().
+
+Timing is turned on with the 'timing' setting in the config file. While
+it's off, the hot path only pays for checking the enabled flag.
+
+"""
+import atexit
+import functools
+import json
+import logging as log
+import os
+import signal
+import time
+
+from ocvbot import config
+
+# Where timings are saved, relative to the ocvbot directory.
+TIMING_FILE = 'timing.json'
+# The number of histogram buckets. The last bucket holds everything
+#   slower than 2 ** (BUCKETS - 2) miliseconds.
+BUCKETS = 16
+
+enabled = config['main'].get('timing', False) is True
+
+# The timings of every needle searched for, keyed by the needle's
+#   filepath.
+needles = {}
+# The timings of functions that aren't tied to a single needle, such as
+#   orient(), keyed by function name.
+calls = {}
+
+
+class Histogram:
+    """
+    Counts durations in buckets of powers of two miliseconds. Bucket 0
+    holds durations under 1 milisecond, and bucket N holds durations
+    from 2 ** (N - 1) up to 2 ** N miliseconds.
+
+    """
+
+    def __init__(self):
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        bucket = min(int(seconds * 1000).bit_length(), BUCKETS - 1)
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        """
+        Estimates a percentile of the durations.
+
+        Returns:
+            Returns the upper bound of the bucket holding the percentile,
+            in miliseconds, or None if nothing has been counted.
+
+        """
+        if self.count == 0:
+            return None
+        needed = self.count * percent / 100
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= needed:
+                return 2 ** bucket
+        return 2 ** (BUCKETS - 1)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 1),
+            'mean_ms': round(self.total * 1000 / self.count, 2) if self.count else None,
+            'max_ms': round(self.max * 1000, 1),
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'buckets': self.buckets,
+        }
+
+
+class NeedleTimings:
+    """
+    The timings of every search for one needle.
+
+    """
+
+    def __init__(self):
+        self.capture = Histogram()
+        self.match = Histogram()
+        self.wait = Histogram()
+        self.click = Histogram()
+        self.found = 0
+        self.area = 0
+        self.best_similarity = None
+        self.worst_similarity = None
+        # How many waits took each number of tries, keyed by tries.
+        self.tries = {}
+        self.timeouts = 0
+
+    def as_dict(self):
+        return {
+            'capture': self.capture.as_dict(),
+            'match': self.match.as_dict(),
+            'wait': self.wait.as_dict(),
+            'click': self.click.as_dict(),
+            'searches': self.capture.count,
+            'found': self.found,
+            'area': self.area,
+            'best_similarity': self.best_similarity,
+            'worst_similarity': self.worst_similarity,
+            'tries': {str(tries): count for tries, count in sorted(self.tries.items())},
+            'timeouts': self.timeouts,
+        }
+
+
+def _needle(needle):
+    if needle not in needles:
+        needles[needle] = NeedleTimings()
+    return needles[needle]
+
+
+def record_find(needle, region, capture, match, similarity, found):
+    """
+    Records a single search for a needle. Only call this if enabled is
+    True.
+
+    Args:
+        needle (file): Filepath to the needle.
+        region (tuple): The (left, top, width, height) of the region that
+                        was searched.
+        capture (float): The number of seconds the capture took.
+        match (float): The number of seconds the match took.
+        similarity (float): The best similarity found, expressed as a
+                            decimal <= 1.
+        found (bool): Whether the needle was found.
+
+    """
+    timings = _needle(needle)
+    timings.capture.add(capture)
+    timings.match.add(match)
+    timings.area = int(region[2] * region[3])
+    similarity = round(similarity, 3)
+    if timings.best_similarity is None or similarity > timings.best_similarity:
+        timings.best_similarity = similarity
+    if timings.worst_similarity is None or similarity < timings.worst_similarity:
+        timings.worst_similarity = similarity
+    if found is True:
+        timings.found += 1
+
+
+def record_wait(needle, seconds, tries, found):
+    """
+    Records a wait for a needle, see record_find()'s docstring.
+
+    Args:
+        seconds (float): The number of seconds the wait took, including
+                         sleeping between tries.
+        tries (int): The number of times the needle was searched for.
+
+    """
+    timings = _needle(needle)
+    timings.wait.add(seconds)
+    timings.tries[tries] = timings.tries.get(tries, 0) + 1
+    if found is False:
+        timings.timeouts += 1
+
+
+def record_click(needle, seconds):
+    """
+    Records finding and clicking on a needle, see record_find()'s
+    docstring.
+
+    """
+    _needle(needle).click.add(seconds)
+
+
+def record_call(name, seconds):
+    """
+    Records a call to a function that isn't tied to a single needle.
+
+    """
+    if name not in calls:
+        calls[name] = Histogram()
+    calls[name].add(seconds)
+
+
+def timed(function):
+    """
+    Decorator that records every call to a function with record_call(),
+    under the function's name. If timing is turned off, the function is
+    returned as-is.
+
+    """
+    if enabled is False:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record_call(function.__name__, time.perf_counter() - started)
+    return wrapper
+
+
+def snapshot():
+    """
+    Gets every timing recorded so far.
+
+    Returns:
+        Returns a dict that can be saved as JSON.
+
+    """
+    return {
+        'needles': {needle: timings.as_dict() for needle, timings in needles.items()},
+        'calls': {name: histogram.as_dict() for name, histogram in calls.items()},
+    }
+
+
+def dump(path=TIMING_FILE):
+    """
+    Saves every timing recorded so far, and logs the needles that took
+    the most time in total.
+
+    Args:
+        path (file): Where to save the timings, default is TIMING_FILE.
+
+    """
+    if not needles and not calls:
+        return
+    try:
+        with open(path, 'w') as file:
+            json.dump(snapshot(), file, indent=4, sort_keys=True)
+    except OSError as error:
+        log.warning('Unable to save timings to %s: %s', path, error)
+        return
+
+    slowest = sorted(needles.items(), key=lambda item: item[1].capture.total + item[1].match.total,
+                     reverse=True)
+    for needle, timings in slowest[:5]:
+        log.info('%s: %s searches, %sms capturing, %sms matching, area %s', needle,
+                 timings.capture.count, round(timings.capture.total * 1000),
+                 round(timings.match.total * 1000), timings.area)
+    log.info('Saved timings to %s', path)
+
+
+if enabled is True:
+    atexit.register(dump)
+    if os.name == 'posix':
+        signal.signal(signal.SIGUSR1, lambda signum, frame: dump())
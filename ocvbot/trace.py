@@ -0,0 +1,203 @@
+# coding=UTF-8
+"""
+Records nested timing spans of high-level behaviors, such as travel() or
+Mining.mine_rocks(), to show where the bot's time goes.
+
+The wall time of each span is split into time spent capturing and
+matching ("vision"), waiting for the mouse and keyboard ("input"),
+deliberately sleeping for a random period of time ("sleep"), and
+everything else ("idle"). Time is added to every span that's open on
+the thread it was spent on, so a span's split includes the spans nested
+within it. This shows how much of each inventory is humanization and how
+much is overhead that could be removed.
+
+Spans, and the vision, input and sleep time within them, are kept in a
+ring buffer of the most recent BUFFER_SIZE events. They are saved to
+TRACE_FILE in Chrome's trace event format when the bot exits, or
+whenever export() is called. The file can be opened in Perfetto
+(https://ui.perfetto.dev) or chrome://tracing.
+
+Example:
+
+    @trace.traced
+    def open_bank(direction):
+        ...
+
+    with trace.span('deposit'):
+        ...
+
+Tracing is turned on with the 'tracing' setting in the config file. While
+it's off, traced() returns functions as-is and the hot path only pays for
+checking the enabled flag.
+
+"""
+import atexit
+import collections
+import contextlib
+import functools
+import json
+import logging as log
+import os
+import threading
+import time
+
+from ocvbot import config
+
+# Where traces are saved, relative to the ocvbot directory.
+TRACE_FILE = 'trace.json'
+# The number of events kept in the ring buffer.
+BUFFER_SIZE = 100000
+# The kinds of time that can be added to a span. Time not added is idle.
+CATEGORIES = ('vision', 'input', 'sleep')
+
+enabled = config['main'].get('tracing', False) is True
+
+# The most recent events. Each event is a (category, name, thread ID,
+#   start, duration, split) tuple, with times in seconds from
+#   time.perf_counter(). split is None unless the event is a span.
+events = collections.deque(maxlen=BUFFER_SIZE)
+# The total wall time and split of every span that has ended, keyed by
+#   span name.
+totals = {}
+
+# Each thread's stack of open spans.
+_local = threading.local()
+# Thread names, keyed by thread ID.
+_threads = {}
+_origin = time.perf_counter()
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+        _threads[threading.get_ident()] = threading.current_thread().name
+    return stack
+
+
+class Span:
+    """
+    A timing span, used as a context manager.
+
+    Args:
+        name (str): The name of the span, such as 'travel'.
+
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = None
+        self.split = dict.fromkeys(CATEGORIES, 0.0)
+
+    def __enter__(self):
+        _stack().append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.started
+        _stack().pop()
+        split = dict(self.split, idle=max(0.0, duration - sum(self.split.values())))
+        events.append(('span', self.name, threading.get_ident(), self.started, duration, split))
+
+        total = totals.setdefault(self.name, dict(count=0, wall=0.0, idle=0.0,
+                                                  **dict.fromkeys(CATEGORIES, 0.0)))
+        total['count'] += 1
+        total['wall'] += duration
+        for category, seconds in split.items():
+            total[category] += seconds
+        return False
+
+
+def span(name):
+    """
+    Opens a span, see Span. If tracing is turned off, returns a context
+    manager that does nothing.
+
+    """
+    if enabled is False:
+        return contextlib.nullcontext()
+    return Span(name)
+
+
+def traced(function):
+    """
+    Decorator that wraps every call to a function in a span named after
+    the function. If tracing is turned off, the function is returned
+    as-is.
+
+    """
+    if enabled is False:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with Span(function.__qualname__):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def add(category, started):
+    """
+    Adds the time since started to every span open on this thread. Only
+    call this if enabled is True.
+
+    Args:
+        category (str): One of CATEGORIES.
+        started (float): When the time started being spent, from
+                         time.perf_counter().
+
+    """
+    duration = time.perf_counter() - started
+    for open_span in _stack():
+        open_span.split[category] += duration
+    events.append((category, category, threading.get_ident(), started, duration, None))
+
+
+def export(path=TRACE_FILE):
+    """
+    Saves the ring buffer in Chrome's trace event format, and logs the
+    split of every kind of span.
+
+    Args:
+        path (file): Where to save the trace, default is TRACE_FILE.
+
+    """
+    if not events:
+        return
+    pid = os.getpid()
+    trace_events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread,
+                     'args': {'name': name}} for thread, name in list(_threads.items())]
+    for category, name, thread, started, duration, split in list(events):
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': thread,
+                 'ts': round((started - _origin) * 1000000),
+                 'dur': round(duration * 1000000)}
+        if split is not None:
+            event['args'] = {key + '_ms': round(seconds * 1000, 1) for key, seconds in split.items()}
+        trace_events.append(event)
+    try:
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, file)
+    except OSError as error:
+        log.warning('Unable to save trace to %s: %s', path, error)
+        return
+
+    report()
+    log.info('Saved trace to %s', path)
+
+
+def report():
+    """
+    Logs how the wall time of every kind of span was split.
+
+    """
+    for name, total in totals.items():
+        wall = total['wall'] or 1
+        log.info('%s: %s calls, %ss, %s%% vision, %s%% input, %s%% sleep, %s%% idle', name,
+                 total['count'], round(total['wall'], 1),
+                 round(total['vision'] * 100 / wall), round(total['input'] * 100 / wall),
+                 round(total['sleep'] * 100 / wall), round(total['idle'] * 100 / wall))
+
+
+if enabled is True:
+    atexit.register(export)
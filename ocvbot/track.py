@@ -0,0 +1,183 @@
+# coding=UTF-8
+"""
+Follows a moving target, such as an NPC, across captures of the display.
+
+Once the target has been found, only a small window around where it's
+predicted to be is searched. The prediction assumes the target keeps
+moving at the same velocity, which is estimated with an alpha-beta
+filter (a steady-state Kalman filter for constant-velocity motion). The
+whole search region is only searched again when the target is lost.
+
+"""
+import logging as log
+import time
+
+import cv2
+import numpy as np
+
+from ocvbot import trace, vision as vis
+
+# How far past the target's predicted position to search for it, in
+#   pixels. The window also grows with the distance the target may have
+#   moved since it was last seen.
+SEARCH_MARGIN = 15
+# The maximum speed the target is assumed to move at, in pixels per
+#   second. NPCs walk about one tile every 0.6 seconds.
+MAX_SPEED = 100
+# How strongly each new measurement corrects the predicted position and
+#   velocity, from 0 (ignore measurements) to 1 (trust them fully).
+ALPHA = 0.8
+BETA = 0.3
+# If the target hasn't been seen for this many seconds, its velocity is
+#   no longer trusted.
+MAX_TRACK_AGE = 3
+
+
+class Tracker:
+    """
+    Tracks a single moving target.
+
+    Args:
+        needle (file): Filepath to a needle of the target.
+        conf (float): The similarity required to match the needle,
+                      expressed as a decimal <= 1, default is 0.8.
+        region (tuple): The (left, top, width, height) of the display to
+                        search for the target in, default is
+                        vision.game_screen.
+
+    """
+
+    def __init__(self, needle, conf=0.8, region=None):
+        self.needle = needle
+        self.conf = conf
+        self.region = vis.game_screen if region is None else region
+        # The target's (X, Y) center relative to the display, its velocity
+        #   in pixels per second, and when it was last seen. The position
+        #   is None until the target has been found.
+        self.position = None
+        self.velocity = np.zeros(2)
+        self.seen_at = None
+
+    def predict(self, at=None):
+        """
+        Predicts where the target will be.
+
+        Args:
+            at (float): The time.monotonic() value to predict the target's
+                        position at. If None, the current time is used,
+                        default is None.
+
+        Returns:
+            Returns the (X, Y) center of the target relative to the
+            display as a NumPy array, or None if the target isn't being
+            tracked.
+
+        """
+        if self.position is None:
+            return None
+        if at is None:
+            at = time.monotonic()
+        return self.position + self.velocity * min(at - self.seen_at, MAX_TRACK_AGE)
+
+    def _window(self, now):
+        """
+        Gets the region of the display to search for the target in,
+        clipped to the search region.
+
+        """
+        region_left, region_top, region_width, region_height = self.region
+        height, width = vis.load_needle(self.needle).shape[:2]
+        predicted = self.predict(now)
+        spread = SEARCH_MARGIN + MAX_SPEED * (now - self.seen_at)
+        left = max(region_left, int(predicted[0] - width / 2 - spread))
+        top = max(region_top, int(predicted[1] - height / 2 - spread))
+        right = min(region_left + region_width, int(predicted[0] + width / 2 + spread))
+        bottom = min(region_top + region_height, int(predicted[1] + height / 2 + spread))
+        if right - left < width or bottom - top < height:
+            return self.region
+        return left, top, right - left, bottom - top
+
+    def _search(self, window):
+        """
+        Searches a region of the display for the target.
+
+        Returns:
+            Returns the (X, Y) center of the best match relative to the
+            display as a NumPy array, or None if the target wasn't found.
+
+        """
+        pixels = vis.load_needle(self.needle)
+        frame = vis.grab(window)
+        if frame.shape[0] < pixels.shape[0] or frame.shape[1] < pixels.shape[1]:
+            return None
+        started = time.perf_counter()
+        result = cv2.matchTemplate(np.ascontiguousarray(frame), pixels, cv2.TM_CCOEFF_NORMED)
+        _, score, _, location = cv2.minMaxLoc(result)
+        if trace.enabled is True:
+            trace.add('vision', started)
+        if score < self.conf:
+            return None
+        height, width = pixels.shape[:2]
+        return np.array([window[0] + location[0] + width / 2,
+                         window[1] + location[1] + height / 2])
+
+    def update(self):
+        """
+        Searches for the target near where it's predicted to be, falling
+        back to searching the whole region if it's not there.
+
+        Returns:
+            Returns True if the target was found, False if otherwise.
+
+        """
+        now = time.monotonic()
+        tracking = self.position is not None and now - self.seen_at <= MAX_TRACK_AGE
+        window = self._window(now) if tracking is True else self.region
+        measured = self._search(window)
+        if measured is None and tracking is True:
+            log.debug('Lost track of %s, searching the whole region.', self.needle)
+            tracking = False
+            if window != self.region:
+                measured = self._search(self.region)
+
+        if measured is None:
+            self.position = None
+            self.velocity = np.zeros(2)
+            return False
+
+        if tracking is False:
+            # The target was found from scratch, so its velocity is unknown.
+            self.position = measured
+            self.velocity = np.zeros(2)
+        else:
+            elapsed = max(now - self.seen_at, 1e-3)
+            predicted = self.predict(now)
+            residual = measured - predicted
+            self.position = predicted + ALPHA * residual
+            self.velocity = self.velocity + (BETA / elapsed) * residual
+        self.seen_at = now
+        return True
+
+    def locate(self, lead=0.0):
+        """
+        Finds the target and predicts where it will be once the mouse
+        reaches it.
+
+        Args:
+            lead (float): The number of seconds ahead to predict the
+                          target's position, such as how long the mouse
+                          takes to move to it, default is 0.0.
+
+        Returns:
+            Returns a (left, top, width, height) 4-tuple of the target
+            relative to the display, or None if the target can't be found.
+
+        """
+        if self.update() is False:
+            return None
+        height, width = vis.load_needle(self.needle).shape[:2]
+        center_x, center_y = self.predict(self.seen_at + lead)
+        region_left, region_top, region_width, region_height = self.region
+        left = min(max(int(center_x - width / 2), region_left), region_left + region_width - width)
+        top = min(max(int(center_y - height / 2), region_top), region_top + region_height - height)
+        return left, top, width, height
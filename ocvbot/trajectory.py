@@ -0,0 +1,154 @@
+# coding=UTF-8
+"""
+Generates human-like mouse cursor trajectories.
+
+A family of randomized Bezier curves is generated once with NumPy. Each
+curve is "normalized": it starts at (0, 0) and ends at (1, 0). Moving the
+mouse only requires picking one of these curves and scaling, rotating,
+and translating it to fit the start and end points of the move, which is
+a handful of array operations rather than a Python loop per point.
+
+"""
+import functools
+
+import numpy as np
+
+# How often the cursor position is updated while moving, in seconds.
+STEP_INTERVAL = 0.008
+# The number of points each normalized curve is sampled at.
+TEMPLATE_POINTS = 200
+
+
+class TrajectoryEngine:
+    """
+    Builds and caches a family of normalized mouse trajectories.
+
+    Args:
+        seed (int): Seed for the random number generator used to build
+                    the curves and to pick a curve for each move. If
+                    None, a new family of curves is generated every time
+                    the bot starts, default is None.
+        templates (int): The number of normalized curves to generate,
+                         default is 64.
+        points (int): The number of points each normalized curve is
+                      sampled at, default is TEMPLATE_POINTS.
+
+    """
+
+    def __init__(self, seed=None, templates=64, points=TEMPLATE_POINTS):
+        self.rng = np.random.default_rng(seed)
+        self.templates = self._build_templates(templates, points)
+
+    def _build_templates(self, count, points):
+        """
+        Generates every normalized curve at once.
+
+        Returns:
+            Returns an array of shape (count, points, 2).
+
+        """
+        # Ease in and out so the cursor accelerates and decelerates the
+        #   way a hand does. Each template gets a slightly different
+        #   easing strength.
+        steps = np.linspace(0, 1, points)
+        strength = self.rng.uniform(1.5, 3.0, size=(count, 1))
+        eased = steps ** strength / (steps ** strength + (1 - steps) ** strength)
+
+        # Cubic Bezier curves from (0, 0) to (1, 0) with two randomized
+        #   control points that pull the curve off of a straight line.
+        ctrl_1 = np.stack([self.rng.uniform(0.1, 0.5, count),
+                           self.rng.uniform(-0.35, 0.35, count)], axis=1)
+        ctrl_2 = np.stack([self.rng.uniform(0.5, 0.9, count),
+                           self.rng.uniform(-0.35, 0.35, count)], axis=1)
+
+        t = eased[:, :, np.newaxis]
+        curves = (3 * (1 - t) ** 2 * t * ctrl_1[:, np.newaxis, :]
+                  + 3 * (1 - t) * t ** 2 * ctrl_2[:, np.newaxis, :])
+        curves[:, :, 0] += t[:, :, 0] ** 3
+
+        # Add a little tremor that fades out near the destination.
+        tremor = self.rng.normal(0, 0.004, size=curves.shape)
+        curves += tremor * (1 - t)
+        curves[:, 0] = (0, 0)
+        curves[:, -1] = (1, 0)
+        return curves
+
+    @functools.lru_cache(maxsize=1024)
+    def _resampled(self, index, count):
+        """
+        Gets a normalized curve resampled to the given number of points.
+        Results are cached since moves of similar durations need the same
+        number of points.
+
+        """
+        template = self.templates[index]
+        positions = np.linspace(0, len(template) - 1, count).round().astype(int)
+        return template[positions]
+
+    def path(self, start, end, duration):
+        """
+        Builds a trajectory between two points.
+
+        Args:
+            start (tuple): The (X, Y) coordinates to start from.
+            end (tuple): The (X, Y) coordinates to end at.
+            duration (float): The number of seconds the move should take.
+
+        Returns:
+            Returns a 2-tuple containing an array of (X, Y) integer
+            coordinates and an array of the same length containing the
+            number of seconds after the start of the move at which the
+            cursor should be at each coordinate.
+
+        """
+        start = np.asarray(start, dtype=float)
+        end = np.asarray(end, dtype=float)
+        delta = end - start
+        distance = np.hypot(delta[0], delta[1])
+
+        count = max(2, int(duration / STEP_INTERVAL))
+        # There's no point in having more points than pixels to move.
+        count = min(count, max(2, int(distance)))
+        curve = self._resampled(int(self.rng.integers(len(self.templates))), count)
+
+        # Scale the curve to the length of the move, then rotate it to
+        #   point at the destination.
+        cos, sin = delta / distance if distance else (1.0, 0.0)
+        rotation = np.array([[cos, sin], [-sin, cos]])
+        # Randomly mirror the curve so it bends both ways.
+        if self.rng.integers(2) == 1:
+            curve = curve * (1, -1)
+        points = (curve * distance) @ rotation + start
+        points = points.round().astype(int)
+        points[-1] = end.round().astype(int)
+
+        times = np.linspace(0, duration, count)
+
+        # Drop points that don't move the cursor.
+        keep = np.ones(count, dtype=bool)
+        keep[1:] = np.any(points[1:] != points[:-1], axis=1)
+        return points[keep], times[keep]
+
+    def events(self, start, end, duration, delay=0.0):
+        """
+        Builds a trajectory as a sequence of 'move' events for one of the
+        input backends in backends.py.
+
+        Args:
+            start (tuple): The (X, Y) coordinates to start from.
+            end (tuple): The (X, Y) coordinates to end at.
+            duration (float): The number of seconds the move should take.
+            delay (float): The number of seconds after the start of the
+                           sequence at which the move should begin,
+                           default is 0.
+
+        Returns:
+            Returns a list of 3-tuples describing each event.
+
+        """
+        points, times = self.path(start, end, duration)
+        return [(delay + due, 'move', (x_coord, y_coord))
+                for (x_coord, y_coord), due in zip(points.tolist(), times.tolist())]
+
+
+engine = TrajectoryEngine()
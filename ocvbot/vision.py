@@ -3,12 +3,16 @@
 Module for "seeing" the client.
 
 """
+import functools
 import logging as log
 import pathlib
+import time
 
+import cv2
+import numpy as np
 import pyautogui as pag
 
-from ocvbot import input, misc, startup as start
+from ocvbot import input, misc, startup as start, snapshots, timing, trace
 
 
 def haystack_locate(needle, haystack, grayscale=False, conf=0.95):
@@ -36,6 +40,214 @@ def haystack_locate(needle, haystack, grayscale=False, conf=0.95):
     return False
 
 
+def grab(region):
+    """
+    Captures a single frame of the given region of the display.
+
+    Args:
+        region (tuple): A 4-tuple containing the left, top, width, and
+                        height of the region to capture.
+
+    Returns:
+        Returns a NumPy array of shape (height, width, 3) containing the
+        region's RGB pixel values.
+
+    """
+    started = time.perf_counter()
+    frame = np.asarray(pag.screenshot(region=tuple(int(i) for i in region)).convert('RGB'))
+    if trace.enabled is True:
+        trace.add('vision', started)
+    if snapshots.enabled is True:
+        snapshots.keep(region, frame)
+    return frame
+
+
+@functools.lru_cache(maxsize=None)
+def load_needle(needle, grayscale=False):
+    """
+    Reads a needle into an RGB array. Each needle is only read from disk
+    once.
+
+    Args:
+        needle (file): Filepath to the needle image.
+        grayscale (bool): Whether to convert the needle to grayscale,
+                          default is False.
+
+    Returns:
+        Returns a NumPy array of shape (height, width, 3), or of shape
+        (height, width) if grayscale is True.
+
+    """
+    image = cv2.imread(str(pathlib.Path(needle)))
+    if image is None:
+        raise Exception('Could not read needle ' + str(needle) + '!')
+    if grayscale is True:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def locate(frame, needle, conf=0.95, grayscale=False):
+    """
+    Finds a needle within a capture the same way PyAutoGUI does, by
+    picking the first position, left to right and then top to bottom,
+    whose similarity is above conf.
+
+    Args:
+        frame (array): An RGB capture, as returned by vision.grab().
+        needle (file): Filepath to the needle image.
+        conf (float): Similarity required to match the needle, expressed
+                      as a decimal <= 1, default is 0.95.
+        grayscale (bool): Whether to convert the capture and the needle
+                          to grayscale before matching, default is False.
+
+    Returns:
+        Returns a 2-tuple. The first item is the (left, top, width,
+        height) of the needle relative to the capture, or None if it
+        wasn't found. The second item is the best similarity found, as a
+        float.
+
+    """
+    started = time.perf_counter()
+    pixels = load_needle(needle, grayscale)
+    frame = np.ascontiguousarray(frame)
+    if grayscale is True:
+        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+    height, width = pixels.shape[:2]
+    if height > frame.shape[0] or width > frame.shape[1]:
+        return None, 0.0
+
+    result = cv2.matchTemplate(frame, pixels, cv2.TM_CCOEFF_NORMED)
+    similarity = float(result.max())
+    matches = np.flatnonzero(result > conf)
+    if trace.enabled is True:
+        trace.add('vision', started)
+    if len(matches) == 0:
+        return None, similarity
+    top, left = divmod(int(matches[0]), result.shape[1])
+    return (left, top, width, height), similarity
+
+
+def slot_match(slot, needle):
+    """
+    Compares a small capture, such as a single inventory or bank slot,
+    against a needle. The capture must be at least as large as the needle.
+
+    Args:
+        slot (array): An RGB capture, as returned by vision.grab().
+        needle (file): Filepath to the needle image.
+
+    Returns:
+        Returns the best similarity between the needle and any position
+        within the capture, as a float <= 1.
+
+    """
+    started = time.perf_counter()
+    similarity = float(cv2.matchTemplate(np.ascontiguousarray(slot), load_needle(needle),
+                                         cv2.TM_CCOEFF_NORMED).max())
+    if trace.enabled is True:
+        trace.add('vision', started)
+    return similarity
+
+
+def needle_at(region, needle, conf=0.95, margin=2):
+    """
+    Checks whether a needle is still at the region it was last found at,
+    using a single capture of that region rather than a search.
+
+    Args:
+        region (tuple): The (left, top, width, height) of the needle as
+                        returned by Vision.wait_for_needle(get_tuple=True).
+        needle (file): Filepath to the needle image.
+        conf (float): Similarity required to match the needle, expressed
+                      as a decimal <= 1, default is 0.95.
+        margin (int): The number of pixels past each edge of region to
+                      capture, in case the needle has moved slightly,
+                      default is 2.
+
+    Returns:
+        Returns True if the needle is at the region, False otherwise.
+
+    """
+    left, top, width, height = region
+    frame = grab((left - margin, top - margin, width + 2 * margin, height + 2 * margin))
+    return slot_match(frame, needle) >= conf
+
+
+# The results of click_result(). The client draws a red cross where the
+#   mouse clicked on something that can be interacted with, and a yellow
+#   cross where it clicked on the ground to walk.
+HIT = 'hit'
+MISS = 'miss'
+# The number of times to click a needle before giving up, if each click
+#   misses.
+CLICK_RETRIES = 3
+# The number of pixels around the click to look for the cross in, and the
+#   number of pixels of the cross's color that need to be found.
+CLICK_CROSS_RADIUS = 10
+CLICK_CROSS_MIN_PIXELS = 6
+# How many times, and how many miliseconds apart, to look for the cross.
+#   The cross appears within a frame of the click and lasts about 400
+#   miliseconds.
+CLICK_CROSS_POLLS = 5
+CLICK_CROSS_SLEEP_RANGE = (10, 30)
+
+
+def click_cross(frame):
+    """
+    Classifies the click cross in a capture of the area around a click.
+
+    Args:
+        frame (array): An RGB capture, as returned by grab().
+
+    Returns:
+        Returns HIT if a red cross is drawn, MISS if a yellow cross is
+        drawn, or None if neither is.
+
+    """
+    red, green, blue = (frame[:, :, channel].astype(np.int16) for channel in range(3))
+    bright_red = (red > 180) & (green < 60) & (blue < 60)
+    bright_yellow = (red > 180) & (green > 180) & (blue < 60)
+    red_pixels = int(np.count_nonzero(bright_red))
+    yellow_pixels = int(np.count_nonzero(bright_yellow))
+    if max(red_pixels, yellow_pixels) < CLICK_CROSS_MIN_PIXELS:
+        return None
+    return HIT if red_pixels >= yellow_pixels else MISS
+
+
+def click_result(position=None):
+    """
+    Checks whether a click landed on something that can be interacted
+    with by looking for the cross the client draws where the mouse was
+    clicked. Only works for clicks within the game screen.
+
+    Args:
+        position (tuple): The (X, Y) coordinates of the click relative to
+                          the display. If None, the position of the most
+                          recent click is used, default is None.
+
+    Returns:
+        Returns HIT if the click landed on something, MISS if it landed
+        on the ground, or None if no cross could be found, such as when
+        the click didn't register.
+
+    """
+    if position is None:
+        position = input.last_click
+    if position is None:
+        return None
+    x_coord, y_coord = position
+    region = (x_coord - CLICK_CROSS_RADIUS, y_coord - CLICK_CROSS_RADIUS,
+              2 * CLICK_CROSS_RADIUS + 1, 2 * CLICK_CROSS_RADIUS + 1)
+    for _ in range(CLICK_CROSS_POLLS):
+        result = click_cross(grab(region))
+        if result is not None:
+            log.debug('Click at %s was a %s.', position, result)
+            return result
+        misc.sleep_rand(*CLICK_CROSS_SLEEP_RANGE)
+    log.debug('No click cross found at %s.', position)
+    return None
+
+
 def wait_for_needle_list(loops, needle_list, sleep_range):
     """
     Works like vision.wait_for_needle(), except multiple needles can be
@@ -94,8 +306,8 @@ class Vision:
                      center as a 2-tuple (relative to the display's
                      dimensions).
         conf (float): The confidence value required to match the needle
-                      successfully, expressed as a decimal <= 1. This is
-                      used by PyAutoGUI, default is 0.95.
+                      successfully, expressed as a decimal <= 1. See
+                      locate(), default is 0.95.
         loop_num (int): The number of times wait_for_image() will search
                         the given coordinates for the needle, default is
                         10.
@@ -107,11 +319,17 @@ class Vision:
         grayscale (bool): Converts the haystack to grayscale before
                           searching within it. Speeds up searching by
                           about 30%, default is false.
+        retry_policy (RetryPolicy): A policy from retry.py to use instead
+                                    of loop_num and loop_sleep_range when
+                                    waiting for the needle. The policy
+                                    learns how long the needle usually
+                                    takes to appear, default is None.
 
     """
 
     def __init__(self, region, needle, loctype='regular', conf=0.95,
-                 loop_num=10, loop_sleep_range=(0, 100), grayscale=False):
+                 loop_num=10, loop_sleep_range=(0, 100), grayscale=False,
+                 retry_policy=None):
         self.grayscale = grayscale
         self.region = region
         self.needle = needle
@@ -119,6 +337,7 @@ class Vision:
         self.conf = conf
         self.loop_num = loop_num
         self.loop_sleep_range = loop_sleep_range
+        self.retry_policy = retry_policy
 
     def find_needle(self):
         """
@@ -134,34 +353,35 @@ class Vision:
             If the needle is not found, returns False.
 
         """
+        if self.loctype not in ('regular', 'center'):
+            raise RuntimeError('Incorrect mlocate function parameters!')
+
         # Make sure file path is OS-agnostic.
         needle = str(pathlib.Path(self.needle))
 
-        if self.loctype == 'regular':
-            needle_coords = pag.locateOnScreen(needle,
-                                               confidence=self.conf,
-                                               grayscale=self.grayscale,
-                                               region=self.region)
-            if needle_coords is not None:
-                log.debug('Found regular image %s, %s', needle, needle_coords)
-                return needle_coords
-            else:
-                log.debug('Cannot find regular image %s, conf=%s', needle, self.conf)
-                return False
-
-        elif self.loctype == 'center':
-            needle_coords = pag.locateCenterOnScreen(needle,
-                                                     confidence=self.conf,
-                                                     grayscale=self.grayscale,
-                                                     region=self.region)
-            if needle_coords is not None:
-                log.debug('Found center of image %s, %s', needle, needle_coords)
-                return needle_coords
-            else:
-                log.debug('Cannot find center of image %s, conf=%s', needle, self.conf)
-                return False
+        # Capturing and matching are done separately, rather than with
+        #   PyAutoGUI's locateOnScreen(), so each can be timed.
+        started = time.perf_counter()
+        frame = grab(self.region)
+        captured = time.perf_counter()
+        location, similarity = locate(frame, needle, conf=self.conf, grayscale=self.grayscale)
+        if timing.enabled is True:
+            timing.record_find(self.needle, self.region, captured - started,
+                               time.perf_counter() - captured, similarity,
+                               location is not None)
+        if snapshots.enabled is True:
+            snapshots.searched(self.needle, self.region, location, similarity, self.conf)
+
+        if location is None:
+            log.debug('Cannot find %s image %s, conf=%s', self.loctype, needle, self.conf)
+            return False
 
-        raise RuntimeError('Incorrect mlocate function parameters!')
+        left, top, width, height = location
+        needle_coords = (int(self.region[0]) + left, int(self.region[1]) + top, width, height)
+        if self.loctype == 'center':
+            needle_coords = (needle_coords[0] + int(width / 2), needle_coords[1] + int(height / 2))
+        log.debug('Found %s image %s, %s', self.loctype, needle, needle_coords)
+        return needle_coords
 
     def wait_for_needle(self, get_tuple=False):
         """
@@ -183,29 +403,43 @@ class Vision:
 
         """
         # log.debug('Looking for %s', + self.needle)
+        started = time.perf_counter()
+
+        # The retry policy takes care of sleeping between attempts.
+        if self.retry_policy is not None:
+            attempts = self.retry_policy.attempts()
+        else:
+            # Add 1 to self.loop_num because if loop_num=1, it won't loop at
+            #   all.
+            attempts = range(1, (self.loop_num + 1))
 
-        # Add 1 to self.loop_num because if loop_num=1, it won't loop at
-        #   all.
-        for tries in range(1, (self.loop_num + 1)):
+        for tries in attempts:
 
             needle_coords = Vision.find_needle(self)
 
             if isinstance(needle_coords, tuple) is True:
                 log.debug('Found %s after trying %s times.', self.needle, tries)
+                if self.retry_policy is not None:
+                    attempts.succeeded()
+                if timing.enabled is True:
+                    timing.record_wait(self.needle, time.perf_counter() - started, tries, True)
                 if get_tuple is True:
                     return needle_coords
                 else:
                     return True
             else:
                 log.debug('Cannot find %s, tried %s times.', self.needle, tries)
-                misc.sleep_rand(self.loop_sleep_range[0], self.loop_sleep_range[1])
+                if self.retry_policy is None:
+                    misc.sleep_rand(self.loop_sleep_range[0], self.loop_sleep_range[1])
 
         log.debug('Timed out looking for %s', self.needle)
+        if timing.enabled is True:
+            timing.record_wait(self.needle, time.perf_counter() - started, tries, False)
         return False
 
     def click_needle(self, sleep_range=(50, 200, 50, 200),
                      move_duration_range=(50, 1500),
-                     button='left', move_away=False):
+                     button='left', move_away=False, wait=True, confirm=False):
         """
         Moves the mouse to the provided needle image and clicks on
         it.
@@ -222,13 +456,26 @@ class Vision:
                               after clicking on the needle. Useful when
                               mlocate() needs to determine the status
                               of a button that the mouse just clicked.
+            wait (bool): Whether to wait for the click to be performed.
+                         If False, returns as soon as the click has been
+                         queued so the next needle can be searched for
+                         while the mouse is moving. Use
+                         input.wait_for_input() to wait for queued clicks,
+                         default is True.
+            confirm (bool): Whether to check the click cross right after
+                            clicking, and click again right away if the
+                            click landed on the ground, see
+                            click_result(). Only works for needles within
+                            the game screen, and implies wait is True,
+                            default is False.
 
         Returns:
-            Returns True if the needle was clicked on successfully,
-            returns False otherwise.
+            Returns True if the needle was clicked on successfully (or
+            queued, if wait is False), returns False otherwise.
 
         """
         log.debug('Looking for %s to click on.', self.needle)
+        started = time.perf_counter()
 
         needle_coords = self.wait_for_needle(get_tuple=True)
 
@@ -236,21 +483,38 @@ class Vision:
             # Randomize the location the mouse cursor will move to using
             #   the dimensions of needle image.
             # The mouse will click anywhere within the needle image.
-            input.Mouse(region=needle_coords,
-                        sleep_range=sleep_range,
-                        move_duration_range=move_duration_range,
-                        button=button).click_coord()
-
+            mouse = input.Mouse(region=needle_coords,
+                                sleep_range=sleep_range,
+                                move_duration_range=move_duration_range,
+                                button=button)
             log.debug('Clicking on %s', self.needle)
 
+            if confirm is True:
+                for _ in range(CLICK_RETRIES):
+                    # The cross only lasts a moment, so it's checked for
+                    #   before the wait after the click. If no cross can
+                    #   be found, the click may still have landed, so it
+                    #   isn't clicked again.
+                    if mouse.click_coord(check=click_result) != MISS:
+                        break
+                    log.info('Click on %s missed, clicking again.', self.needle)
+                else:
+                    return False
+            else:
+                mouse.click_coord(wait=wait)
+
             if move_away is True:
-                input.Mouse(region=(25, 25, 100, 100), move_duration_range=(50, 200)).moverel()
+                input.Mouse(region=(25, 25, 100, 100),
+                            move_duration_range=(50, 200)).moverel(wait=wait)
+            if timing.enabled is True:
+                timing.record_click(self.needle, time.perf_counter() - started)
             return True
 
         else:
             return False
 
 
+@timing.timed
 def orient(region=(0, 0, start.DISPLAY_WIDTH, start.DISPLAY_HEIGHT),
            launch_client=False):
     """
@@ -267,6 +531,9 @@ def orient(region=(0, 0, start.DISPLAY_WIDTH, start.DISPLAY_HEIGHT),
                       height of the coordinate space to search within,
                       relative to the display's coordinates. By default
                       uses the entire display.
+        launch_client (bool): Whether to keep looking for the client for
+                              a few minutes if it can't be found right
+                              away, default is False.
 
     Raises:
        Raises an exception if the client cannot be found, or if the
@@ -282,6 +549,34 @@ def orient(region=(0, 0, start.DISPLAY_WIDTH, start.DISPLAY_HEIGHT),
          with the text "logged_out" and a 2-tuple of the center (X, Y)
          coordinates of the orient-logged-out needle.
 
+    """
+    client_status = _orient_once(region)
+    if client_status is not False:
+        return client_status
+
+    if launch_client is True:
+        # TODO: Write start_client()
+        #start_client()
+        # Try 10 times to find the login screen after launching the client.
+        for _ in range(1, 10):
+            misc.sleep_rand(8000, 15000)
+            client_status = _orient_once(region)
+            if client_status is not False:
+                return client_status
+        log.critical('Could not find client! %s', launch_client)
+
+    raise Exception('Could not find client!')
+
+
+def _orient_once(region):
+    """
+    Makes a single attempt at finding the client within the given region.
+    See orient()'s docstring for more info.
+
+    Returns:
+        Returns the same 2-tuple as orient() if the client was found,
+        returns False otherwise.
+
     """
     logged_in = Vision(region=region, needle='needles/minimap/orient.png',
                        loctype='center', loop_num=1,
@@ -296,18 +591,7 @@ def orient(region=(0, 0, start.DISPLAY_WIDTH, start.DISPLAY_HEIGHT),
     if isinstance(logged_out, tuple) is True:
         return 'logged_out', logged_out
 
-    if launch_client is True:
-        # TODO: Write start_client()
-        #start_client()
-        # Try 10 times to find the login screen after launching the client.
-        for _ in range(1, 10):
-            misc.sleep_rand(8000, 15000)
-            orient(region=region, launch_client=False)
-        log.critical('Could not find client! %s', launch_client)
-        raise Exception('Could not find client!')
-
-    else:
-        raise Exception('Could not find client!')
+    return False
 
 
 # ----------------------------------------------------------------------
@@ -368,6 +652,12 @@ game_screen_top = client_top + 4
 game_screen = (game_screen_left, game_screen_top,
                start.GAME_SCREEN_WIDTH, start.GAME_SCREEN_HEIGHT)
 
+# The part of the bank window that holds items.
+bank_items_window_left = client_left + 20
+bank_items_window_top = client_top + 70
+bank_items_window = (bank_items_window_left, bank_items_window_top,
+                     start.BANK_ITEMS_WINDOW_WIDTH, start.BANK_ITEMS_WINDOW_HEIGHT)
+
 # The player's inventory, plus the top and bottom "side stone" tabs that
 #   open all the different menus.
 side_stones_left = client_left + 516
@@ -0,0 +1,58 @@
+# coding=UTF-8
+"""
+Unit tests for the chat.py module. Doesn't require a running client.
+
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from ocvbot import chat, startup as start
+
+SIDE_STONES = '../tests/haystacks/user-interface/side-stones/'
+
+# The most recent chat message in each screenshot, see
+#   tools/train_chat_font.py.
+MESSAGES = {
+    SIDE_STONES + 'account.png': 'You get some oak logs.',
+    SIDE_STONES + 'inventory.png': 'You manage to mine some copper.',
+    SIDE_STONES + 'inventory/image_001.png': 'Picture of a posing Paladin.',
+    SIDE_STONES + 'inventory/image_002.png': 'I can\'t reach that!',
+    SIDE_STONES + 'inventory/image_003.png': 'Definitely blue.',
+    SIDE_STONES + 'inventory/image_004.png': 'You swing your pick at the rock.',
+    SIDE_STONES + 'inventory/image_006.png': 'You find a clue geode!',
+    SIDE_STONES + 'inventory/image_007.png': 'Your inventory is too full to hold any more logs.',
+    SIDE_STONES + 'logout.png': 'You manage to mine some iron.',
+    SIDE_STONES + 'logout/image_002.png': 'Welcome to Old School RuneScape.',
+}
+
+
+def line(file):
+    """
+    Crops chat.LINE out of a screenshot, which is first cropped to the
+    client around its center.
+
+    """
+    frame = np.asarray(Image.open(file).convert('RGB'))
+    top = (frame.shape[0] - start.CLIENT_HEIGHT) // 2 + chat.LINE[1]
+    left = (frame.shape[1] - start.CLIENT_WIDTH) // 2 + chat.LINE[0]
+    return frame[top:top + chat.LINE[3], left:left + chat.LINE[2]]
+
+
+@pytest.mark.parametrize('file, message', MESSAGES.items())
+def test_decode(file, message):
+    assert chat.decode(line(file)) == message
+
+
+def test_unknown_letters():
+    # A letter that isn't in the glyph table.
+    frame = np.full((chat.LINE[3], 20, 3), 255, dtype=np.uint8)
+    frame[1:9, 2:9] = 0
+    assert chat.decode(frame) == chat.UNKNOWN
+
+
+def test_recent_only_decodes_changes(monkeypatch):
+    frame = line(SIDE_STONES + 'account.png')
+    assert chat.recent(frame) == 'You get some oak logs.'
+    monkeypatch.setattr(chat, 'decode', lambda frame_: pytest.fail('Decoded again!'))
+    assert chat.recent(frame.copy()) == 'You get some oak logs.'
@@ -0,0 +1,81 @@
+# coding=UTF-8
+"""
+Unit tests for the logs.py module. Doesn't require a running client.
+
+"""
+import logging as log
+
+import numpy as np
+import pytest
+
+from ocvbot import logs
+
+
+def make_record(message, *args, level=log.INFO):
+    return log.LogRecord('ocvbot', level, 'behavior.py', 1, message, args, None,
+                         func='open_bank')
+
+
+@pytest.fixture
+def ring(tmp_path, monkeypatch):
+    # A small ring so wrapping around is quick to test.
+    monkeypatch.setattr(logs, 'RING_SLOTS', 8)
+    return str(tmp_path / 'log.ring'), str(tmp_path / 'log.ring.json')
+
+
+def write(ring, records):
+    handler = logs.RingLog(*ring)
+    for record in records:
+        handler.emit(record)
+    handler.close()
+
+
+def messages(ring):
+    return [message for _, _, message in logs.decode(*ring)]
+
+
+def test_round_trip(ring):
+    write(ring, [make_record('Found %s after trying %s times.', 'close.png', 3),
+                 make_record('Bank already open!'),
+                 make_record('Unable to turn on running!', level=log.ERROR)])
+    records = logs.decode(*ring)
+    assert [level for _, level, _ in records] == ['INFO', 'INFO', 'ERROR']
+    assert messages(ring) == [
+        'behavior.py.open_bank - Found close.png after trying 3 times.',
+        'behavior.py.open_bank - Bank already open!',
+        'behavior.py.open_bank - Unable to turn on running!',
+    ]
+
+
+def test_oldest_records_are_overwritten(ring):
+    write(ring, [make_record('Record %s', number) for number in range(12)])
+    assert messages(ring) == ['behavior.py.open_bank - Record %s' % number
+                              for number in range(4, 12)]
+
+
+def test_previous_run_is_kept(ring):
+    write(ring, [make_record('First run %s', number) for number in range(3)])
+    write(ring, [make_record('Second run %s', number) for number in range(2)])
+    assert messages(ring) == [
+        'behavior.py.open_bank - First run 0',
+        'behavior.py.open_bank - First run 1',
+        'behavior.py.open_bank - First run 2',
+        'behavior.py.open_bank - Second run 0',
+        'behavior.py.open_bank - Second run 1',
+    ]
+
+
+def test_mutable_arguments_are_formatted_when_logged(ring):
+    handler = logs._QueueHandler(None)
+    position = np.array([1, 2])
+    record = handler.prepare(make_record('Target at %s', position))
+    position[0] = 100
+    assert record.getMessage() == 'Target at [1 2]'
+
+    write(ring, [record])
+    assert messages(ring) == ['behavior.py.open_bank - Target at [1 2]']
+
+
+def test_immutable_arguments_are_formatted_when_written():
+    record = logs._QueueHandler(None).prepare(make_record('Found %s at %s', 'close.png', (1, 2)))
+    assert record.args == ('close.png', (1, 2))
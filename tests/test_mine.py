@@ -0,0 +1,183 @@
+# coding=UTF-8
+"""
+Unit tests for the mine.py module.
+
+Linux only. Requires feh.
+
+"""
+import json
+import subprocess as sub
+import time
+
+import psutil
+import pytest
+
+# Some waiting is required after opening images before template matching
+#   is reliable.
+interval = 0.1
+
+
+def kill_feh():
+    """
+    Kills feh, see test_behavior.py.
+
+    """
+    for proc in psutil.process_iter():
+        if proc.name() == 'feh':
+            proc.kill()
+
+
+# Provide an image for the client to orient itself. Currently any imports
+#   from ocvbot require an image to match first, or they will fail.
+kill_feh()
+time.sleep(interval)
+sub.Popen(['feh', '../tests/test_behavior/test_open_side_stone/pass/test01/'])
+time.sleep(interval)
+from ocvbot import mine, vision as vis
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Replaces time.monotonic() with a clock that only moves when a test
+    sets it.
+
+    """
+    now = [0.0]
+    monkeypatch.setattr(mine.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def make_rock(name='rock'):
+    """
+    Makes a rock whose state is set by observe() rather than read from the
+    screen.
+
+    """
+    rock = mine.Rock(name + '-full.png', name + '-empty.png')
+    rock.seen = None
+    rock._classify_patch = lambda frame: rock.seen
+    rock._match_templates = lambda frame: None
+    return rock
+
+
+def observe(rock, clock, sequence):
+    """
+    Updates a rock as if it had been seen in each state of a sequence of
+    (time, state) 2-tuples. A state of None means the rock is hidden.
+
+    """
+    for now, state in sequence:
+        clock[0] = now
+        rock.seen = state
+        rock.update(frame=None)
+
+
+def test_respawn_times(clock):
+    rock = make_rock()
+    # Seeing the rock full for the first time doesn't count as a respawn.
+    observe(rock, clock, [(0, mine.FULL), (10, mine.EMPTY), (25, mine.FULL)])
+    assert list(rock.respawn_times) == [15]
+    # The rock can be hidden while it respawns.
+    observe(rock, clock, [(30, mine.EMPTY), (35, None), (42, mine.FULL)])
+    assert list(rock.respawn_times) == [15, 12]
+    # A rock first seen empty wasn't seen being emptied.
+    rock = make_rock()
+    observe(rock, clock, [(50, mine.EMPTY), (60, mine.FULL)])
+    assert len(rock.respawn_times) == 0
+
+
+def test_respawn_window(clock):
+    rock = make_rock()
+    rock.respawn_times.extend(range(10, 10 + mine.MIN_RESPAWN_SAMPLES - 1))
+    observe(rock, clock, [(99, mine.FULL), (100, mine.EMPTY)])
+    assert rock.respawn_window() is None
+
+    rock.respawn_times.clear()
+    rock.respawn_times.extend(range(10, 21))
+    assert rock.respawn_window() == (100 + 11 - mine.RESPAWN_MARGIN,
+                                     100 + 19 + mine.RESPAWN_MARGIN)
+    observe(rock, clock, [(105, mine.FULL)])
+    assert rock.respawn_window() is None
+
+
+def test_next_respawn(clock):
+    first, second = make_rock('first'), make_rock('second')
+    scheduler = mine.Scheduler([first, second])
+    for rock in (first, second):
+        rock.respawn_times.extend([10, 10, 10])
+    observe(first, clock, [(0, mine.FULL), (5, mine.EMPTY)])
+    observe(second, clock, [(0, mine.FULL)])
+    # A full rock can be mined right away.
+    assert scheduler.next_respawn() is None
+    observe(second, clock, [(2, mine.EMPTY)])
+    assert scheduler.next_respawn() == (second, (12 - mine.RESPAWN_MARGIN,
+                                                 12 + mine.RESPAWN_MARGIN))
+
+
+def test_poll_range(clock):
+    rock = make_rock()
+    scheduler = mine.Scheduler([rock])
+    observe(rock, clock, [(0, mine.FULL), (10, mine.EMPTY)])
+    # Respawns can't be predicted yet.
+    assert scheduler.poll_range() == mine.POLL_RANGE
+
+    rock.respawn_times.extend([20, 20, 20])
+    clock[0] = 12
+    assert scheduler.poll_range() == (mine.MAX_IDLE_POLL, mine.MAX_IDLE_POLL)
+    clock[0] = 29
+    assert scheduler.poll_range() == (500, 500)
+    clock[0] = 30
+    assert scheduler.poll_range() == mine.FAST_POLL_RANGE
+
+
+def test_save_interval(clock, monkeypatch, tmp_path):
+    path = str(tmp_path / 'respawn-times.json')
+    monkeypatch.setattr(mine, 'RESPAWN_FILE', path)
+    # The scheduler would otherwise save when the tests exit.
+    monkeypatch.setattr(mine.atexit, 'register', lambda function: None)
+    monkeypatch.setattr(mine.vis, 'grab', lambda region: None)
+
+    rock = make_rock()
+    scheduler = mine.Scheduler([rock], scenario='test')
+    rock.seen = mine.FULL
+    scheduler.update()
+    clock[0] = 10
+    rock.seen = mine.EMPTY
+    scheduler.update()
+    clock[0] = 25
+    rock.seen = mine.FULL
+    scheduler.update()
+    # The respawn isn't saved until SAVE_INTERVAL has passed.
+    assert scheduler.unsaved is True
+    assert not tmp_path.joinpath('respawn-times.json').exists()
+
+    clock[0] = mine.SAVE_INTERVAL
+    scheduler.update()
+    assert scheduler.unsaved is False
+    with open(path) as file:
+        assert json.load(file) == {'test': {rock.name: [15]}}
+
+    rock.respawn_times.append(12)
+    scheduler.unsaved = True
+    scheduler.flush()
+    with open(path) as file:
+        assert json.load(file) == {'test': {rock.name: [15, 12]}}
+    # Saved respawn times are loaded for the same scenario.
+    loaded = make_rock()
+    mine.Scheduler([loaded], scenario='test')
+    assert list(loaded.respawn_times) == [15, 12]
+
+
+def test_hover_region():
+    rock = make_rock()
+    rock.region = (100, 20, 30, 25)
+    left, top, width, height = rock.click_region()
+    assert rock.hover_region() == (left, top + height + mine.HOVER_GAP, width, mine.HOVER_SIZE)
+
+    # There's no room for the cursor below a rock at the bottom of the
+    #   game screen.
+    rock.region = (100, vis.game_screen[3] - 30, 30, 25)
+    left, top, width, height = rock.click_region()
+    assert rock.hover_region() == (left, top - mine.CURSOR_HEIGHT - mine.HOVER_GAP
+                                   - mine.HOVER_SIZE, width, mine.HOVER_SIZE)
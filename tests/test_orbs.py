@@ -0,0 +1,64 @@
+# coding=UTF-8
+"""
+Unit tests for the orbs.py module. Doesn't require a running client.
+
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from ocvbot import orbs, startup as start
+
+SIDE_STONES = '../tests/haystacks/user-interface/side-stones/'
+
+# The numbers shown next to the orbs in each screenshot, see
+#   tools/train_orb_digits.py.
+READOUTS = {
+    SIDE_STONES + 'account.png': {'hitpoints': 10, 'prayer': 1, 'run': 23},
+    SIDE_STONES + 'attacks.png': {'run': 18},
+    SIDE_STONES + 'clan.png': {'run': 22},
+    SIDE_STONES + 'emotes.png': {'run': 24},
+    SIDE_STONES + 'equipment.png': {'run': 20},
+    SIDE_STONES + 'inventory/image_001.png': {'prayer': 9, 'run': 60},
+    SIDE_STONES + 'inventory/image_002.png': {'hitpoints': 8, 'run': 75},
+    SIDE_STONES + 'inventory/image_003.png': {'run': 55},
+    SIDE_STONES + 'inventory/image_005.png': {'hitpoints': 10, 'prayer': 1, 'run': 100},
+}
+
+# Whether running is turned on in each screenshot.
+RUNNING = {
+    SIDE_STONES + 'account.png': True,
+    SIDE_STONES + 'inventory/image_004.png': True,
+    SIDE_STONES + 'inventory/image_001.png': False,
+    SIDE_STONES + 'logout/image_002.png': False,
+}
+
+
+def region(file):
+    """
+    Crops orbs.REGION out of a screenshot, which is first cropped to the
+    client around its center.
+
+    """
+    frame = np.asarray(Image.open(file).convert('RGB'))
+    top = (frame.shape[0] - start.CLIENT_HEIGHT) // 2 + orbs.REGION[1]
+    left = (frame.shape[1] - start.CLIENT_WIDTH) // 2 + orbs.REGION[0]
+    return frame[top:top + orbs.REGION[3], left:left + orbs.REGION[2]]
+
+
+@pytest.mark.parametrize('file, readout', READOUTS.items())
+def test_read(file, readout):
+    read = orbs.read(region(file))
+    for orb, value in readout.items():
+        assert read[orb] == value, orb
+
+
+@pytest.mark.parametrize('file, running', RUNNING.items())
+def test_run_enabled(file, running):
+    assert orbs.run_enabled(region(file)) is running
+
+
+def test_unreadable():
+    # Nothing is drawn next to the orbs.
+    assert orbs.read(np.zeros((orbs.REGION[3], orbs.REGION[2], 3), dtype=np.uint8)) == \
+        dict.fromkeys(orbs.ORBS)
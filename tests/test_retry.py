@@ -0,0 +1,73 @@
+# coding=UTF-8
+"""
+Unit tests for the retry.py module. Doesn't require a running client.
+
+"""
+import pytest
+
+from ocvbot import retry
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Replaces time.monotonic() with a clock that only moves when the
+    attempts sleep, by one second per sleep.
+
+    """
+    now = [0.0]
+
+    def sleep_rand(rand_min=0, rand_max=0):
+        now[0] += 1.0
+    monkeypatch.setattr(retry.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(retry.misc, 'sleep_rand', sleep_rand)
+    return now
+
+
+def test_fixed_budget(clock):
+    retry_policy = retry.RetryPolicy('test', tries=4)
+    assert list(retry_policy.attempts()) == [1, 2, 3, 4]
+    assert retry_policy.failures == 1
+    assert retry_policy.timeout() is None
+
+
+def test_succeeded(clock):
+    retry_policy = retry.RetryPolicy('test', tries=10)
+    attempts = retry_policy.attempts()
+    for tries in attempts:
+        if tries == 3:
+            attempts.succeeded()
+    assert attempts.tries == 3
+    assert list(retry_policy.history) == [2.0]
+    assert retry_policy.failures == 0
+
+
+def test_adaptive_timeout(clock):
+    retry_policy = retry.RetryPolicy('test', tries=100, min_history=3, margin=1.0)
+    retry_policy.history.extend([0.2, 0.5, 0.4])
+    assert retry_policy.timeout() == 1.5
+    # Gives up once 1.5 seconds have passed, rather than after 100 tries.
+    assert list(retry_policy.attempts()) == [1, 2, 3]
+
+
+def test_max_tries(clock):
+    retry_policy = retry.RetryPolicy('test', tries=2, max_tries=4, min_history=1, margin=60)
+    retry_policy.history.append(1.0)
+    assert list(retry_policy.attempts()) == [1, 2, 3, 4]
+
+
+def test_backoff():
+    linear = retry.RetryPolicy('test', sleep_range=(100, 200), backoff='linear')
+    assert linear.sleep_time(3) == (300, 600)
+    exponential = retry.RetryPolicy('test', sleep_range=(100, 200), backoff='exponential',
+                                    max_sleep=1000)
+    assert exponential.sleep_time(3) == (400, 800)
+    assert exponential.sleep_time(10) == (1000, 1000)
+    with pytest.raises(Exception):
+        retry.RetryPolicy('test', backoff='quadratic')
+
+
+def test_policies_are_shared():
+    first = retry.policy('test-shared', tries=3)
+    assert retry.policy('test-shared', tries=50) is first
+    assert first.tries == 3
@@ -0,0 +1,103 @@
+# coding=UTF-8
+"""
+Unit tests for the runner.py module. Doesn't require a running client.
+
+"""
+import pytest
+
+from ocvbot import runner
+
+
+def returns(*results):
+    """
+    Makes an action that returns each of the given results in turn, and
+    counts how many times it's been called.
+
+    """
+    results = list(results)
+
+    def action():
+        action.calls += 1
+        return results.pop(0) if len(results) > 1 else results[0]
+    action.calls = 0
+    return action
+
+
+def test_transitions():
+    check = returns('open')
+    close = returns(True)
+    states = runner.Runner(states=[
+        runner.State('check', check, {'open': 'close', 'closed': None}),
+        runner.State('close', close),
+    ], initial='check')
+    assert states.run() is True
+    assert list(states.history) == [('check', 'close'), ('close', None)]
+    # The runner starts over once it's done.
+    assert states.current == 'check'
+
+
+def test_retries():
+    action = returns(False, None, True)
+    states = runner.Runner(states=[
+        runner.State('find', action, retries=3, retry_sleep_range=(0, 0)),
+    ], initial='find')
+    assert states.run() is True
+    assert action.calls == 3
+    assert states.timings['find'][:2] == [1, 0]
+
+
+def test_fail_state():
+    action = returns(False)
+    recover = returns(True)
+    states = runner.Runner(states=[
+        runner.State('find', action, retries=2, retry_sleep_range=(0, 0), fail='recover'),
+        runner.State('recover', recover),
+    ], initial='find')
+    assert states.run() is True
+    assert action.calls == 2
+    assert states.timings['find'][:2] == [1, 1]
+    assert list(states.history) == [('find', 'recover'), ('recover', None)]
+
+
+def test_failure_without_fail_state():
+    states = runner.Runner(states=[
+        runner.State('find', returns(None), retries=2, retry_sleep_range=(0, 0)),
+    ], initial='find')
+    assert states.run() is False
+
+
+def test_timeout():
+    action = returns(False)
+    states = runner.Runner(states=[
+        runner.State('find', action, retries=100, timeout=0, retry_sleep_range=(0, 0)),
+    ], initial='find')
+    assert states.run() is False
+    assert action.calls == 1
+
+
+def test_max_steps():
+    states = runner.Runner(states=[
+        runner.State('ping', returns(True), {True: 'pong'}),
+        runner.State('pong', returns(True), {True: 'ping'}),
+    ], initial='ping', max_steps=5)
+    assert states.run() is False
+    assert len(states.history) == 5
+
+
+def test_missing_transition():
+    states = runner.Runner(states=[
+        runner.State('check', returns('unknown'), {'open': None}),
+    ], initial='check')
+    with pytest.raises(Exception):
+        states.run()
+
+
+def test_resume_after_break():
+    breaks = returns(True, False)
+    states = runner.Runner(states=[
+        runner.State('mine', returns(True), {True: 'bank'}),
+        runner.State('bank', returns(True)),
+        runner.State('login', returns(True), {True: runner.RESUME}),
+    ], initial='mine', resume='login', break_check=breaks)
+    assert states.run() is True
+    assert list(states.history) == [('mine', 'login'), ('login', 'bank'), ('bank', None)]
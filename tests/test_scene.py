@@ -0,0 +1,29 @@
+# coding=UTF-8
+"""
+Unit tests for the scene.py module. Doesn't require a running client.
+
+"""
+import numpy as np
+
+from ocvbot import scene
+
+classifier = scene.Classifier.load()
+results = classifier.leave_one_out()
+
+
+def test_samples_are_unique():
+    assert len(np.unique(classifier.samples, axis=0)) == len(classifier.samples)
+
+
+def test_leave_one_out():
+    # Only scenes with more than one unique sample can be checked.
+    for label in set(classifier.labels):
+        classified = [result for expected, result in results if expected == label]
+        if len(classified) > 1:
+            assert classified.count(label) == len(classified), label
+
+
+def test_in_game_is_never_logged_out():
+    for expected, result in results:
+        if expected not in scene.LOGGED_OUT_SCENES:
+            assert result not in scene.LOGGED_OUT_SCENES, expected
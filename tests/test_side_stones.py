@@ -0,0 +1,68 @@
+# coding=UTF-8
+"""
+Unit tests for the side_stones.py module.
+
+Linux only. Requires feh.
+
+"""
+import glob
+import os
+import subprocess as sub
+import time
+
+import numpy as np
+import psutil
+import pytest
+from PIL import Image
+
+# Relative to the ocvbot directory, since importing ocvbot changes to it.
+haystacks = '../tests/haystacks/user-interface/'
+# Some waiting is required after opening images before template matching
+#   is reliable.
+interval = 0.1
+
+
+def kill_feh():
+    """
+    Kills feh, see test_behavior.py.
+
+    """
+    for proc in psutil.process_iter():
+        if proc.name() == 'feh':
+            proc.kill()
+
+
+# Provide an image for the client to orient itself. Currently any imports
+#   from ocvbot require an image to match first, or they will fail.
+kill_feh()
+time.sleep(interval)
+sub.Popen(['feh', '../tests/test_behavior/test_open_side_stone/pass/test01/'])
+time.sleep(interval)
+from ocvbot import side_stones, startup as start, vision as vis
+
+# Screenshots of each tab while it's open. The name of each screenshot,
+#   or of the directory it's in, is the name of the open tab.
+open_tab_params = sorted(glob.glob(haystacks + 'side-stones/**/*.png', recursive=True))
+
+
+def side_stones_frame(file):
+    """
+    Crops vision.side_stones out of a screenshot, which is first cropped
+    to the client around its center.
+
+    """
+    frame = np.asarray(Image.open(file).convert('RGB'))
+    top = (frame.shape[0] - start.CLIENT_HEIGHT) // 2 + vis.side_stones_top - vis.client_top
+    left = (frame.shape[1] - start.CLIENT_WIDTH) // 2 + vis.side_stones_left - vis.client_left
+    return frame[top:top + start.SIDE_STONES_HEIGHT, left:left + start.SIDE_STONES_WIDTH]
+
+
+@pytest.mark.parametrize('file', open_tab_params)
+def test_open_tab(file):
+    name = os.path.splitext(os.path.relpath(file, haystacks + 'side-stones/'))[0]
+    assert side_stones.open_tab(side_stones_frame(file)) == name.split(os.sep)[0]
+
+
+def test_open_tab_logged_out():
+    assert side_stones.open_tab(side_stones_frame(haystacks + 'login-menu/main-menu.png')) is None
+    kill_feh()
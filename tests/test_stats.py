@@ -0,0 +1,60 @@
+# coding=UTF-8
+"""
+Unit tests for the stats.py module. Doesn't require a running client.
+
+"""
+import json
+import time
+
+import pytest
+
+from ocvbot import stats
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    # Keep the counters made by each test from being saved when the tests
+    #   exit.
+    monkeypatch.setattr(stats, 'counters', {})
+    monkeypatch.setattr(stats, '_last_save', time.monotonic())
+    return stats.counters
+
+
+def test_window_expiry(monkeypatch):
+    monkeypatch.setattr(stats, 'started', time.time() - 2 * stats.RATE_WINDOW)
+    counter = stats.Counter('ores-mined')
+    counter.add(5, now=0)
+    counter.add(3, now=1000)
+    assert counter.rate(now=stats.RATE_WINDOW) == 8
+    # The first event is now older than RATE_WINDOW.
+    assert counter.rate(now=stats.RATE_WINDOW + 1) == 3
+    assert counter.window_total == 3
+    assert counter.total == 8
+    assert counter.rate(now=1000 + stats.RATE_WINDOW + 1) == 0
+
+
+def test_rate_before_full_window(monkeypatch):
+    # Half an hour in, the rate is extrapolated to an hour.
+    monkeypatch.setattr(stats, 'started', time.time() - stats.RATE_WINDOW / 2)
+    counter = stats.Counter('casts')
+    counter.add(10, now=time.monotonic())
+    assert counter.rate() == pytest.approx(20, rel=0.01)
+
+
+def test_count_adds_xp(counters):
+    stats.count('ores-mined', item='./needles/items/iron-ore.png')
+    stats.count('ores-mined', amount=2, item='./needles/items/iron-ore.png')
+    stats.count('items-dropped', item='./needles/items/uncut-ruby.png')
+    assert stats.total('ores-mined') == 3
+    assert stats.total('xp') == 3 * stats.XP['iron-ore']
+    assert stats.total('items-dropped') == 1
+    assert stats.total('casts') == 0
+
+
+def test_save(counters, tmp_path):
+    stats.count('inventories')
+    path = str(tmp_path / 'stats.json')
+    stats.save(path)
+    with open(path) as file:
+        saved = json.load(file)
+    assert saved['counters']['inventories']['total'] == 1
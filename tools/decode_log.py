@@ -0,0 +1,56 @@
+# coding=UTF-8
+"""
+Decodes the binary ring buffer log written when the 'log_ring' setting is
+turned on, see ocvbot/logs.py. Doesn't require a running client.
+
+ocvbot/logs.py is loaded directly rather than imported from the ocvbot
+package, since importing the package sets up logging, which would write
+to the ring buffer being decoded.
+
+Syntax:
+    python decode_log.py [RING_FILE] [TEMPLATES_FILE]
+
+Optional positional arguments:
+
+    RING_FILE (file): The ring buffer's file, default is
+                      ocvbot/log.ring.
+
+    TEMPLATES_FILE (file): The ring buffer's template file, default is
+                           ocvbot/log.ring.json.
+
+"""
+import datetime
+import importlib.util
+import os
+import sys
+
+OCVBOT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ocvbot')
+
+
+def load_logs():
+    """
+    Loads ocvbot/logs.py without importing the ocvbot package.
+
+    """
+    spec = importlib.util.spec_from_file_location('logs', os.path.join(OCVBOT_DIRECTORY, 'logs.py'))
+    logs = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(logs)
+    return logs
+
+
+def main():
+    logs = load_logs()
+    path = os.path.join(OCVBOT_DIRECTORY, logs.RING_FILE)
+    templates_path = os.path.join(OCVBOT_DIRECTORY, logs.TEMPLATES_FILE)
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    if len(sys.argv) > 2:
+        templates_path = sys.argv[2]
+
+    for created, level, message in logs.decode(path, templates_path):
+        timestamp = datetime.datetime.fromtimestamp(created).strftime('%Y-%m-%d %H:%M:%S,%f')[:-3]
+        print(timestamp, level, message)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# coding=UTF-8
+"""
+Builds the chat font glyph table used by ocvbot/chat.py from screenshots
+of known chat messages. Doesn't require a running client.
+
+Screenshots larger than the client are cropped around their center, see
+train_scenes.py. Add screenshots of new chat messages to MESSAGES to
+teach the bot letters it hasn't seen yet.
+
+Syntax:
+    python train_chat_font.py
+
+"""
+import json
+import logging as log
+
+from ocvbot import chat
+from train_scenes import load_client
+
+SIDE_STONES = '../tests/haystacks/user-interface/side-stones/'
+
+# The most recent chat message in each screenshot, relative to the ocvbot
+#   directory.
+MESSAGES = {
+    SIDE_STONES + 'account.png': 'You get some oak logs.',
+    SIDE_STONES + 'inventory.png': 'You manage to mine some copper.',
+    SIDE_STONES + 'inventory/image_001.png': 'Picture of a posing Paladin.',
+    SIDE_STONES + 'inventory/image_002.png': 'I can\'t reach that!',
+    SIDE_STONES + 'inventory/image_003.png': 'Definitely blue.',
+    SIDE_STONES + 'inventory/image_004.png': 'You swing your pick at the rock.',
+    SIDE_STONES + 'inventory/image_006.png': 'You find a clue geode!',
+    SIDE_STONES + 'inventory/image_007.png': 'Your inventory is too full to hold any more logs.',
+    SIDE_STONES + 'logout.png': 'You manage to mine some iron.',
+    SIDE_STONES + 'logout/image_002.png': 'Welcome to Old School RuneScape.',
+}
+
+
+def main():
+    glyphs = {}
+    for file, message in MESSAGES.items():
+        left, top, width, height = chat.LINE
+        segments = chat.segment(load_client(file)[top:top + height, left:left + width])
+        if len(segments) != len(message):
+            log.warning('Found %s letters and spaces in %s, expected %s for "%s", skipping.',
+                        len(segments), file, len(message), message)
+            continue
+        for key, character in zip(segments, message):
+            if (key == ' ') != (character == ' '):
+                log.warning('Spaces in %s don\'t line up with "%s", skipping.', file, message)
+                break
+            if key != ' ':
+                if glyphs.get(key, character) != character:
+                    log.warning('"%s" and "%s" look the same, keeping "%s".',
+                                glyphs[key], character, glyphs[key])
+                glyphs.setdefault(key, character)
+
+    with open(chat.FONT_FILE, 'w') as file:
+        json.dump(glyphs, file, indent=4, sort_keys=True)
+    log.info('Saved %s letters to %s: %s', len(glyphs), chat.FONT_FILE,
+             ''.join(sorted(set(glyphs.values()))))
+
+    # Check that every message can be read back.
+    for file, message in MESSAGES.items():
+        left, top, width, height = chat.LINE
+        text = chat.decode(load_client(file)[top:top + height, left:left + width])
+        if text != message:
+            log.warning('Read "%s" from %s, expected "%s"', text, file, message)
+
+
+if __name__ == '__main__':
+    main()
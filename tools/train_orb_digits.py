@@ -0,0 +1,75 @@
+# coding=UTF-8
+"""
+Builds the digit table used by ocvbot/orbs.py from screenshots of known
+orb values. Doesn't require a running client.
+
+Screenshots larger than the client are cropped around their center, see
+train_scenes.py.
+
+Syntax:
+    python train_orb_digits.py
+
+"""
+import json
+import logging as log
+
+from ocvbot import orbs
+from train_scenes import load_client
+
+SIDE_STONES = '../tests/haystacks/user-interface/side-stones/'
+
+# The numbers shown next to the orbs in each screenshot, relative to the
+#   ocvbot directory.
+READOUTS = {
+    SIDE_STONES + 'account.png': {'hitpoints': 10, 'prayer': 1, 'run': 23},
+    SIDE_STONES + 'attacks.png': {'run': 18},
+    SIDE_STONES + 'clan.png': {'run': 22},
+    SIDE_STONES + 'emotes.png': {'run': 24},
+    SIDE_STONES + 'equipment.png': {'run': 20},
+    SIDE_STONES + 'inventory/image_001.png': {'prayer': 9, 'run': 60},
+    SIDE_STONES + 'inventory/image_002.png': {'hitpoints': 8, 'run': 75},
+    SIDE_STONES + 'inventory/image_003.png': {'run': 55},
+    SIDE_STONES + 'inventory/image_005.png': {'hitpoints': 10, 'prayer': 1, 'run': 100},
+}
+
+
+def region(file):
+    """
+    Crops orbs.REGION out of a screenshot.
+
+    """
+    left, top, width, height = orbs.REGION
+    return load_client(file)[top:top + height, left:left + width]
+
+
+def main():
+    digits = {}
+    for file, readout in READOUTS.items():
+        frame = region(file)
+        for orb, value in readout.items():
+            keys = orbs.segment(orbs.crop(frame, orb))
+            if len(keys) != len(str(value)):
+                log.warning('Found %s digits for %s in %s, expected %s, skipping.',
+                            len(keys), orb, file, value)
+                continue
+            for key, digit in zip(keys, str(value)):
+                if digits.get(key, digit) != digit:
+                    log.warning('%s and %s look the same, keeping %s.',
+                                digits[key], digit, digits[key])
+                digits.setdefault(key, digit)
+
+    with open(orbs.DIGITS_FILE, 'w') as file:
+        json.dump(digits, file, indent=4, sort_keys=True)
+    log.info('Saved %s digits to %s: %s', len(digits), orbs.DIGITS_FILE,
+             ''.join(sorted(set(digits.values()))))
+
+    # Check that every readout can be read back.
+    for file, readout in READOUTS.items():
+        read = orbs.read(region(file))
+        for orb, value in readout.items():
+            if read[orb] != value:
+                log.warning('Read %s for %s from %s, expected %s', read[orb], orb, file, value)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# coding=UTF-8
+"""
+Builds the labeled fingerprints used by ocvbot/scene.py from the
+screenshots under tests/. Doesn't require a running client.
+
+Screenshots larger than the client are cropped around their center, so
+screenshots that include the client's window border can be used. Many of
+the screenshots are copies of or symlinks to each other, so each client
+capture is only used once.
+
+Syntax:
+    python train_scenes.py
+
+"""
+import glob
+import hashlib
+import logging as log
+
+import numpy as np
+from PIL import Image
+
+from ocvbot import scene, startup as start
+
+TESTS = '../tests/test_behavior/'
+LOGIN_MENU = '../tests/haystacks/user-interface/login-menu/'
+
+# Screenshots of each scene, relative to the ocvbot directory. Every
+#   other screenshot of the login and logout tests is in-game.
+SCENES = {
+    scene.Scene.DISCONNECTED: [
+        TESTS + 'test_login/fail/test01/image_001.png',
+        TESTS + 'test_login/pass/test01/image_001.png',
+        TESTS + 'test_login/pass/test02/image_001.png',
+        TESTS + 'test_login/pass/test02/image_002.png',
+        LOGIN_MENU + 'disconnected.png'],
+    scene.Scene.LOGIN_CREDENTIALS: [
+        TESTS + 'test_login/fail/test01/image_002.png',
+        TESTS + 'test_login/fail/test01/image_003.png',
+        TESTS + 'test_login/fail/test01/image_004.png',
+        TESTS + 'test_login/pass/test01/image_002.png',
+        TESTS + 'test_login/pass/test01/image_003.png',
+        TESTS + 'test_login/pass/test01/image_004.png',
+        TESTS + 'test_login/pass/test02/image_003.png',
+        TESTS + 'test_login/pass/test02/image_004.png',
+        TESTS + 'test_login/pass/test02/image_005.png',
+        LOGIN_MENU + 'enter-credentials.png'],
+    scene.Scene.INVALID_CREDENTIALS: [
+        TESTS + 'test_login/fail/test01/image_005.png',
+        LOGIN_MENU + 'invalid-credentials.png'],
+    scene.Scene.LOGGED_OUT: glob.glob(LOGIN_MENU + 'main-menu*.png') + [
+        TESTS + 'test_logout/pass/test01/image_003.png',
+        TESTS + 'test_logout/pass/test02/image_004.png',
+        TESTS + 'test_logout/pass/test03/image_004.png',
+        TESTS + 'test_logout/pass/test04/image_005.png',
+        TESTS + 'test_logout/pass/test05/image_003.png',
+        TESTS + 'test_logout/pass/test06/image_001.png'],
+    scene.Scene.POSTLOGIN: [
+        TESTS + 'test_login/pass/test01/image_007.png',
+        TESTS + 'test_login/pass/test02/image_006.png',
+        LOGIN_MENU + 'postlogin.png'],
+}
+
+labeled = {file for files in SCENES.values() for file in files}
+SCENES[scene.Scene.IN_GAME] = [
+    file for file in sorted(glob.glob(TESTS + 'test_log*/**/*.png', recursive=True)
+                            + glob.glob('../tests/haystacks/user-interface/side-stones/'
+                                        '**/*.png', recursive=True))
+    if file not in labeled]
+
+
+def load_client(file):
+    """
+    Opens a screenshot, cropped to the size of the client.
+
+    """
+    frame = np.asarray(Image.open(file).convert('RGB'))
+    height, width = frame.shape[:2]
+    if height < start.CLIENT_HEIGHT or width < start.CLIENT_WIDTH:
+        raise Exception('Screenshot ' + file + ' is smaller than the client!')
+    top = (height - start.CLIENT_HEIGHT) // 2
+    left = (width - start.CLIENT_WIDTH) // 2
+    return frame[top:top + start.CLIENT_HEIGHT, left:left + start.CLIENT_WIDTH]
+
+
+def main():
+    samples = []
+    labels = []
+    # The label of each client capture already used, keyed by its hash.
+    seen = {}
+    for label, files in SCENES.items():
+        for file in files:
+            try:
+                frame = load_client(file)
+            except FileNotFoundError:
+                # Some screenshots are symlinks to files that haven't been
+                #   committed.
+                log.warning('Skipping missing screenshot %s', file)
+                continue
+            digest = hashlib.sha1(frame.tobytes()).hexdigest()
+            if digest in seen:
+                if seen[digest] != label:
+                    raise Exception('Screenshot ' + file + ' is labeled as both ' +
+                                    str(seen[digest]) + ' and ' + str(label) + '!')
+                continue
+            seen[digest] = label
+            samples.append(scene.fingerprint(frame))
+            labels.append(label)
+        log.info('%s: %s unique samples', label, labels.count(label))
+
+    classifier = scene.Classifier(np.stack(samples), labels)
+
+    # Leave-one-out check: classify each sample against all the others.
+    results = classifier.leave_one_out()
+    for label in SCENES:
+        classified = [result for expected, result in results if expected == label]
+        if not classified:
+            continue
+        correct = classified.count(label)
+        log.info('%s: %s of %s classified correctly', label, correct, len(classified))
+        if len(classified) < 2:
+            log.warning('%s only has one unique sample, add more screenshots of it', label)
+        for result in classified:
+            if result != label:
+                log.warning('Sample labeled %s was classified as %s', label, result)
+
+    # The bot types the user's credentials on the login screens, so an
+    #   in-game frame must never be classified as one.
+    for expected, result in results:
+        if expected not in scene.LOGGED_OUT_SCENES and result in scene.LOGGED_OUT_SCENES:
+            raise Exception('Sample labeled ' + str(expected) + ' was classified as ' +
+                            str(result) + '!')
+
+    classifier.save()
+    log.info('Saved %s', scene.SAMPLES_FILE)
+
+
+if __name__ == '__main__':
+    main()